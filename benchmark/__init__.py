@@ -0,0 +1,4 @@
+"""Benchmarks for the download pipeline.
+
+Run ``python -m benchmark --help`` for the command line.
+"""
@@ -0,0 +1,169 @@
+"""Command line for the download pipeline benchmark.
+
+Examples::
+
+    # local disk vs webdav streaming for 1, 5 and 10 workers
+    python -m benchmark run --files 100 --size-mb 8 --latency-ms 30 \\
+        --bandwidth-mbps 80 --max-download-task 1 5 10 --mode local webdav
+
+    # fail (exit code 1) if anything got more than 10% worse
+    python -m benchmark compare benchmark/results/old.json new.json
+
+    # download filter interpreter vs compiled predicates
+    python -m benchmark filter --messages 50000
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+from loguru import logger
+
+from benchmark.filter_bench import DEFAULT_FILTERS, run_filter_benchmark
+from benchmark.pipeline import BenchConfig, compare_results, run_benchmark
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmark")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run benchmark scenarios")
+    run.add_argument("--files", type=int, default=50)
+    run.add_argument("--size-mb", type=float, default=4.0)
+    run.add_argument("--latency-ms", type=float, default=20.0)
+    run.add_argument(
+        "--bandwidth-mbps",
+        type=float,
+        default=0.0,
+        help="per connection bandwidth in Mbit/s, 0 for unlimited",
+    )
+    run.add_argument("--max-download-task", type=int, nargs="+", default=[5])
+    run.add_argument(
+        "--max-concurrent-transmissions", type=int, nargs="+", default=[5]
+    )
+    run.add_argument(
+        "--mode", choices=["local", "webdav"], nargs="+", default=["local"]
+    )
+    run.add_argument("--resumable-download", action="store_true")
+    run.add_argument("--parallel-download-connections", type=int, default=1)
+    run.add_argument("--message-refetch-age", type=int, default=3600)
+    run.add_argument("--output", help="result file, default benchmark/results/")
+    run.add_argument("--compare", help="baseline result file to compare with")
+    run.add_argument("--threshold", type=float, default=0.1)
+    run.add_argument("--log-level", default="WARNING")
+
+    compare = commands.add_parser("compare", help="compare two result files")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.1)
+
+    filters = commands.add_parser("filter", help="benchmark download filters")
+    filters.add_argument("--messages", type=int, default=20000)
+    filters.add_argument("--filter", action="append", help="filter to time")
+    filters.add_argument("--chunk-size", type=int, default=100)
+    return parser.parse_args(argv)
+
+
+def _scenarios(args: argparse.Namespace) -> list:
+    scenarios = []
+    for mode, tasks, transmissions in itertools.product(
+        args.mode, args.max_download_task, args.max_concurrent_transmissions
+    ):
+        scenarios.append(
+            BenchConfig(
+                name=f"{mode}-tasks{tasks}-tx{transmissions}",
+                files=args.files,
+                file_size=int(args.size_mb * 1024 * 1024),
+                latency_ms=args.latency_ms,
+                bandwidth_mbps=args.bandwidth_mbps,
+                max_download_task=tasks,
+                max_concurrent_transmissions=transmissions,
+                mode=mode,
+                resumable_download=args.resumable_download,
+                parallel_download_connections=args.parallel_download_connections,
+                message_refetch_age=args.message_refetch_age,
+            )
+        )
+    return scenarios
+
+
+def _print_run(run: dict):
+    metrics = run["metrics"]
+    print(
+        f"{run['config']['name']:<28} "
+        f"{metrics['files_per_s']:>9.2f} files/s "
+        f"{metrics['bytes_per_s'] / 1024 / 1024:>9.2f} MiB/s "
+        f"cpu/GB {metrics['cpu_seconds_per_gb']}s "
+        f"lag p99 {metrics['loop_lag']['p99_ms']}ms "
+        f"db/file {metrics['db_writes_per_file']}"
+    )
+
+
+def _print_comparison(rows: list) -> bool:
+    regressed = False
+    for name, metric, old, new, change, worse in rows:
+        flag = "REGRESSION" if worse else ""
+        print(f"{name:<28} {metric:<20} {old:>14} -> {new:<14} {change:+.1%} {flag}")
+        regressed = regressed or worse
+    return regressed
+
+
+def main(argv=None) -> int:
+    """Entry point"""
+    args = _parse_args(argv)
+
+    if args.command == "compare":
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.current, encoding="utf-8") as f:
+            current = json.load(f)
+        return 1 if _print_comparison(compare_results(baseline, current, args.threshold)) else 0
+
+    if args.command == "filter":
+        rows = run_filter_benchmark(
+            args.messages, args.filter or DEFAULT_FILTERS, args.chunk_size
+        )
+        for row in rows:
+            print(
+                f"{row['interpreter_per_s']:>10.0f} -> "
+                f"{row['compiled_per_s']:>10.0f} (x{row['speedup']}) / "
+                f"{row['batch_per_s']:>10.0f} batch (x{row['batch_speedup']}) "
+                f"msg/s  {row['filter']}"
+            )
+        return 0
+
+    # The pipeline writes to a stand-in DB, never to the configured one
+    os.environ.pop("DATABASE_URL", None)
+
+    # Per-file INFO logs would dominate the measured CPU time
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+
+    runs = []
+    for config in _scenarios(args):
+        run = run_benchmark(config)
+        _print_run(run)
+        runs.append(run)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"runs": runs}, f, indent=2)
+    print(f"results saved to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        return 1 if _print_comparison(compare_results(baseline, {"runs": runs}, args.threshold)) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
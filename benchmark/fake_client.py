@@ -0,0 +1,150 @@
+"""Fake pyrogram client serving synthetic media"""
+
+import asyncio
+import os
+from datetime import datetime
+from typing import Callable, List, Optional, Union
+
+import pyrogram
+
+CHUNK_SIZE = 1024 * 1024
+# Every chunk carries the same bytes so generating data costs nothing.
+_PAYLOAD = bytes(CHUNK_SIZE)
+
+
+class FakeChat:
+    """Chat of a synthetic message"""
+
+    def __init__(self, chat_id: int, title: str):
+        self.id = chat_id
+        self.title = title
+        self.username = None
+
+
+class FakeDocument:
+    """Document media of a synthetic message"""
+
+    def __init__(self, message_id: int, file_size: int):
+        self.file_id = f"fake-file-{message_id}"
+        self.file_unique_id = f"fake-unique-{message_id}"
+        self.file_name = f"bench_{message_id}.bin"
+        self.mime_type = "application/octet-stream"
+        self.file_size = file_size
+        self.date = datetime(2024, 1, 1)
+
+
+class FakeMessage:
+    """Message carrying one synthetic document"""
+
+    def __init__(self, chat: FakeChat, message_id: int, file_size: int):
+        self.id = message_id
+        self.chat = chat
+        self.date = datetime(2024, 1, 1)
+        self.document = FakeDocument(message_id, file_size)
+        self.media = "document"
+        self.media_group_id = None
+        self.caption = None
+        self.caption_entities = None
+        self.text = None
+        self.empty = False
+        self.from_user = None
+        self.reply_to_message = None
+        for media_type in ("audio", "photo", "video", "voice", "video_note"):
+            setattr(self, media_type, None)
+
+
+def make_messages(
+    chat_id: int, count: int, file_size: int, title: str = "bench"
+) -> List[FakeMessage]:
+    """Build ``count`` messages of ``file_size`` bytes each"""
+    chat = FakeChat(chat_id, title)
+    return [FakeMessage(chat, message_id, file_size) for message_id in range(1, count + 1)]
+
+
+class FakeClient:
+    """The subset of ``pyrogram.Client`` used by the download pipeline.
+
+    ``latency`` (seconds) is added once per API call and per media stream,
+    ``bandwidth`` (bytes per second, 0 for unlimited) throttles every stream
+    separately, like one Telegram media connection. ``get_file_semaphore``
+    bounds concurrent streams the way ``max_concurrent_transmissions`` does.
+    """
+
+    def __init__(
+        self,
+        messages: List[FakeMessage],
+        latency: float = 0.0,
+        bandwidth: int = 0,
+        max_concurrent_transmissions: int = 1,
+    ):
+        self.messages = {(message.chat.id, message.id): message for message in messages}
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.max_concurrent_transmissions = max_concurrent_transmissions
+        self.get_file_semaphore = asyncio.Semaphore(max_concurrent_transmissions)
+        self.save_file_semaphore = asyncio.Semaphore(max_concurrent_transmissions)
+        self.api_calls = 0
+        self.bytes_served = 0
+
+    async def _call(self):
+        self.api_calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def get_messages(
+        self, chat_id: int, message_ids: Union[int, List[int]] = None, **_
+    ):
+        """Return the synthetic message(s)"""
+        await self._call()
+        if isinstance(message_ids, list):
+            return [self.messages.get((chat_id, message_id)) for message_id in message_ids]
+        return self.messages.get((chat_id, message_ids))
+
+    async def stream_media(self, message: FakeMessage, limit: int = 0, offset: int = 0):
+        """Yield the media in chunks of up to 1 MiB"""
+        file_size = message.document.file_size
+        async with self.get_file_semaphore:
+            await self._call()
+            position = offset * CHUNK_SIZE
+            end = min(file_size, (offset + limit) * CHUNK_SIZE) if limit else file_size
+            while position < end:
+                size = min(CHUNK_SIZE, end - position)
+                if self.bandwidth:
+                    await asyncio.sleep(size / self.bandwidth)
+                else:
+                    await asyncio.sleep(0)
+                position += size
+                self.bytes_served += size
+                yield _PAYLOAD[:size]
+
+    async def download_media(
+        self,
+        message: FakeMessage,
+        file_name: str = "",
+        progress: Callable = None,
+        progress_args: tuple = (),
+        **_,
+    ) -> Optional[str]:
+        """Write the media to ``file_name`` like pyrogram: via a .temp file"""
+        directory = os.path.dirname(file_name)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = file_name + ".temp"
+        file_size = message.document.file_size
+        downloaded = 0
+        try:
+            with open(temp_path, "wb") as f:
+                async for chunk in self.stream_media(message):
+                    f.write(chunk)
+                    downloaded += len(chunk)
+                    if progress:
+                        await progress(downloaded, file_size, *progress_args)
+        except pyrogram.StopTransmission:
+            os.remove(temp_path)
+            return None
+        os.replace(temp_path, file_name)
+        return file_name
+
+    def stop_transmission(self):
+        """Abort the current transfer"""
+        raise pyrogram.StopTransmission
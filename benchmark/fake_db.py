@@ -0,0 +1,88 @@
+"""Database stand-in for the pipeline benchmark"""
+
+from contextlib import contextmanager
+
+
+class _FakeCursor:
+    def __init__(self, pool: "FakePool"):
+        self._pool = pool
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        """Count the statement and store nothing"""
+        self._pool.statements += 1
+
+    @staticmethod
+    def fetchone():
+        """Nothing is ever stored"""
+        return None
+
+    @staticmethod
+    def fetchall():
+        """Nothing is ever stored"""
+        return []
+
+
+class _FakeConn:
+    closed = 0
+
+    def __init__(self, pool: "FakePool"):
+        self._pool = pool
+
+    def cursor(self) -> _FakeCursor:
+        """A cursor that discards its statements"""
+        return _FakeCursor(self._pool)
+
+    def commit(self):
+        """Count the transaction"""
+        self._pool.transactions += 1
+
+    def rollback(self):
+        """Nothing to roll back"""
+
+
+class FakePool:
+    """Connection pool whose connections accept every statement and store
+    nothing, so the real write path of ``module.db.DB`` runs without a
+    database server"""
+
+    def __init__(self):
+        self.statements = 0
+        self.transactions = 0
+
+    def getconn(self, key=None) -> _FakeConn:
+        """A new fake connection"""
+        return _FakeConn(self)
+
+    def putconn(self, conn=None, key=None, close=False):
+        """Fake connections hold nothing"""
+
+    def closeall(self):
+        """Fake connections hold nothing"""
+
+
+@contextmanager
+def fake_db():
+    """Run the ``module.db.db`` singleton on a :class:`FakePool`.
+
+    Its write-behind queue is not started, ``db.flush()`` writes the queued
+    ops inline. Refuses to run when the singleton is connected to a real
+    database, the benchmark would write into it.
+    """
+    # pylint: disable = C0415
+    from module.db import db
+
+    if db.pool is not None:
+        raise RuntimeError("the benchmark does not run against DATABASE_URL")
+    pool = FakePool()
+    db.pool = pool
+    try:
+        yield pool
+    finally:
+        db.flush()
+        db.pool = None
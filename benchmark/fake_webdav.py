@@ -0,0 +1,40 @@
+"""Local WebDAV sink for the webdav streaming benchmark"""
+
+from aiohttp import web
+
+
+class FakeWebDav:
+    """Accept MKCOL and PUT requests and discard the uploaded data"""
+
+    def __init__(self):
+        self.bytes_received = 0
+        self.requests = 0
+        self._runner: web.AppRunner = None
+        self.url = ""
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if request.method == "PUT":
+            async for chunk in request.content.iter_any():
+                self.bytes_received += len(chunk)
+            return web.Response(status=201)
+        if request.method == "MKCOL":
+            return web.Response(status=201)
+        return web.Response(status=200)
+
+    async def start(self) -> str:
+        """Listen on a free local port and return the base URL"""
+        app = web.Application(client_max_size=0)
+        app.router.add_route("*", "/{path:.*}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]  # pylint: disable = W0212
+        self.url = f"http://127.0.0.1:{port}"
+        return self.url
+
+    async def stop(self):
+        """Shut the server down"""
+        if self._runner:
+            await self._runner.cleanup()
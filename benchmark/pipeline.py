@@ -0,0 +1,271 @@
+"""Run the download pipeline against the fake client and collect metrics"""
+
+import asyncio
+import itertools
+import os
+import platform
+import statistics
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from benchmark.fake_client import FakeClient, make_messages
+from benchmark.fake_db import fake_db
+from benchmark.fake_webdav import FakeWebDav
+
+BENCH_CHAT_ID = -100123456
+_run_counter = itertools.count()
+
+
+@dataclass
+class BenchConfig:
+    """One benchmark scenario"""
+
+    name: str = "default"
+    files: int = 50
+    file_size: int = 4 * 1024 * 1024
+    latency_ms: float = 20.0
+    # per connection, 0 for unlimited
+    bandwidth_mbps: float = 0.0
+    max_download_task: int = 5
+    max_concurrent_transmissions: int = 5
+    # "local" writes files to disk, "webdav" streams to a local WebDAV sink
+    mode: str = "local"
+    resumable_download: bool = False
+    parallel_download_connections: int = 1
+    parallel_download_part_size_mb: int = 16
+    # 0 refetches every queued message like before the freshness cache
+    message_refetch_age: int = 3600
+    # event loop lag sampling period
+    lag_interval_ms: float = 10.0
+
+
+class LoopLagMonitor:
+    """Sample how late the event loop wakes up a sleeping task"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: list = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(time.perf_counter() - start - self.interval)
+
+    def start(self):
+        """Start sampling"""
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """Stop sampling"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def summary(self) -> dict:
+        """Lag percentiles in milliseconds"""
+        if not self.samples:
+            return {"p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        ordered = sorted(self.samples)
+        return {
+            "p50_ms": round(statistics.median(ordered) * 1000, 3),
+            "p99_ms": round(ordered[int(len(ordered) * 0.99) - 1] * 1000, 3),
+            "max_ms": round(ordered[-1] * 1000, 3),
+        }
+
+
+def _db_write_counters() -> Optional[dict]:
+    """Write-behind counters, None when write-behind is disabled"""
+    from module.db import db
+
+    if not db.write_behind:
+        return None
+    db.flush()
+    stats = db.write_behind.stats()
+    return {
+        "enqueued": stats["enqueued_total"],
+        "flushed": stats["flushed_total"],
+        "flushes": stats["flush_count"],
+    }
+
+
+async def _run(config: BenchConfig, work_dir: str) -> dict:
+    # pylint: disable = C0415
+    import media_downloader
+    from module.app import DownloadStatus, TaskNode
+    from module.task_queue import TaskQueue
+    from module.webdav_client import close_clients
+
+    runtime_app = media_downloader.app
+    runtime_app.is_running = True
+    runtime_app.save_path = os.path.join(work_dir, "downloads")
+    runtime_app.temp_save_path = os.path.join(work_dir, "temp")
+    runtime_app.media_types = ["document"]
+    runtime_app.file_formats = {"document": ["all"]}
+    runtime_app.hide_file_name = False
+    runtime_app.enable_download_txt = False
+    runtime_app.max_download_task = config.max_download_task
+    runtime_app.max_concurrent_transmissions = config.max_concurrent_transmissions
+    runtime_app.resumable_download = config.resumable_download
+    runtime_app.parallel_download_connections = config.parallel_download_connections
+    runtime_app.parallel_download_part_size_mb = config.parallel_download_part_size_mb
+    runtime_app.message_refetch_age = config.message_refetch_age
+    runtime_app.cloud_drive_config.enable_upload_file = False
+    runtime_app.cloud_drive_config.remote_dir = "bench"
+    runtime_app.cloud_drive_config.dir_cache = {}
+
+    webdav = None
+    if config.mode == "webdav":
+        webdav = FakeWebDav()
+        runtime_app.cloud_drive_config.upload_adapter = "webdav"
+        runtime_app.cloud_drive_config.webdav_url = await webdav.start()
+        runtime_app.cloud_drive_config.webdav_username = ""
+    else:
+        runtime_app.cloud_drive_config.upload_adapter = "rclone"
+
+    # A chat per run keeps the stats of earlier runs in this process apart
+    chat_id = BENCH_CHAT_ID - next(_run_counter)
+    messages = make_messages(chat_id, config.files, config.file_size)
+    client = FakeClient(
+        messages,
+        latency=config.latency_ms / 1000,
+        bandwidth=int(config.bandwidth_mbps * 1024 * 1024 / 8),
+        max_concurrent_transmissions=config.max_concurrent_transmissions,
+    )
+    node = TaskNode(chat_id=chat_id)
+    node.client = client
+    node.is_running = True
+    runtime_queue = TaskQueue(
+        runtime_app.download_queue_size, media_downloader.task_lane(runtime_app)
+    )
+
+    lag = LoopLagMonitor(config.lag_interval_ms / 1000)
+    db_before = _db_write_counters()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    lag.start()
+
+    workers = [
+        asyncio.ensure_future(
+            media_downloader.worker(client, runtime_app, runtime_queue)
+        )
+        for _ in range(config.max_download_task)
+    ]
+    # The queue is bounded like a profile runtime's, workers drain it while
+    # the messages are added
+    for message in messages:
+        await media_downloader.add_download_task(message, node, runtime_queue)
+    while any(
+        status is DownloadStatus.Downloading
+        for status in node.download_status.values()
+    ):
+        await asyncio.sleep(0.01)
+
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    await lag.stop()
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    db_after = _db_write_counters()
+    if webdav:
+        await close_clients()
+        await webdav.stop()
+
+    succeeded = sum(
+        1 for status in node.download_status.values() if status.name == "SuccessDownload"
+    )
+    transferred = client.bytes_served
+    result = {
+        "files": config.files,
+        "succeeded": succeeded,
+        "bytes": transferred,
+        "seconds": round(wall, 3),
+        "files_per_s": round(succeeded / wall, 3),
+        "bytes_per_s": round(transferred / wall, 1),
+        "cpu_seconds": round(cpu, 3),
+        "cpu_seconds_per_gb": round(cpu / (transferred / 1e9), 3) if transferred else None,
+        "loop_lag": lag.summary(),
+        "api_calls": client.api_calls,
+        "db_writes_per_file": None,
+        "db_flushes_per_file": None,
+    }
+    if db_before and db_after and succeeded:
+        result["db_writes_per_file"] = round(
+            (db_after["enqueued"] - db_before["enqueued"]) / succeeded, 3
+        )
+        result["db_flushes_per_file"] = round(
+            (db_after["flushes"] - db_before["flushes"]) / succeeded, 3
+        )
+    return result
+
+
+def run_benchmark(config: BenchConfig) -> dict:
+    """Run one scenario in a fresh event loop and return its result record"""
+    # The DB stand-in is in place before _run imports media_downloader
+    with tempfile.TemporaryDirectory(prefix="tmd-bench-") as work_dir, fake_db():
+        loop = asyncio.new_event_loop()
+        try:
+            metrics = loop.run_until_complete(_run(config, work_dir))
+        finally:
+            loop.close()
+    return {
+        "config": asdict(config),
+        "metrics": metrics,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+# metric name -> True if higher is better
+COMPARED_METRICS = {
+    "files_per_s": True,
+    "bytes_per_s": True,
+    "cpu_seconds_per_gb": False,
+    "db_writes_per_file": False,
+}
+
+
+def compare_results(baseline: dict, current: dict, threshold: float = 0.1) -> list:
+    """Compare two result files scenario by scenario.
+
+    Returns ``(scenario, metric, old, new, change, regressed)`` rows; a metric
+    regressed when it got worse by more than ``threshold`` (a fraction).
+    Event loop lag p99 is compared like a lower-is-better metric.
+    """
+    old_runs = {run["config"]["name"]: run for run in baseline.get("runs", [])}
+    rows = []
+    for run in current.get("runs", []):
+        name = run["config"]["name"]
+        old_run = old_runs.get(name)
+        if not old_run:
+            continue
+        pairs = [
+            (metric, old_run["metrics"].get(metric), run["metrics"].get(metric), higher)
+            for metric, higher in COMPARED_METRICS.items()
+        ]
+        pairs.append(
+            (
+                "loop_lag_p99_ms",
+                old_run["metrics"]["loop_lag"]["p99_ms"],
+                run["metrics"]["loop_lag"]["p99_ms"],
+                False,
+            )
+        )
+        for metric, old, new, higher_is_better in pairs:
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            worse = -change if higher_is_better else change
+            rows.append((name, metric, old, new, change, worse > threshold))
+    return rows
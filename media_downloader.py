@@ -2,13 +2,14 @@
 
 import asyncio
 import copy
+import functools
 import inspect
 import logging
 import os
 import shutil
 import time
 from dataclasses import dataclass, field
-from typing import List, Optional, Tuple, Union
+from typing import Callable, List, Optional, Tuple, Union
 
 import pyrogram
 from loguru import logger
@@ -19,9 +20,11 @@ from module.app import Application, ChatDownloadConfig, DownloadStatus, TaskNode
 from module.bot import start_download_bot, stop_download_bot
 from module.cloud_drive import CloudDrive
 from module.db import db
+from module.download_engine import discard_partial, download_media_parallel
 from module.download_stat import (
     add_pending_download,
     get_pending_downloads,
+    get_task_state,
     remove_pending_download,
     update_download_status,
     verify_and_save_download,
@@ -35,9 +38,22 @@ from module.profiles import (
     sync_active_profile_to_legacy,
     update_profile,
 )
+from module.concurrency import AdaptiveConcurrency
+from module.message_fetcher import message_fetcher
+from module.progress import progress_registry
+from module.rate_limiter import DOWNLOAD, rate_limiter
+from module.rclone_rc import close_daemons
+from module.task_queue import (
+    PRIORITY_HIGH,
+    PRIORITY_NORMAL,
+    LaneInfo,
+    TaskQueue,
+    download_gate,
+)
+from module.tee_stream import file_sink, tee
+from module.webdav_client import close_clients
 from module.pyrogram_extension import (
     HookClient,
-    fetch_message,
     get_extension,
     record_download_status,
     report_bot_download_status,
@@ -65,8 +81,10 @@ DATA_FILE_NAME = "data.yaml"
 APPLICATION_NAME = "media_downloader"
 app = Application(CONFIG_NAME, DATA_FILE_NAME, APPLICATION_NAME)
 
-queue: asyncio.Queue = asyncio.Queue()
+queue: TaskQueue = TaskQueue()
 RETRY_TIME_OUT = 3
+# Messages filtered at once, one page of get_chat_history_v2
+FILTER_CHUNK_SIZE = 100
 
 logging.getLogger("pyrogram.session.session").addFilter(LogFilter())
 logging.getLogger("pyrogram.client").addFilter(LogFilter())
@@ -284,14 +302,23 @@ async def _get_media_meta(
 async def add_download_task(
     message: pyrogram.types.Message,
     node: TaskNode,
-    runtime_queue: asyncio.Queue = queue,
+    runtime_queue: TaskQueue = queue,
+    priority: int = PRIORITY_NORMAL,
 ):
-    """Add Download task"""
+    """Add Download task
+
+    Only ``(chat_id, message_id, node)`` is queued, the worker takes the
+    message from ``message_fetcher`` or fetches it again when its turn comes.
+    Waits while the queue is full.
+    """
     if message.empty:
         return False
+    # Queued messages come straight from Telegram, the worker reuses them
+    # instead of fetching every one again
+    message_fetcher.remember(message)
     node.download_status[message.id] = DownloadStatus.Downloading
-    await runtime_queue.put((message, node))
     node.total_task += 1
+    await runtime_queue.put((message.chat.id, message.id, node), priority)
     return True
 
 
@@ -330,9 +357,19 @@ async def download_task(
 ):
     """Download and Forward media"""
 
-    download_status, file_name = await download_media(
-        client, message, runtime_app.media_types, runtime_app.file_formats, node, runtime_app
-    )
+    try:
+        download_status, file_name = await download_media(
+            client,
+            message,
+            runtime_app.media_types,
+            runtime_app.file_formats,
+            node,
+            runtime_app,
+        )
+    finally:
+        # a failed, stopped or cancelled download reports no completion, its
+        # progress slot is given back here instead of by the idle sweep
+        progress_registry.finish(node.chat_id, message.id)
 
     if runtime_app.enable_download_txt and message.text and not message.media:
         download_status, file_name = await save_msg_to_file(
@@ -344,9 +381,10 @@ async def download_task(
 
     node.download_status[message.id] = download_status
 
-    # Skip file size check for WebDAV streaming (file doesn't exist locally)
+    # Skip file size check for streamed uploads (file doesn't exist locally)
     if (
-        runtime_app.cloud_drive_config.upload_adapter == "webdav"
+        runtime_app.streams_upload()
+        and not runtime_app.cloud_drive_config.keep_local_copy
         and download_status == DownloadStatus.SuccessDownload
     ):
         file_size = 0  # File was streamed directly, not saved locally
@@ -386,6 +424,79 @@ async def download_task(
     )
 
 
+async def _count_streamed(stream, profile_id: Optional[str]):
+    """Pass ``stream`` on and count its bytes as downloaded, the adaptive
+    concurrency measures the throughput of a profile by them"""
+    try:
+        async for chunk in stream:
+            progress_registry.count(profile_id, len(chunk))
+            yield chunk
+    finally:
+        if hasattr(stream, "aclose"):
+            await stream.aclose()
+
+
+async def stream_upload(
+    client: pyrogram.client.Client,
+    message: pyrogram.types.Message,
+    runtime_app: Application,
+    file_name: str,
+    temp_file_name: str,
+    media_size: int,
+    progress_args: tuple = (),
+) -> Tuple[bool, bool]:
+    """Upload the media of ``message`` while it is downloaded.
+
+    The chunks from Telegram go to the upload adapter and, with
+    ``keep_local_copy``, through a tee to ``temp_file_name`` as well, so a
+    file kept locally and uploaded is downloaded once.
+
+    Returns whether the upload succeeded and whether ``temp_file_name`` was
+    written, each sink can fail on its own.
+    """
+    drive_config = runtime_app.cloud_drive_config
+    if drive_config.upload_adapter == "webdav":
+        upload = CloudDrive.webdav_upload_stream
+    else:
+        upload = CloudDrive.rclone_stream_upload
+
+    def upload_sink(stream):
+        return upload(
+            drive_config,
+            runtime_app.save_path,
+            file_name,  # Relative path handled inside
+            stream,
+            media_size,
+            progress_callback=update_upload_stat,
+            progress_args=progress_args,
+        )
+
+    # Use pyrogram's stream_media which returns an async generator
+    stream_generator = _count_streamed(
+        client.stream_media(message, limit=0, offset=0),
+        runtime_app.profile_id,
+    )
+    if not drive_config.keep_local_copy:
+        return await upload_sink(stream_generator) is True, False
+
+    results = await tee(
+        stream_generator,
+        {
+            "upload": upload_sink,
+            "local": functools.partial(file_sink, temp_file_name),
+        },
+        max_buffer=drive_config.tee_buffer_mb * 1024 * 1024,
+        max_stall=drive_config.tee_max_stall,
+    )
+    for name, result in results.items():
+        if result is not True:
+            logger.error(f"Stream to {name} failed: {result}")
+    if results["upload"] is not True and os.path.exists(temp_file_name):
+        os.remove(temp_file_name)
+        return False, False
+    return results["upload"] is True, results["local"] is True
+
+
 # pylint: disable = R0915,R0914
 
 
@@ -437,7 +548,9 @@ async def download_media(
     task_start_time: float = time.time()
     media_size = 0
     _media = None
-    message = await fetch_message(client, message)
+    message = await message_fetcher.get(
+        client, message, max_age=runtime_app.message_refetch_age
+    )
     try:
         for _type in media_types:
             _media = getattr(message, _type, None)
@@ -482,23 +595,23 @@ async def download_media(
     # Register as pending download for resume on restart
     add_pending_download(node.chat_id, message_id, ui_file_name, node.profile_id)
 
+    # set once the streamed upload went through, a retry only downloads
+    uploaded = False
     for retry in range(3):
-
+        await rate_limiter.acquire(client, DOWNLOAD)
         try:
-            # Check if using WebDAV for streaming
-            if runtime_app.cloud_drive_config.upload_adapter == "webdav":
-                logger.info(f"Starting streaming upload to WebDAV: {ui_file_name}")
-
-                # Use pyrogram's stream_media which returns an async generator
-                stream_generator = client.stream_media(message, limit=0, offset=0)
-
-                success = await CloudDrive.webdav_upload_stream(
-                    runtime_app.cloud_drive_config,
-                    runtime_app.save_path,
-                    file_name,  # Relative path handled inside
-                    stream_generator,
+            temp_download_path = None
+            # Upload while downloading (WebDAV, rclone rcat)
+            if runtime_app.streams_upload() and not uploaded:
+                logger.info(f"Starting streaming upload: {ui_file_name}")
+
+                uploaded, kept_local = await stream_upload(
+                    client,
+                    message,
+                    runtime_app,
+                    file_name,
+                    temp_file_name,
                     media_size,
-                    progress_callback=update_upload_stat,
                     progress_args=(
                         message_id,
                         ui_file_name,
@@ -509,10 +622,19 @@ async def download_media(
                     ),
                 )
 
-                if success:
+                if not uploaded:
+                    raise Exception("Stream upload failed")
+                if runtime_app.cloud_drive_config.keep_local_copy:
+                    if kept_local:
+                        # the local copy is finished like a normal download
+                        temp_download_path = temp_file_name
+                    else:
+                        logger.warning(
+                            f"{ui_file_name} is uploaded, downloading the local "
+                            "copy that failed again"
+                        )
+                else:
                     # Mock successful download path to satisfy later logic, though file doesn't exist locally
-                    # We might need to adjust logic later if it checks for file existence
-                    # For now, we trick it by returning a dummy path if successful
                     temp_download_path = "STREAMED_TO_WEBDAV"
                     # Mark as success with proper file info
                     verify_and_save_download(
@@ -526,8 +648,40 @@ async def download_media(
                     # CRITICAL: Remove from pending downloads to prevent re-download on restart
                     remove_pending_download(node.chat_id, message.id, node.profile_id)
                     return DownloadStatus.SuccessDownload, file_name
-                else:
-                    raise Exception("WebDAV stream upload failed")
+
+            if temp_download_path:
+                # the local copy came with the stream
+                pass
+            elif (
+                runtime_app.resumable_download
+                or runtime_app.parallel_download_connections > 1
+            ):
+                # Keeps a partial file across restarts and continues from it,
+                # large files are fetched over several connections
+                temp_download_path = await download_media_parallel(
+                    client,
+                    message,
+                    _media,
+                    temp_file_name,
+                    part_size=runtime_app.parallel_download_part_size_mb
+                    * 1024
+                    * 1024,
+                    parallelism=runtime_app.parallel_download_connections,
+                    progress=update_download_status,
+                    progress_args=(
+                        message_id,
+                        ui_file_name,
+                        task_start_time,
+                        node,
+                        client,
+                    ),
+                )
+                if (
+                    temp_download_path is None
+                    and get_task_state(node.chat_id, message_id, node.profile_id)
+                    == "deleted"
+                ):
+                    discard_partial(temp_file_name)
             else:
                 # Standard Download
                 temp_download_path = await client.download_media(
@@ -576,7 +730,7 @@ async def download_media(
                 f"Message[{message.id}]: {_t('file reference expired, refetching')}..."
             )
             await asyncio.sleep(RETRY_TIME_OUT)
-            message = await fetch_message(client, message)
+            message = await message_fetcher.get(client, message, force=True)
             if _check_timeout(retry, message.id):
                 # pylint: disable = C0301
                 logger.error(
@@ -584,10 +738,15 @@ async def download_media(
                     f"{_t('file reference expired for 3 retries, download skipped.')}"
                 )
         except pyrogram.errors.exceptions.flood_420.FloodWait as wait_err:
-            await asyncio.sleep(wait_err.value)
+            if runtime_app.concurrency:
+                runtime_app.concurrency.backoff(f"FloodWait {wait_err.value}s")
+            # the next acquire of every download of this client waits it out
+            rate_limiter.flood_wait(client, DOWNLOAD, wait_err.value)
             logger.warning("Message[{}]: FlowWait {}", message.id, wait_err.value)
             _check_timeout(retry, message.id)
         except TypeError:
+            if runtime_app.concurrency:
+                runtime_app.concurrency.backoff("timeout")
             # pylint: disable = C0301
             logger.warning(
                 f"{_t('Timeout Error occurred when downloading Message')}[{message.id}], "
@@ -636,32 +795,114 @@ def _check_config() -> bool:
 async def worker(
     client: pyrogram.client.Client,
     runtime_app: Application = app,
-    runtime_queue: asyncio.Queue = queue,
+    runtime_queue: TaskQueue = queue,
 ):
     """Work for download task"""
     while runtime_app.is_running:
+        # With adaptive concurrency only ``limit`` of the workers take tasks
+        slots = (
+            runtime_app.concurrency.worker_slots if runtime_app.concurrency else None
+        )
         try:
-            item = await runtime_queue.get()
-            message = item[0]
-            node: TaskNode = item[1]
-
-            if node.is_stop_transmission:
-                continue
-
-            if node.client:
-                await download_task(node.client, message, node, runtime_app)
-            else:
-                await download_task(client, message, node, runtime_app)
+            if slots:
+                await slots.acquire()
+            try:
+                item = await runtime_queue.get()
+                try:
+                    async with download_gate.slot(
+                        runtime_app.profile_id, runtime_app.profile_weight
+                    ):
+                        await _run_queued_task(client, runtime_app, *item)
+                finally:
+                    runtime_queue.done(item)
+            finally:
+                if slots:
+                    slots.release()
         except Exception as e:
             logger.exception(f"{e}")
 
 
+async def _run_queued_task(
+    client: pyrogram.Client,
+    runtime_app: Application,
+    chat_id: Union[int, str],
+    message_id: int,
+    node: TaskNode,
+):
+    """Fetch a queued message if needed and download it"""
+    if node.is_stop_transmission:
+        return
+
+    download_client = node.client or client
+    try:
+        message = await message_fetcher.get_by_id(
+            download_client,
+            chat_id,
+            message_id,
+            max_age=runtime_app.message_refetch_age,
+        )
+    except Exception:
+        node.download_status[message_id] = DownloadStatus.FailedDownload
+        raise
+    if message is None:
+        logger.warning(f"Message {message_id} of {chat_id} no longer exists")
+        node.download_status[message_id] = DownloadStatus.SkipDownload
+        return
+
+    await download_task(download_client, message, node, runtime_app)
+
+
+def task_lane(runtime_app: Application) -> Callable[[tuple], LaneInfo]:
+    """Lane of a queued ``(chat_id, message_id, node)``: one per TaskNode,
+    weighted and capped by the node or the application defaults"""
+
+    def lane(item: tuple) -> LaneInfo:
+        node: TaskNode = item[2]
+        return (
+            node,
+            node.weight or runtime_app.task_weight,
+            node.max_concurrent or runtime_app.task_max_concurrent,
+            node.queue_wait,
+        )
+
+    return lane
+
+
+async def _add_filtered_tasks(
+    client: pyrogram.Client,
+    chat_download_config: ChatDownloadConfig,
+    node: TaskNode,
+    chunk: list,
+    runtime_app: Application,
+    runtime_queue: TaskQueue,
+):
+    """Filter a chunk of ``(message, meta_data)`` at once and queue the
+    selected messages"""
+    selected = runtime_app.exec_filter_batch(
+        chat_download_config, [meta_data for _, meta_data in chunk]
+    )
+    for (message, _), download in zip(chunk, selected):
+        if download:
+            await add_download_task(message, node, runtime_queue)
+        else:
+            node.download_status[message.id] = DownloadStatus.SkipDownload
+            if message.media_group_id:
+                await upload_telegram_chat(
+                    client,
+                    node.upload_user,
+                    runtime_app,
+                    node,
+                    message,
+                    DownloadStatus.SkipDownload,
+                )
+
+
 async def download_chat_task(
     client: pyrogram.Client,
     chat_download_config: ChatDownloadConfig,
     node: TaskNode,
     runtime_app: Application = app,
-    runtime_queue: asyncio.Queue = queue,
+    runtime_queue: TaskQueue = queue,
 ):
     """Download all task"""
     messages_iter = get_chat_history_v2(
@@ -671,19 +912,27 @@ async def download_chat_task(
         max_id=node.end_offset_id,
         offset_id=chat_download_config.last_read_message_id,
         reverse=True,
+        read_ahead=runtime_app.history_read_ahead,
     )
 
     chat_download_config.node = node
 
     if chat_download_config.ids_to_retry:
         logger.info(f"{_t('Downloading files failed during last run')}...")
-        skipped_messages: list = await client.get_messages(  # type: ignore
-            chat_id=node.chat_id, message_ids=chat_download_config.ids_to_retry
-        )
 
-        for message in skipped_messages:
-            await add_download_task(message, node, runtime_queue)
+        async def queue_retries(_chat_id: int, _message_ids: list, messages: list):
+            for message in messages or []:
+                if message is not None:
+                    await add_download_task(message, node, runtime_queue)
 
+        await message_fetcher.fetch_many(
+            client,
+            {node.chat_id: chat_download_config.ids_to_retry},
+            queue_retries,
+            concurrency=runtime_app.message_fetch_concurrency,
+        )
+
+    chunk: list = []
     async for message in messages_iter:  # type: ignore
         meta_data = MetaData()
 
@@ -701,19 +950,17 @@ async def download_chat_task(
         if runtime_app.need_skip_message(chat_download_config, message.id):
             continue
 
-        if runtime_app.exec_filter(chat_download_config, meta_data):
-            await add_download_task(message, node, runtime_queue)
-        else:
-            node.download_status[message.id] = DownloadStatus.SkipDownload
-            if message.media_group_id:
-                await upload_telegram_chat(
-                    client,
-                    node.upload_user,
-                    runtime_app,
-                    node,
-                    message,
-                    DownloadStatus.SkipDownload,
-                )
+        chunk.append((message, meta_data))
+        if len(chunk) >= FILTER_CHUNK_SIZE:
+            await _add_filtered_tasks(
+                client, chat_download_config, node, chunk, runtime_app, runtime_queue
+            )
+            chunk = []
+
+    if chunk:
+        await _add_filtered_tasks(
+            client, chat_download_config, node, chunk, runtime_app, runtime_queue
+        )
 
     chat_download_config.need_check = True
     chat_download_config.total_task = node.total_task
@@ -723,7 +970,7 @@ async def download_chat_task(
 async def download_all_chat(
     client: pyrogram.Client,
     runtime_app: Application = app,
-    runtime_queue: asyncio.Queue = queue,
+    runtime_queue: TaskQueue = queue,
     profile_id: str = None,
 ):
     """Download All chat"""
@@ -746,34 +993,49 @@ async def download_all_chat(
         logger.info(
             f"Resuming {len(pending)} pending downloads from previous session..."
         )
+        ids_by_chat: dict = {}
         for item in pending:
             chat_id = item.get("chat_id")
             message_id = item.get("message_id")
-            file_name = item.get("file_name", "unknown")
             if chat_id and message_id:
-                try:
-                    logger.info(
-                        f"Resuming download: chat={chat_id}, msg={message_id}, file={file_name}"
+                ids_by_chat.setdefault(chat_id, []).append(message_id)
+
+        # one task, and so one queue lane, per chat
+        resume_nodes: dict = {}
+
+        async def queue_resumed(chat_id: int, message_ids: list, messages: list):
+            if messages is None:
+                # Remove failed items to avoid infinite retry
+                for message_id in message_ids:
+                    remove_pending_download(chat_id, message_id, profile_id)
+                return
+            queued = 0
+            for message_id, message in zip(message_ids, messages):
+                if message is None:
+                    logger.warning(
+                        f"Message {message_id} no longer exists, removing from pending"
                     )
-                    # Fetch the message
-                    message = await client.get_messages(chat_id, message_id)
-                    if message and not message.empty:
-                        # Create a task node for this download
-                        node = TaskNode(chat_id=chat_id, profile_id=profile_id)
-                        await runtime_queue.put((message, node))
-                        logger.success(f"Queued for resume: msg={message_id}")
-                    else:
-                        logger.warning(
-                            f"Message {message_id} no longer exists, removing from pending"
-                        )
-                        remove_pending_download(chat_id, message_id, profile_id)
-                except Exception as e:
-                    logger.error(f"Failed to resume download {message_id}: {e}")
-                    # Remove failed items to avoid infinite retry
                     remove_pending_download(chat_id, message_id, profile_id)
+                    continue
+                node = resume_nodes.get(chat_id)
+                if node is None:
+                    node = TaskNode(chat_id=chat_id, profile_id=profile_id)
+                    resume_nodes[chat_id] = node
+                if await add_download_task(message, node, runtime_queue):
+                    queued += 1
+            logger.success(f"Queued {queued} messages of {chat_id} for resume")
+
+        await message_fetcher.fetch_many(
+            client,
+            ids_by_chat,
+            queue_resumed,
+            concurrency=runtime_app.message_fetch_concurrency,
+        )
 
     for key, value in runtime_app.chat_download_config.items():
         value.node = TaskNode(chat_id=key, profile_id=profile_id)
+        value.node.weight = value.weight
+        value.node.max_concurrent = value.max_concurrent
         try:
             await download_chat_task(
                 client, value, value.node, runtime_app, runtime_queue
@@ -839,7 +1101,7 @@ class ProfileRuntime:
     profile_name: str
     app: Application
     client: pyrogram.Client
-    queue: asyncio.Queue
+    queue: TaskQueue
     tasks: list = field(default_factory=list)
     running: bool = False
     status: str = "starting"
@@ -931,6 +1193,9 @@ def main():
         except Exception as e:
             logger.warning(f"Failed to sync active profile on startup: {e}")
 
+    download_gate.limit = app.max_total_download_task
+    rate_limiter.configure(app.rate_limits)
+
     def restart_callback():
         logger.warning("Restarting application via Web UI request...")
         app.is_running = False
@@ -969,7 +1234,9 @@ def main():
     def _runtime_download_payload(state: ProfileRuntime, matched_submitter: bool):
         async def enqueue_download_task(message, node):
             node.profile_id = state.profile_id
-            return await add_download_task(message, node, state.queue)
+            return await add_download_task(
+                message, node, state.queue, PRIORITY_HIGH
+            )
 
         return {
             "client": state.client,
@@ -1013,7 +1280,9 @@ def main():
             }
 
         runtime_app = _build_runtime_app(profile)
-        runtime_queue = asyncio.Queue()
+        runtime_queue = TaskQueue(
+            runtime_app.download_queue_size, task_lane(runtime_app)
+        )
         if runtime_client is None:
             runtime_client = _create_client_for_runtime(profile, runtime_app)
 
@@ -1028,7 +1297,9 @@ def main():
 
         async def runtime_add_download_task(message, node):
             node.profile_id = profile_id
-            return await add_download_task(message, node, runtime_queue)
+            return await add_download_task(
+                message, node, runtime_queue, PRIORITY_HIGH
+            )
 
         async def runtime_download_chat_task(client_arg, chat_config, node):
             node.profile_id = profile_id
@@ -1041,6 +1312,7 @@ def main():
             set_max_concurrent_transmissions(
                 runtime_client, runtime_app.max_concurrent_transmissions
             )
+            rate_limiter.configure(runtime_app.rate_limits, client=runtime_client)
             try:
                 session_string = runtime_client.export_session_string()
                 if inspect.isawaitable(session_string):
@@ -1054,6 +1326,25 @@ def main():
             except Exception as e:
                 logger.warning(f"Failed to export/save session string: {e}")
 
+            worker_count = runtime_app.max_download_task
+            if runtime_app.adaptive_concurrency:
+                runtime_app.concurrency = AdaptiveConcurrency(
+                    runtime_app.max_download_task,
+                    maximum=runtime_app.adaptive_max_download_task,
+                    interval=runtime_app.adaptive_interval,
+                    transmissions_per_worker=runtime_app.max_concurrent_transmissions
+                    / max(runtime_app.max_download_task, 1),
+                )
+                runtime_app.concurrency.attach(runtime_client)
+                worker_count = runtime_app.concurrency.maximum
+                state.tasks.append(
+                    app.loop.create_task(
+                        runtime_app.concurrency.run(
+                            lambda: progress_registry.transferred(profile_id)
+                        )
+                    )
+                )
+
             runtime_app.is_running = True
             state.tasks.append(
                 app.loop.create_task(
@@ -1062,7 +1353,7 @@ def main():
                     )
                 )
             )
-            for _ in range(runtime_app.max_download_task):
+            for _ in range(worker_count):
                 state.tasks.append(
                     app.loop.create_task(
                         worker(runtime_client, runtime_app, runtime_queue)
@@ -1200,11 +1491,7 @@ def main():
                 logger.warning(f"Failed to cancel runtime tasks cleanly: {e}")
         state.tasks.clear()
 
-        while not state.queue.empty():
-            try:
-                state.queue.get_nowait()
-            except asyncio.QueueEmpty:
-                break
+        state.queue.clear()
 
         if stop_client and state.client:
             try:
@@ -1255,6 +1542,10 @@ def main():
                 "bot_started": state.bot_started,
                 "started_at": state.started_at,
                 "account": account,
+                "queue": state.queue.stats(),
+                "concurrency": (
+                    state.app.concurrency.to_dict() if state.app.concurrency else None
+                ),
             }
         return status
 
@@ -1321,6 +1612,7 @@ def main():
 
         state.app.config = copy.deepcopy(config or {})
         state.app.assign_config(state.app.config)
+        rate_limiter.configure(state.app.rate_limits, client=state.client)
         owner_state = runtimes.get(bot_owner_profile_id) if bot_owner_profile_id else None
         if (
             owner_state
@@ -1409,11 +1701,14 @@ def main():
                 app.loop.run_until_complete(
                     deactivate_runtime("all", stop_client=True, mark_disabled=False)
                 )
+                app.loop.run_until_complete(close_daemons())
+                app.loop.run_until_complete(close_clients())
         except Exception as e:
             logger.warning(f"Failed to stop profile runtimes cleanly: {e}")
         logger.info(_t("Stopped!"))
         logger.info(f"{_t('update config')}......")
         app.update_config()
+        db.shutdown()
         logger.success(
             f"{_t('Updated last read message_id to config file')},"
             f"{_t('total download')} {app.total_download_task}, "
@@ -4,6 +4,7 @@ import asyncio
 import os
 import time
 from asyncio import Lock
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
@@ -19,6 +20,8 @@ from module.db import db
 from module.filter import Filter
 from module.language import Language, set_language
 from module.profiles import save_active_profile, update_profile
+from module.task_control import task_control
+from module.task_queue import WaitStats
 from utils.format import replace_date_time, validate_title
 from utils.meta_data import MetaData
 
@@ -180,6 +183,11 @@ class TaskNode:
         self.topic_id = topic_id
         self.reply_to_message = None
         self.cloud_drive_upload_stat_dict: dict = {}
+        # share of the workers against other tasks and most messages
+        # downloading at once, 0 takes the application defaults
+        self.weight: int = 0
+        self.max_concurrent: int = 0
+        self.queue_wait = WaitStats(str(chat_id))
 
     def to_dict(self) -> dict:
         """Serialize TaskNode to dict"""
@@ -245,6 +253,8 @@ class TaskNode:
     def stop_transmission(self):
         """Stop task"""
         self.is_stop_transmission = True
+        # Wake transfers of this task parked on a pause or a forward limit
+        task_control.notify_all()
 
     def stat(self, status: DownloadStatus):
         """
@@ -297,48 +307,96 @@ class LimitCall:
     def __init__(
         self,
         max_limit_call_times: int = 0,
-        limit_call_times: int = 0,
-        last_call_time: float = 0,
+        period: float = 60.0,
+        limits: Optional[dict] = None,
     ):
         """
         Initializes the object with the given parameters.
 
         Args:
-            max_limit_call_times (int): The maximum limit of call times allowed.
-            limit_call_times (int): The current limit of call times.
-            last_call_time (int): The time of the last call.
+            max_limit_call_times (int): The maximum calls per ``period`` to one
+                destination chat, 0 is no limit.
+            period (float): The window in seconds.
+            limits (dict): ``max_limit_call_times`` of single destination
+                chats.
 
         Returns:
             None
         """
         self.max_limit_call_times = max_limit_call_times
-        self.limit_call_times = limit_call_times
-        self.last_call_time = last_call_time
+        self.period = period
+        self.limits: dict = limits or {}
+        # destination -> times of the last reserved calls, oldest first
+        self._calls: dict = {}
 
-    async def wait(self, node: TaskNode):
-        """
-        Wait for a certain period of time before continuing execution.
-
-        This function does not take any parameters.
+    def limit(self, key) -> int:
+        """The calls per period allowed to ``key``"""
+        limit = self.limits.get(key, self.limits.get(str(key)))
+        return self.max_limit_call_times if limit is None else limit
 
-        This function does not return anything.
+    def reserve(self, key, now: Optional[float] = None) -> float:
         """
-        while True:
-            now = time.time()
-            time_span = now - self.last_call_time
-            if node.is_stop_transmission:
-                break
-
-            if time_span > 60:
-                self.limit_call_times = 0
-                self.last_call_time = now
+        Reserve the next call to ``key`` and return how long to wait for it.
 
-            if self.limit_call_times + 1 <= self.max_limit_call_times:
-                self.limit_call_times += 1
-                break
+        A sliding window: the call is due once the ``limit``-th latest
+        reserved call to ``key`` is ``period`` seconds old, so no window of
+        ``period`` seconds ever holds more than ``limit`` calls. Each
+        reservation is queued behind the earlier ones, which hands out the
+        calls in FIFO order with exact wake-up times.
+        """
+        now = time.monotonic() if now is None else now
+        return self._reserve(key, now) - now
+
+    def _reserve(self, key, now: float) -> float:
+        limit = self.limit(key)
+        if limit <= 0:
+            return now
+        calls = self._calls.setdefault(key, deque())
+        # calls that left the window no longer hold anything back
+        while calls and calls[0] + self.period <= now:
+            calls.popleft()
+        start = now
+        if len(calls) >= limit:
+            start = max(now, calls[-limit] + self.period)
+        calls.append(start)
+        return start
+
+    def release(self, key, start: float):
+        """Give back the reservation of the call at ``start``, which was
+        not used. The later calls keep their times, they only ever wait
+        longer than needed."""
+        calls = self._calls.get(key)
+        if calls and start in calls:
+            calls.remove(start)
+
+    async def wait(self, node: TaskNode, key=None):
+        """
+        Wait until a call to the destination chat of ``node`` is allowed.
 
-            # logger.debug("Waiting for 10 seconds...")
-            await asyncio.sleep(1)
+        Args:
+            node (TaskNode): The task that forwards.
+            key: The destination, ``node.upload_telegram_chat_id`` by default.
+        """
+        if node.is_stop_transmission:
+            return
+        key = node.upload_telegram_chat_id if key is None else key
+        now = time.monotonic()
+        start = self._reserve(key, now)
+        if start <= now:
+            return
+        # Park on the wake-up stop_transmission sends, so a stopped task does
+        # not sleep out its turn.
+        try:
+            await asyncio.wait_for(
+                task_control.wait((key, start), lambda: node.is_stop_transmission),
+                start - now,
+            )
+        except asyncio.TimeoutError:
+            return
+        except asyncio.CancelledError:
+            self.release(key, start)
+            raise
+        self.release(key, start)
 
 
 class ChatDownloadConfig:
@@ -355,6 +413,8 @@ class ChatDownloadConfig:
         self.finish_task: int = 0
         self.need_check: bool = False
         self.upload_telegram_chat_id: Union[int, str] = None
+        self.weight: int = 0
+        self.max_concurrent: int = 0
         self.node: TaskNode = TaskNode(0)
 
 
@@ -473,6 +533,33 @@ class Application:
         self.date_format: str = "%Y_%m"
         self.drop_no_audio_video: bool = False
         self.enable_download_txt: bool = False
+        self.resumable_download: bool = False
+        self.parallel_download_connections: int = 1
+        self.parallel_download_part_size_mb: int = 16
+        # seconds a fetched message is trusted before download_media refetches it
+        self.message_refetch_age: int = 3600
+        # get_messages calls in flight when fetching many messages at once
+        self.message_fetch_concurrency: int = 4
+        # history chunks requested ahead of the one being filtered, 0 is off
+        self.history_read_ahead: int = 2
+        # queued downloads per profile before chat history reading waits, 0 is
+        # unbounded
+        self.download_queue_size: int = 1000
+        # default share of the workers of a download task and most of its
+        # messages downloading at once, 0 is no cap
+        self.task_weight: int = 1
+        self.task_max_concurrent: int = 0
+        # share of this profile when max_total_download_task caps the process
+        self.profile_weight: int = 1
+        # downloads across all profiles of the process, 0 is no cap
+        self.max_total_download_task: int = 0
+        # grow and shrink the downloads of a profile between 1 and
+        # adaptive_max_download_task with the measured throughput
+        self.adaptive_concurrency: bool = False
+        self.adaptive_max_download_task: int = 16
+        self.adaptive_interval: int = 10
+        # calls per second of each rate_limiter method class
+        self.rate_limits: dict = {}
         self.filter_advertisement_list: yaml.comments.CommentedSeq = (
             yaml.comments.CommentedSeq([])
         )
@@ -481,6 +568,8 @@ class Application:
         )
         self.group_add_advertisement: dict = {}
         self.forward_limit_call = LimitCall(max_limit_call_times=33)
+        # AdaptiveConcurrency of a running profile with adaptive_concurrency
+        self.concurrency = None
 
         self.loop = asyncio.new_event_loop()
         asyncio.set_event_loop(self.loop)
@@ -588,6 +677,98 @@ class Application:
                     "webdav_password"
                 ]
 
+            if upload_drive_config.get("rclone_rc_addr"):
+                self.cloud_drive_config.rclone_rc_addr = upload_drive_config[
+                    "rclone_rc_addr"
+                ]
+
+            if upload_drive_config.get("rclone_rc_user"):
+                self.cloud_drive_config.rclone_rc_user = upload_drive_config[
+                    "rclone_rc_user"
+                ]
+
+            if upload_drive_config.get("rclone_rc_pass"):
+                self.cloud_drive_config.rclone_rc_pass = upload_drive_config[
+                    "rclone_rc_pass"
+                ]
+
+            cloud_drive_config = self.cloud_drive_config
+            cloud_drive_config.rclone_batch_window = max(
+                get_config(
+                    upload_drive_config,
+                    "rclone_batch_window",
+                    cloud_drive_config.rclone_batch_window,
+                    int,
+                ),
+                0,
+            )
+            cloud_drive_config.rclone_batch_max_files = max(
+                get_config(
+                    upload_drive_config,
+                    "rclone_batch_max_files",
+                    cloud_drive_config.rclone_batch_max_files,
+                    int,
+                ),
+                1,
+            )
+            cloud_drive_config.rclone_batch_max_size = max(
+                get_config(
+                    upload_drive_config,
+                    "rclone_batch_max_size",
+                    cloud_drive_config.rclone_batch_max_size,
+                    int,
+                ),
+                0,
+            )
+            cloud_drive_config.webdav_connections = max(
+                get_config(
+                    upload_drive_config,
+                    "webdav_connections",
+                    cloud_drive_config.webdav_connections,
+                    int,
+                ),
+                1,
+            )
+            cloud_drive_config.webdav_chunk_size_mb = max(
+                get_config(
+                    upload_drive_config,
+                    "webdav_chunk_size_mb",
+                    cloud_drive_config.webdav_chunk_size_mb,
+                    int,
+                ),
+                0,
+            )
+            cloud_drive_config.stream_upload = get_config(
+                upload_drive_config,
+                "stream_upload",
+                cloud_drive_config.stream_upload,
+                bool,
+            )
+            cloud_drive_config.keep_local_copy = get_config(
+                upload_drive_config,
+                "keep_local_copy",
+                cloud_drive_config.keep_local_copy,
+                bool,
+            )
+            cloud_drive_config.tee_buffer_mb = max(
+                get_config(
+                    upload_drive_config,
+                    "tee_buffer_mb",
+                    cloud_drive_config.tee_buffer_mb,
+                    int,
+                ),
+                1,
+            )
+            cloud_drive_config.tee_max_stall = max(
+                get_config(
+                    upload_drive_config,
+                    "tee_max_stall",
+                    cloud_drive_config.tee_max_stall,
+                    int,
+                ),
+                0,
+            )
+
         self.file_name_prefix_split = _config.get(
             "file_name_prefix_split", self.file_name_prefix_split
         )
@@ -700,6 +881,92 @@ class Application:
             _config, "enable_download_txt", self.enable_download_txt, bool
         )
 
+        self.resumable_download = get_config(
+            _config, "resumable_download", self.resumable_download, bool
+        )
+
+        self.parallel_download_connections = max(
+            get_config(
+                _config,
+                "parallel_download_connections",
+                self.parallel_download_connections,
+                int,
+            ),
+            1,
+        )
+        self.parallel_download_part_size_mb = max(
+            get_config(
+                _config,
+                "parallel_download_part_size_mb",
+                self.parallel_download_part_size_mb,
+                int,
+            ),
+            1,
+        )
+        self.message_refetch_age = max(
+            get_config(
+                _config, "message_refetch_age", self.message_refetch_age, int
+            ),
+            0,
+        )
+        self.message_fetch_concurrency = max(
+            get_config(
+                _config,
+                "message_fetch_concurrency",
+                self.message_fetch_concurrency,
+                int,
+            ),
+            1,
+        )
+        self.history_read_ahead = max(
+            get_config(_config, "history_read_ahead", self.history_read_ahead, int),
+            0,
+        )
+        self.download_queue_size = max(
+            get_config(
+                _config, "download_queue_size", self.download_queue_size, int
+            ),
+            0,
+        )
+        self.task_weight = max(
+            get_config(_config, "task_weight", self.task_weight, int), 1
+        )
+        self.task_max_concurrent = max(
+            get_config(
+                _config, "task_max_concurrent", self.task_max_concurrent, int
+            ),
+            0,
+        )
+        self.profile_weight = max(
+            get_config(_config, "profile_weight", self.profile_weight, int), 1
+        )
+        self.max_total_download_task = max(
+            get_config(
+                _config,
+                "max_total_download_task",
+                self.max_total_download_task,
+                int,
+            ),
+            0,
+        )
+        self.adaptive_concurrency = get_config(
+            _config, "adaptive_concurrency", self.adaptive_concurrency, bool
+        )
+        self.adaptive_max_download_task = max(
+            get_config(
+                _config,
+                "adaptive_max_download_task",
+                self.adaptive_max_download_task,
+                int,
+            ),
+            1,
+        )
+        self.adaptive_interval = max(
+            get_config(_config, "adaptive_interval", self.adaptive_interval, int),
+            1,
+        )
+        self.rate_limits = get_config(_config, "rate_limits", self.rate_limits, dict)
+
         filter_advertisement_list = _config.get(
             "filter_advertisement_list", self.filter_advertisement_list
         )
@@ -740,13 +1007,23 @@ class Application:
             self.date_format = "%Y_%m"
 
         forward_limit = _config.get("forward_limit", None)
-        if forward_limit:
+        if forward_limit is not None:
             try:
                 forward_limit = int(forward_limit)
                 self.forward_limit_call.max_limit_call_times = forward_limit
             except ValueError:
                 pass
 
+        forward_limit_per_chat = _config.get("forward_limit_per_chat", None)
+        if isinstance(forward_limit_per_chat, dict):
+            limits = {}
+            for chat_id, limit in forward_limit_per_chat.items():
+                try:
+                    limits[chat_id] = int(limit)
+                except (TypeError, ValueError):
+                    logger.warning(f"forward_limit_per_chat {chat_id} is not int")
+            self.forward_limit_call.limits = limits
+
         if _config.get("chat"):
             chat = _config["chat"]
             for item in chat:
@@ -763,6 +1040,14 @@ class Application:
                     ].upload_telegram_chat_id = item.get(
                         "upload_telegram_chat_id", None
                     )
+                    self.chat_download_config[item["chat_id"]].weight = max(
+                        get_config(item, "weight", 0, int), 0
+                    )
+                    self.chat_download_config[
+                        item["chat_id"]
+                    ].max_concurrent = max(
+                        get_config(item, "max_concurrent", 0, int), 0
+                    )
         elif _config.get("chat_id"):
             # Compatible with lower versions
             self._chat_id = _config["chat_id"]
@@ -848,6 +1133,18 @@ class Application:
                             ] = True
         return True
 
+    def streams_upload(self) -> bool:
+        """True if files are uploaded while they are downloaded instead of
+        after"""
+        drive_config = self.cloud_drive_config
+        if drive_config.upload_adapter == "webdav":
+            return True
+        return (
+            drive_config.upload_adapter == "rclone"
+            and drive_config.enable_upload_file
+            and drive_config.stream_upload
+        )
+
     async def upload_file(
         self,
         local_file_path: str,
@@ -859,6 +1156,10 @@ class Application:
         if not self.cloud_drive_config.enable_upload_file:
             return False
 
+        if self.streams_upload():
+            # uploaded while it was downloaded
+            return False
+
         ret: bool = False
         if self.cloud_drive_config.upload_adapter == "rclone":
             ret = await CloudDrive.rclone_upload_file(
@@ -868,6 +1169,14 @@ class Application:
                 progress_callback,
                 progress_args,
             )
+        elif self.cloud_drive_config.upload_adapter == "rclone_rc":
+            ret = await CloudDrive.rclone_rc_upload_file(
+                self.cloud_drive_config,
+                self.save_path,
+                local_file_path,
+                progress_callback,
+                progress_args,
+            )
         elif self.cloud_drive_config.upload_adapter == "aligo":
             ret = await self.loop.run_in_executor(
                 self.executor,
@@ -989,6 +1298,26 @@ class Application:
 
         return True
 
+    def exec_filter_batch(
+        self, download_config: ChatDownloadConfig, metas: List[MetaData]
+    ) -> List[bool]:
+        """
+        Executes the filter on a chunk of messages at once.
+
+        Args:
+            download_config (ChatDownloadConfig): The download configuration object.
+            metas (List[MetaData]): The meta data of every message.
+
+        Returns:
+            List[bool]: For every message, if the filter selects it.
+        """
+        if download_config.download_filter:
+            return self.download_filter.exec_batch(
+                download_config.download_filter, metas
+            )
+
+        return [True] * len(metas)
+
     # pylint: disable = R0912
     def update_config(self, immediate: bool = True):
         """update config
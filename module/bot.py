@@ -790,7 +790,7 @@ class DownloadBot:
 
         # load config
         if db.conn:
-            config = db.load_setting("bot_setting")
+            config = await db.load_setting_async("bot_setting")
             if config:
                 self.config = config
                 self.assign_config(self.config)
@@ -808,7 +808,7 @@ class DownloadBot:
         # Restore tasks from DB
         if db.conn:
             try:
-                saved_tasks = db.load_setting("active_tasks")
+                saved_tasks = await db.load_setting_async("active_tasks")
                 if saved_tasks and isinstance(saved_tasks, list):
                     logger.info(f"Restoring {len(saved_tasks)} active tasks from DB...")
                     for task_data in saved_tasks:
@@ -0,0 +1,74 @@
+"""Versioned change feed for download/upload stats"""
+
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+
+class ChangeFeed:
+    """Track which task rows changed since a given sequence number.
+
+    The stats modules call :meth:`touch` on every mutation; readers such as
+    the web ``/stream`` endpoint remember the last ``seq`` they have seen and
+    ask for the keys changed since then. Only the latest sequence number is
+    kept per key, so the feed is bounded by the number of distinct tasks and
+    a burst of progress updates for one task costs a single entry.
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self._lock = threading.Lock()
+        self._seq = 0
+        # Readers behind this sequence number must take a full snapshot.
+        self._floor = 0
+        self._max_keys = max_keys
+        # key -> seq of its latest change, ordered by seq (oldest first)
+        self._changes: OrderedDict = OrderedDict()
+
+    @property
+    def seq(self) -> int:
+        """Current sequence number"""
+        return self._seq
+
+    def touch(self, key: Hashable) -> int:
+        """Record a change of ``key`` and return the new sequence number"""
+        with self._lock:
+            self._seq += 1
+            self._changes[key] = self._seq
+            self._changes.move_to_end(key)
+            if len(self._changes) > self._max_keys:
+                _, dropped_seq = self._changes.popitem(last=False)
+                self._floor = dropped_seq
+            return self._seq
+
+    def reset(self) -> int:
+        """Invalidate every reader, forcing them to reload a full snapshot.
+
+        Used when a stats table is replaced wholesale (load from DB, clear
+        history), where per-key tracking would cost more than a snapshot.
+        """
+        with self._lock:
+            self._seq += 1
+            self._floor = self._seq
+            self._changes.clear()
+            return self._seq
+
+    def changes_since(self, since: int) -> Tuple[int, Optional[list]]:
+        """Return ``(seq, keys)`` changed after ``since``.
+
+        ``keys`` is ``None`` when ``since`` is older than the retained
+        history, in which case the caller has to send a full snapshot.
+        """
+        with self._lock:
+            if since < self._floor:
+                return self._seq, None
+            keys = []
+            for key in reversed(self._changes):
+                if self._changes[key] <= since:
+                    break
+                keys.append(key)
+            keys.reverse()
+            return self._seq, keys
+
+
+# Shared by download_stat and upload_stat; keys are (chat_id, message_id).
+task_feed = ChangeFeed()
@@ -5,7 +5,6 @@ import importlib
 import inspect
 import os
 import re
-import urllib.parse
 from asyncio import subprocess
 from subprocess import Popen
 from typing import Callable
@@ -14,6 +13,9 @@ from zipfile import ZipFile
 import aiohttp
 from loguru import logger
 
+from module.rclone_rc import format_stats, get_daemon
+from module.upload_batcher import RcloneBatcher
+from module.webdav_client import UPLOAD_PUT, WebDavClient
 from utils import platform
 
 
@@ -34,6 +36,18 @@ class CloudDriveConfig:
         webdav_url: str = "",
         webdav_username: str = "",
         webdav_password: str = "",
+        rclone_rc_addr: str = "127.0.0.1:5572",
+        rclone_rc_user: str = "",
+        rclone_rc_pass: str = "",
+        rclone_batch_window: int = 2,
+        rclone_batch_max_files: int = 100,
+        rclone_batch_max_size: int = 1024 * 1024 * 1024,
+        webdav_connections: int = 8,
+        webdav_chunk_size_mb: int = 16,
+        stream_upload: bool = False,
+        keep_local_copy: bool = False,
+        tee_buffer_mb: int = 8,
+        tee_max_stall: int = 30,
     ):
         self.enable_upload_file = enable_upload_file
         self.before_upload_file_zip = before_upload_file_zip
@@ -44,6 +58,26 @@ class CloudDriveConfig:
         self.webdav_url = webdav_url
         self.webdav_username = webdav_username
         self.webdav_password = webdav_password
+        # keep-alive connections of the pooled WebDAV session
+        self.webdav_connections = webdav_connections
+        self.webdav_client = None
+        # files above it are uploaded in segments of it, 0 is one PUT
+        self.webdav_chunk_size_mb = webdav_chunk_size_mb
+        # rclone adapter streams with rclone rcat while downloading
+        self.stream_upload = stream_upload
+        # a streamed file is also written to save_path, see tee_stream
+        self.keep_local_copy = keep_local_copy
+        self.tee_buffer_mb = tee_buffer_mb
+        self.tee_max_stall = tee_max_stall
+        # rclone rcd used by the ``rclone_rc`` adapter
+        self.rclone_rc_addr = rclone_rc_addr
+        self.rclone_rc_user = rclone_rc_user
+        self.rclone_rc_pass = rclone_rc_pass
+        # rclone adapter uploads batches per directory, 0 window is per file
+        self.rclone_batch_window = rclone_batch_window
+        self.rclone_batch_max_files = rclone_batch_max_files
+        self.rclone_batch_max_size = rclone_batch_max_size
+        self.rclone_batcher = None
         self.before_upload_file_zip = before_upload_file_zip
         self.after_upload_file_delete = after_upload_file_delete
         self.rclone_path = rclone_path
@@ -154,6 +188,15 @@ class CloudDrive:
         progress_args: tuple = (),
     ) -> bool:
         """Use Rclone upload file"""
+        if drive_config.rclone_batch_window > 0:
+            return await CloudDrive.rclone_batch_upload_file(
+                drive_config,
+                save_path,
+                local_file_path,
+                progress_callback,
+                progress_args,
+            )
+
         upload_status: bool = False
         try:
             remote_dir = (
@@ -222,6 +265,152 @@ class CloudDrive:
 
         return upload_status
 
+    @staticmethod
+    async def rclone_batch_upload_file(
+        drive_config: CloudDriveConfig,
+        save_path: str,
+        local_file_path: str,
+        progress_callback: Callable = None,
+        progress_args: tuple = (),
+    ) -> bool:
+        """Upload file with the other files of its directory, see
+        ``RcloneBatcher``"""
+        try:
+            remote_dir = (
+                drive_config.remote_dir
+                + "/"
+                + os.path.dirname(local_file_path).replace(save_path, "")
+            ).replace("\\", "/")
+
+            zip_file_path: str = ""
+            file_path = local_file_path
+            if drive_config.before_upload_file_zip:
+                zip_file_path = CloudDrive.zip_file(local_file_path)
+                file_path = zip_file_path
+
+            if drive_config.rclone_batcher is None:
+                drive_config.rclone_batcher = RcloneBatcher(
+                    drive_config.rclone_path,
+                    drive_config.rclone_batch_window,
+                    drive_config.rclone_batch_max_files,
+                    drive_config.rclone_batch_max_size,
+                )
+            upload_status = await drive_config.rclone_batcher.upload(
+                file_path,
+                remote_dir,
+                progress_callback
+                if inspect.iscoroutinefunction(progress_callback)
+                else None,
+                progress_args,
+            )
+            if upload_status:
+                logger.info(f"upload file {local_file_path} success")
+                drive_config.total_upload_success_file_count += 1
+                if drive_config.after_upload_file_delete:
+                    os.remove(local_file_path)
+            if drive_config.before_upload_file_zip:
+                os.remove(zip_file_path)
+        except Exception as e:
+            logger.error(f"{e.__class__} {e}")
+            return False
+
+        return upload_status
+
+    @staticmethod
+    async def rclone_rc_upload_file(
+        drive_config: CloudDriveConfig,
+        save_path: str,
+        local_file_path: str,
+        progress_callback: Callable = None,
+        progress_args: tuple = (),
+    ) -> bool:
+        """Upload file as a job of the shared rclone rcd"""
+        try:
+            rel_dir = (
+                os.path.dirname(local_file_path)
+                .replace(save_path, "")
+                .replace("\\", "/")
+                .strip("/")
+            )
+
+            zip_file_path: str = ""
+            file_path = local_file_path
+            if drive_config.before_upload_file_zip:
+                zip_file_path = CloudDrive.zip_file(local_file_path)
+                file_path = zip_file_path
+
+            async def progress(stats: dict):
+                if inspect.iscoroutinefunction(progress_callback):
+                    await progress_callback(*format_stats(stats), *progress_args)
+
+            daemon = get_daemon(
+                drive_config.rclone_path,
+                drive_config.rclone_rc_addr,
+                drive_config.rclone_rc_user,
+                drive_config.rclone_rc_pass,
+            )
+            upload_status = await daemon.copy_file(
+                file_path,
+                drive_config.remote_dir,
+                f"{rel_dir}/{os.path.basename(file_path)}".lstrip("/"),
+                progress if progress_callback else None,
+            )
+            if upload_status:
+                logger.info(f"upload file {local_file_path} success")
+                drive_config.total_upload_success_file_count += 1
+                if drive_config.after_upload_file_delete:
+                    os.remove(local_file_path)
+            if drive_config.before_upload_file_zip:
+                os.remove(zip_file_path)
+        except Exception as e:
+            logger.error(f"{e.__class__} {e}")
+            return False
+
+        return upload_status
+
+    @staticmethod
+    async def rclone_stream_upload(
+        drive_config: CloudDriveConfig,
+        save_path: str,
+        file_name: str,
+        stream_generator,
+        total_size: int,
+        progress_callback: Callable = None,
+        progress_args: tuple = (),
+    ) -> bool:
+        """Stream upload with rclone rcat"""
+        rel_path = CloudDrive.get_relative_upload_path(save_path, file_name)
+        remote_path = f"{drive_config.remote_dir.rstrip('/')}/{rel_path}"
+        proc = await asyncio.create_subprocess_exec(
+            drive_config.rclone_path,
+            "rcat",
+            remote_path,
+            "--size",
+            str(total_size or -1),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            uploaded = 0
+            async for chunk in stream_generator:
+                proc.stdin.write(chunk)
+                await proc.stdin.drain()
+                uploaded += len(chunk)
+                if inspect.iscoroutinefunction(progress_callback):
+                    await progress_callback(uploaded, total_size, *progress_args)
+            proc.stdin.close()
+        except BaseException:
+            proc.kill()
+            await proc.wait()
+            raise
+
+        if await proc.wait() != 0:
+            logger.error(f"rclone rcat {remote_path} exited with {proc.returncode}")
+            return False
+        logger.info(f"upload file {file_name} success")
+        drive_config.total_upload_success_file_count += 1
+        return True
+
     @staticmethod
     def aligo_upload_file(
         drive_config: CloudDriveConfig, save_path: str, local_file_path: str
@@ -305,11 +494,37 @@ class CloudDrive:
             ret = await CloudDrive.rclone_upload_file(
                 drive_config, save_path, local_file_path
             )
+        elif drive_config.upload_adapter == "rclone_rc":
+            ret = await CloudDrive.rclone_rc_upload_file(
+                drive_config, save_path, local_file_path
+            )
         elif drive_config.upload_adapter == "aligo":
             ret = CloudDrive.aligo_upload_file(drive_config, save_path, local_file_path)
 
         return ret
 
+    @staticmethod
+    def webdav_client(drive_config: CloudDriveConfig) -> WebDavClient:
+        """The pooled WebDAV client of ``drive_config``, replaced when the
+        url or the account changed"""
+        client = drive_config.webdav_client
+        if (
+            client is None
+            or client.url != drive_config.webdav_url.rstrip("/")
+            or client.username != drive_config.webdav_username
+            or client.password != drive_config.webdav_password
+        ):
+            if client is not None:
+                asyncio.ensure_future(client.close())
+            client = WebDavClient(
+                drive_config.webdav_url,
+                drive_config.webdav_username,
+                drive_config.webdav_password,
+                drive_config.webdav_connections,
+            )
+            drive_config.webdav_client = client
+        return client
+
     @staticmethod
     async def webdav_upload_stream(
         drive_config: CloudDriveConfig,
@@ -326,12 +541,7 @@ class CloudDrive:
             logger.error("WebDAV URL is not configured")
             return False
 
-        # Streaming Upload
-        auth = None
-        if drive_config.webdav_username:
-            auth = aiohttp.BasicAuth(
-                drive_config.webdav_username, drive_config.webdav_password
-            )
+        client = CloudDrive.webdav_client(drive_config)
 
         headers = {
             "Content-Type": "application/octet-stream",
@@ -342,124 +552,97 @@ class CloudDrive:
         # Preserve folders created by file_path_prefix under save_path.
         rel_path = CloudDrive.get_relative_upload_path(save_path, file_name)
 
-        # Construct base remote URL
-        base_url = drive_config.webdav_url.rstrip("/")
         remote_root = drive_config.remote_dir.strip("/")
 
         # Full path to the file on WebDAV (without protocol) -> used for splitting directories
         # e.g. Crypt/OneDrive/Telegram/ChannelName/Video.mp4
         full_rel_path = f"{remote_root}/{rel_path}".strip("/")
+        parent_dir = os.path.dirname(full_rel_path).replace("\\", "/")
 
         # Final URL
         # Explicitly encode path segments to handle special chars/Chinese correctly
-        # Split by / to preserve directory structure, then quote each component
-        parts = full_rel_path.split("/")
-        # quote each part but keep / separators
-        encoded_path = "/".join(urllib.parse.quote(p) for p in parts)
-        remote_url = f"{base_url}/{encoded_path}"
+        remote_url = client.file_url(full_rel_path)
 
         logger.info(f"[WebDAV] Uploading to (Encoded): {remote_url}")
-        if remote_url != f"{base_url}/{full_rel_path}":
+        if remote_url != f"{client.url}/{full_rel_path}":
             logger.info(f"[WebDAV] Original Path was: {full_rel_path}")
 
+        async def report(uploaded: int):
+            if progress_callback:
+                if inspect.iscoroutinefunction(progress_callback):
+                    await progress_callback(uploaded, total_size, *progress_args)
+                else:
+                    progress_callback(uploaded, total_size, *progress_args)
+
         # Wrap the generator to report progress
         async def progress_stream():
             uploaded = 0
             async for chunk in stream_generator:
                 yield chunk
                 uploaded += len(chunk)
-                if progress_callback:
-                    if inspect.iscoroutinefunction(progress_callback):
-                        await progress_callback(uploaded, total_size, *progress_args)
-                    else:
-                        progress_callback(uploaded, total_size, *progress_args)
+                await report(uploaded)
 
-        # 10s for connect, 2 hours for total upload. Large videos need more time.
-        timeout = aiohttp.ClientTimeout(total=7200, connect=10)
+        # Large files go in segments that can be retried one by one, if the
+        # server takes them
+        chunk_size = drive_config.webdav_chunk_size_mb * 1024 * 1024
+        if chunk_size and total_size > chunk_size:
+            try:
+                await client.ensure_dir(parent_dir)
+                if await client.upload_mode() != UPLOAD_PUT:
+                    success = await client.upload_chunked(
+                        full_rel_path,
+                        stream_generator,
+                        total_size,
+                        chunk_size,
+                        report,
+                        max_retries,
+                    )
+                    if success:
+                        logger.info(f"WebDAV upload success: {rel_path}")
+                    return success
+            except Exception as e:
+                logger.error(
+                    f"WebDAV chunked upload error: {type(e).__name__}: {e}"
+                )
+                return False
 
         for attempt in range(max_retries):
             try:
-                async with aiohttp.ClientSession(auth=auth, timeout=timeout) as session:
-                    # 1. Ensure parent directories exist (MKCOL) - use cache to avoid duplicates
-                    parent_dir = os.path.dirname(full_rel_path).replace("\\", "/")
-                    if parent_dir and parent_dir != ".":
-                        dirs = parent_dir.split("/")
-                        current_path_parts = []
-                        for d in dirs:
-                            if not d:
-                                continue
-                            current_path_parts.append(urllib.parse.quote(d))
-                            # Join quoted parts
-                            encoded_current_path = "/".join(current_path_parts)
-                            mkcol_url = f"{base_url}/{encoded_current_path}"
-
-                            # Check cache to avoid duplicate MKCOL requests
-                            if drive_config.dir_cache.get(encoded_current_path):
-                                continue
-
-                            try:
-                                async with session.request("MKCOL", mkcol_url) as resp:
-                                    if resp.status == 201:
-                                        # Successfully created
-                                        drive_config.dir_cache[
-                                            encoded_current_path
-                                        ] = True
-                                        logger.info(
-                                            f"[WebDAV] Created directory: {mkcol_url}"
-                                        )
-                                    elif resp.status == 405:
-                                        # Already exists (Method Not Allowed for existing dir)
-                                        drive_config.dir_cache[
-                                            encoded_current_path
-                                        ] = True
-                                    elif resp.status == 423:
-                                        # Locked - wait and continue, another process is creating it
-                                        logger.warning(
-                                            f"[WebDAV] Directory locked, waiting: {mkcol_url}"
-                                        )
-                                        await asyncio.sleep(1)
-                                        drive_config.dir_cache[
-                                            encoded_current_path
-                                        ] = True
-                                    else:
-                                        logger.warning(
-                                            f"[WebDAV] MKCOL {mkcol_url} returned {resp.status}"
-                                        )
-                                        # Still mark as attempted to avoid infinite loops
-                                        drive_config.dir_cache[
-                                            encoded_current_path
-                                        ] = True
-                            except Exception as e:
-                                logger.warning(f"[WebDAV] MKCOL error: {e}")
-                                # Mark as attempted anyway
-                                drive_config.dir_cache[encoded_current_path] = True
-
-                    # 2. PUT stream
-                    # Set Content-Length if size is known to help some WebDAV servers
-                    if total_size > 0:
-                        headers["Content-Length"] = str(total_size)
-
-                    async with session.put(
-                        remote_url, data=progress_stream(), headers=headers
-                    ) as resp:
-                        if resp.status in [200, 201, 204]:
-                            logger.info(f"WebDAV upload success: {rel_path}")
-                            return True
-                        elif resp.status == 423:
-                            # Locked - retry after delay
-                            logger.warning(
-                                f"[WebDAV] File locked (423), retry {attempt + 1}/{max_retries}"
-                            )
-                            await asyncio.sleep(
-                                2 * (attempt + 1)
-                            )  # Exponential backoff
-                            continue
-                        else:
-                            text = await resp.text()
-                            logger.error(
-                                f"WebDAV upload failed: {resp.status} - {text[:500]}"
-                            )
-                            return False
+                # 1. Ensure parent directories exist, known ones cost no request
+                await client.ensure_dir(parent_dir)
+
+                # 2. PUT stream
+                # Set Content-Length if size is known to help some WebDAV servers
+                if total_size > 0:
+                    headers["Content-Length"] = str(total_size)
+
+                async with client.session().put(
+                    remote_url, data=progress_stream(), headers=headers
+                ) as resp:
+                    if resp.status in [200, 201, 204]:
+                        logger.info(f"WebDAV upload success: {rel_path}")
+                        return True
+                    elif resp.status == 423:
+                        # Locked - retry after delay
+                        logger.warning(
+                            f"[WebDAV] File locked (423), retry {attempt + 1}/{max_retries}"
+                        )
+                        await asyncio.sleep(2 * (attempt + 1))  # Exponential backoff
+                        continue
+                    elif resp.status == 409 and attempt < max_retries - 1:
+                        # Parent is gone although the index has it
+                        logger.warning(
+                            f"[WebDAV] Parent of {rel_path} missing (409), "
+                            f"retry {attempt + 1}/{max_retries}"
+                        )
+                        client.forget(parent_dir)
+                        continue
+                    else:
+                        text = await resp.text()
+                        logger.error(
+                            f"WebDAV upload failed: {resp.status} - {text[:500]}"
+                        )
+                        return False
             except asyncio.TimeoutError:
                 logger.error(
                     f"WebDAV upload timeout (attempt {attempt + 1}/{max_retries}): {rel_path}"
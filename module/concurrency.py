@@ -0,0 +1,214 @@
+"""Adaptive download concurrency"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Optional
+
+import pyrogram
+from loguru import logger
+
+
+class ResizableSemaphore:
+    """Semaphore whose number of slots can change while it is in use.
+
+    A drop in ``limit`` does not interrupt holders, new ``acquire`` calls
+    wait until the slots in use fell below the new limit. Usable in place
+    of the ``asyncio.Semaphore`` of a pyrogram client.
+    """
+
+    def __init__(self, limit: int = 1):
+        self._limit = max(limit, 1)
+        self.in_use = 0
+        self._waiters: deque = deque()
+
+    @property
+    def limit(self) -> int:
+        """Current number of slots"""
+        return self._limit
+
+    def resize(self, limit: int):
+        """Change the number of slots"""
+        self._limit = max(limit, 1)
+        self._wake()
+
+    def locked(self) -> bool:
+        """True if ``acquire`` would wait"""
+        return self.in_use >= self._limit
+
+    def _wake(self):
+        while self._waiters and self.in_use < self._limit:
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_use += 1
+                future.set_result(None)
+
+    async def acquire(self) -> bool:
+        """Wait for a slot"""
+        if not self._waiters and self.in_use < self._limit:
+            self.in_use += 1
+            return True
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        return True
+
+    def release(self):
+        """Give a slot back"""
+        self.in_use = max(self.in_use - 1, 0)
+        self._wake()
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class AdaptiveConcurrency:
+    """AIMD controller of how many downloads of a profile run at once.
+
+    Every ``interval`` seconds ``update`` compares the throughput of the
+    last interval with the best one seen. While it rises by more than
+    ``tolerance`` the limit grows by one (additive increase). If the last
+    increase brought nothing it is taken back and the limit holds; the best
+    throughput decays on hold, so the controller probes again later. A
+    FloodWait or a timeout reported through ``backoff`` halves the limit at
+    the next update (multiplicative decrease). Throughput is in bytes, so
+    a queue of tiny files, where per file latency dominates, grows the same
+    way as one of huge files as long as more parallel files move more bytes.
+
+    The limit is applied to ``worker_slots``, which the workers hold while
+    they download, and scaled to the pyrogram transmission semaphores of
+    every client given to ``attach``.
+    """
+
+    HISTORY_SIZE = 20
+
+    # pylint: disable = R0913
+    def __init__(
+        self,
+        initial: int,
+        minimum: int = 1,
+        maximum: int = 16,
+        interval: float = 10.0,
+        tolerance: float = 0.05,
+        decrease: float = 0.5,
+        transmissions_per_worker: float = 1.0,
+    ):
+        self.minimum = max(minimum, 1)
+        self.maximum = max(maximum, self.minimum)
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.interval = interval
+        self.tolerance = tolerance
+        self.decrease = decrease
+        self.transmissions_per_worker = transmissions_per_worker
+        self.worker_slots = ResizableSemaphore(self.limit)
+        self.transmission_slots = ResizableSemaphore(self._transmissions())
+        self.upload_slots = ResizableSemaphore(self._transmissions())
+        self.throughput = 0.0
+        self.decision = "start"
+        self.reason = ""
+        self.history: deque = deque(maxlen=self.HISTORY_SIZE)
+        self._best = 0.0
+        self._backoff: Optional[str] = None
+        self._last_bytes: Optional[int] = None
+        self._last_time = 0.0
+
+    def _transmissions(self) -> int:
+        return max(int(round(self.limit * self.transmissions_per_worker)), 1)
+
+    def attach(self, client: pyrogram.Client):
+        """Let the limit drive the transmission semaphores of ``client``"""
+        client.get_file_semaphore = self.transmission_slots
+        client.save_file_semaphore = self.upload_slots
+
+    def backoff(self, reason: str):
+        """Report a FloodWait or a timeout, applied at the next update"""
+        self._backoff = reason
+
+    def _set_limit(self, limit: int, decision: str, reason: str, now: float):
+        limit = min(max(limit, self.minimum), self.maximum)
+        if limit != self.limit or decision != self.decision:
+            self.history.append(
+                {
+                    "time": now,
+                    "limit": limit,
+                    "decision": decision,
+                    "reason": reason,
+                    "throughput": int(self.throughput),
+                }
+            )
+        if limit != self.limit:
+            logger.info(
+                f"Download concurrency {self.limit} -> {limit} ({decision}: {reason})"
+            )
+        self.limit = limit
+        self.decision = decision
+        self.reason = reason
+        self.worker_slots.resize(limit)
+        self.transmission_slots.resize(self._transmissions())
+        self.upload_slots.resize(self._transmissions())
+
+    def update(self, transferred: int, now: Optional[float] = None) -> str:
+        """Take a sample of the bytes transferred so far and adjust the
+        limit, returns the decision"""
+        now = now or time.time()
+        if self._last_bytes is None:
+            self._last_bytes, self._last_time = transferred, now
+            return self.decision
+        elapsed = max(now - self._last_time, 1e-6)
+        self.throughput = (transferred - self._last_bytes) / elapsed
+        self._last_bytes, self._last_time = transferred, now
+
+        if self._backoff:
+            reason, self._backoff = self._backoff, None
+            # what was reached before the errors is no longer a target
+            self._best = self.throughput
+            self._set_limit(
+                int(self.limit * self.decrease), "decrease", reason, now
+            )
+        elif self.throughput <= 0:
+            self._set_limit(self.limit, "idle", "nothing transferred", now)
+        elif self.throughput > self._best * (1 + self.tolerance):
+            self._best = self.throughput
+            if self.limit < self.maximum:
+                self._set_limit(self.limit + 1, "increase", "throughput rose", now)
+            else:
+                self._set_limit(self.limit, "hold", "at maximum", now)
+        elif self.decision == "increase":
+            self._set_limit(
+                self.limit - 1, "hold", "last increase did not help", now
+            )
+        else:
+            self._best *= 1 - self.tolerance / 2
+            self._set_limit(self.limit, "hold", "throughput flat", now)
+        return self.decision
+
+    async def run(self, transferred: Callable[[], int]):
+        """Sample ``transferred()`` every ``interval`` seconds until cancelled"""
+        while True:
+            try:
+                self.update(transferred())
+            except Exception as e:
+                logger.warning(f"Adaptive concurrency update failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def to_dict(self) -> dict:
+        """Current decisions for the status API"""
+        return {
+            "limit": self.limit,
+            "minimum": self.minimum,
+            "maximum": self.maximum,
+            "running": self.worker_slots.in_use,
+            "transmissions": self.transmission_slots.limit,
+            "throughput": int(self.throughput),
+            "decision": self.decision,
+            "reason": self.reason,
+            "history": list(self.history),
+        }
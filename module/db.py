@@ -1,20 +1,293 @@
+import asyncio
+import atexit
+import functools
+import json
 import os
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timezone
+from typing import Callable
 
 import psycopg2
 from dotenv import load_dotenv
-from psycopg2.extras import Json
+from psycopg2.extras import execute_values
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 
 load_dotenv()
 
 from loguru import logger
 
 
+def _load_int_env(name: str, default: int, minimum: int) -> int:
+    raw_value = os.environ.get(name, str(default))
+    try:
+        value = int(raw_value)
+    except ValueError:
+        logger.warning(f"Invalid {name}={raw_value!r}, fallback to {default}.")
+        return default
+    return max(value, minimum)
+
+
+class WriteBehindQueue:
+    """Coalesce database writes and flush them from a background thread.
+
+    Every write is keyed, a newer write for the same key replaces the queued one,
+    so a hot key such as ``task_states`` costs one statement per flush no matter
+    how often it changes. Pending writes are flushed in insertion order inside
+    one transaction every ``flush_interval_ms`` or as soon as ``max_batch`` keys
+    are queued.
+    """
+
+    def __init__(self, execute_batch, flush_interval_ms: int, max_batch: int):
+        self._execute_batch = execute_batch
+        self.flush_interval_ms = flush_interval_ms
+        self.max_batch = max_batch
+        self._pending: dict = {}
+        self._cond = threading.Condition()
+        self._flushing = False
+        self._last_flush_failed = False
+        self._stopped = False
+        self._thread: threading.Thread = None
+
+        self.enqueued_total = 0
+        self.coalesced_total = 0
+        self.flushed_total = 0
+        self.flush_count = 0
+        self.failed_flush_count = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def start(self):
+        """Start the flush thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped = False
+        self._thread = threading.Thread(
+            target=self._run, name="db_write_behind", daemon=True
+        )
+        self._thread.start()
+
+    def put(self, key: tuple, op: tuple):
+        """Queue ``op`` (``(func, args)``) under ``key``, replacing an older one"""
+        with self._cond:
+            self.enqueued_total += 1
+            if self._pending.pop(key, None) is not None:
+                self.coalesced_total += 1
+            self._pending[key] = op
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify_all()
+
+    def drop(self, predicate: Callable[[tuple], bool]):
+        """Forget queued writes whose key matches ``predicate``"""
+        with self._cond:
+            for key in [key for key in self._pending if predicate(key)]:
+                del self._pending[key]
+                self.coalesced_total += 1
+
+    def peek(self, key: tuple):
+        """Return the queued op for ``key`` or None (read-your-writes)"""
+        with self._cond:
+            return self._pending.get(key)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until everything queued before this call is written"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify_all()
+            while self._pending or self._flushing:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                if not self._thread or not self._thread.is_alive():
+                    self._flush_locked()
+                    return not self._pending
+                self._cond.wait(min(remaining, 0.1))
+        return True
+
+    def stop(self, timeout: float = 10.0):
+        """Flush pending writes and stop the flush thread"""
+        self.flush(timeout)
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def _run(self):
+        interval = self.flush_interval_ms / 1000
+        with self._cond:
+            while not self._stopped:
+                if len(self._pending) < self.max_batch or self._last_flush_failed:
+                    self._cond.wait(interval)
+                self._flush_locked()
+
+    def _flush_locked(self):
+        """Write the current batch, called with ``self._cond`` held"""
+        if not self._pending:
+            return
+        batch = self._pending
+        self._pending = {}
+        self._flushing = True
+        self._cond.release()
+        ok = False
+        start = time.perf_counter()
+        try:
+            ok = self._execute_batch(list(batch.values()))
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._cond.acquire()
+            self._flushing = False
+            self.flush_count += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+            self._last_flush_failed = not ok
+            if ok:
+                self.flushed_total += len(batch)
+            else:
+                # Keep the failed batch in front of newer writes for the next try
+                self.failed_flush_count += 1
+                for key in self._pending:
+                    batch.pop(key, None)
+                batch.update(self._pending)
+                self._pending = batch
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        """Queue counters for the status API"""
+        with self._cond:
+            return {
+                "queue_depth": len(self._pending),
+                "enqueued_total": self.enqueued_total,
+                "coalesced_total": self.coalesced_total,
+                "flushed_total": self.flushed_total,
+                "flush_count": self.flush_count,
+                "failed_flush_count": self.failed_flush_count,
+                "last_flush_ms": round(self.last_flush_ms, 2),
+                "max_flush_ms": round(self.max_flush_ms, 2),
+                "avg_flush_ms": round(self.total_flush_ms / self.flush_count, 2)
+                if self.flush_count
+                else 0.0,
+                "flush_interval_ms": self.flush_interval_ms,
+                "max_batch": self.max_batch,
+            }
+
+
+def _on_event_loop() -> bool:
+    """True if the calling thread is running an asyncio event loop"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class BlockingConnectionPool(ThreadedConnectionPool):
+    """ThreadedConnectionPool that waits for a free connection instead of raising.
+
+    ``loop_reserve`` connections are kept for threads that run an event loop.
+    Their queries are synchronous and hold a connection only briefly, so a
+    loop does not wait behind worker, Flask and flush threads that took the
+    rest, which would freeze every coroutine on it.
+    """
+
+    def __init__(
+        self,
+        minconn: int,
+        maxconn: int,
+        *args,
+        timeout: float = 30,
+        loop_reserve: int = 1,
+        **kwargs,
+    ):
+        reserve = max(min(loop_reserve, maxconn - 1), 0)
+        self._slots = threading.BoundedSemaphore(maxconn - reserve)
+        self._loop_slots = threading.BoundedSemaphore(reserve) if reserve else None
+        # id(conn) -> the semaphore its slot was taken from
+        self._held: dict = {}
+        self._count_lock = threading.Lock()
+        self.timeout = timeout
+        self.in_use = 0
+        self.retired = False
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def _acquire_slot(self) -> threading.BoundedSemaphore:
+        slots = self._slots
+        if self._loop_slots and _on_event_loop():
+            for slots in (self._loop_slots, self._slots):
+                if slots.acquire(blocking=False):
+                    return slots
+            # only other loops hold the reserve, and never for long
+            slots = self._loop_slots
+        if not slots.acquire(timeout=self.timeout):
+            raise PoolError(f"no free connection after {self.timeout}s")
+        return slots
+
+    def getconn(self, key=None):
+        slots = self._acquire_slot()
+        try:
+            conn = super().getconn(key)
+        except Exception:
+            slots.release()
+            raise
+        with self._count_lock:
+            self.in_use += 1
+            self._held[id(conn)] = slots
+        return conn
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close or self.retired)
+        finally:
+            with self._count_lock:
+                self.in_use -= 1
+                slots = self._held.pop(id(conn), self._slots)
+                drained = self.retired and not self.in_use
+            slots.release()
+        if drained:
+            self._close_drained()
+
+    def retire(self):
+        """Close the pool without breaking the connections other threads
+        still use: idle connections are closed now, borrowed ones when they
+        are put back, and the pool once the last one is back"""
+        with self._count_lock:
+            self.retired = True
+            drained = not self.in_use
+        if drained:
+            self._close_drained()
+            return
+        with self._lock:
+            while self._pool:
+                conn = self._pool.pop()
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+    def _close_drained(self):
+        with self._lock:
+            if self.closed:
+                return
+        try:
+            self.closeall()
+        except PoolError:
+            # closed by a concurrent putconn
+            pass
+
+
 class DB:
     def __init__(self):
-        self.conn = None
+        self.pool: BlockingConnectionPool = None
         self.dsn = os.environ.get("DATABASE_URL")
+        self.pool_min = _load_int_env("DB_POOL_MIN", 1, 1)
+        self.pool_max = max(_load_int_env("DB_POOL_MAX", 5, 1), self.pool_min)
+        self.query_stats: dict = {}
+        self._stats_lock = threading.Lock()
+        self._executor: ThreadPoolExecutor = None
         self._heartbeat_thread = None
         self._stop_heartbeat = threading.Event()
         self.keepalive_app_name = os.environ.get(
@@ -23,6 +296,13 @@ class DB:
         self.keepalive_interval_seconds = self._load_keepalive_interval()
         self.last_keepalive_at = None
         self.last_keepalive_error = None
+        self.write_behind = None
+        if os.environ.get("DB_WRITE_BEHIND", "1").lower() not in ("0", "false", "off"):
+            self.write_behind = WriteBehindQueue(
+                self._execute_ops,
+                _load_int_env("DB_WRITE_BEHIND_INTERVAL_MS", 500, 10),
+                _load_int_env("DB_WRITE_BEHIND_MAX_BATCH", 200, 1),
+            )
 
         if not self.dsn:
             logger.warning(
@@ -31,18 +311,105 @@ class DB:
             return
 
         try:
-            self.conn = psycopg2.connect(self.dsn)
+            self.pool = self._create_pool()
             self._init_db()
             self._start_heartbeat()
+            if self.write_behind:
+                self.write_behind.start()
+                atexit.register(self.shutdown)
         except Exception as e:
             logger.error(f"Failed to connect to database: {e}")
-            self.conn = None
+            self.pool = None
+
+    @property
+    def conn(self):
+        """The connection pool, None if the database is not available.
+
+        Kept under this name for the ``if db.conn:`` checks across the code base.
+        """
+        return self.pool
+
+    def _create_pool(self) -> BlockingConnectionPool:
+        return BlockingConnectionPool(self.pool_min, self.pool_max, self.dsn)
+
+    @contextmanager
+    def _cursor(self, name: str):
+        """Borrow a pooled connection, commit on success and rollback on error.
+
+        ``name`` is the bucket the query time is recorded under.
+        """
+        pool = self.pool
+        if not pool:
+            raise psycopg2.InterfaceError("database is not connected")
+        conn = pool.getconn()
+        start = time.perf_counter()
+        broken = False
+        try:
+            with conn.cursor() as cur:
+                yield cur
+            conn.commit()
+        except Exception as e:
+            broken = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self._record_query(name, time.perf_counter() - start)
+            pool.putconn(conn, close=broken or bool(conn.closed))
+
+    def _record_query(self, name: str, elapsed: float):
+        elapsed_ms = elapsed * 1000
+        with self._stats_lock:
+            stat = self.query_stats.get(name)
+            if not stat:
+                stat = self.query_stats[name] = {
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                }
+            stat["count"] += 1
+            stat["total_ms"] += elapsed_ms
+            stat["max_ms"] = max(stat["max_ms"], elapsed_ms)
+
+    def get_query_stats(self) -> dict:
+        """Per-query timing, in milliseconds"""
+        with self._stats_lock:
+            return {
+                name: {
+                    "count": stat["count"],
+                    "avg_ms": round(stat["total_ms"] / stat["count"], 2),
+                    "max_ms": round(stat["max_ms"], 2),
+                    "total_ms": round(stat["total_ms"], 2),
+                }
+                for name, stat in self.query_stats.items()
+            }
+
+    async def run_async(self, func: Callable, *args):
+        """Run a blocking DB method on the DB thread pool from a coroutine"""
+        if not self._executor:
+            self._executor = ThreadPoolExecutor(
+                self.pool_max, thread_name_prefix="db"
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args)
+        )
+
+    async def load_setting_async(self, key):
+        """Async version of `load_setting`"""
+        return await self.run_async(self.load_setting, key)
+
+    async def save_setting_async(self, key, value):
+        """Async version of `save_setting`"""
+        return await self.run_async(self.save_setting, key, value)
 
     def _init_db(self):
-        if not self.conn:
+        if not self.pool:
             return
         try:
-            with self.conn.cursor() as cur:
+            with self._cursor("init_db") as cur:
                 cur.execute(
                     """
                     CREATE TABLE IF NOT EXISTS settings (
@@ -59,10 +426,64 @@ class DB:
                     );
                 """
                 )
-            self.conn.commit()
+                cur.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS download_history (
+                        profile_id VARCHAR(255) NOT NULL DEFAULT '',
+                        chat_id BIGINT NOT NULL,
+                        message_id BIGINT NOT NULL,
+                        completed_at DOUBLE PRECISION,
+                        info JSONB NOT NULL,
+                        PRIMARY KEY (profile_id, chat_id, message_id)
+                    );
+                """
+                )
+                self._migrate_download_history(cur)
         except Exception as e:
             logger.error(f"Failed to initialize database: {e}")
-            self.conn.rollback()
+
+    @staticmethod
+    def _history_row(chat_id, message_id, info: dict, profile_id=None) -> tuple:
+        """Build a download_history row, legacy items are stored with profile ''."""
+        return (
+            profile_id or info.get("profile_id") or "",
+            int(chat_id),
+            int(message_id),
+            info.get("end_time"),
+            json.dumps(info),
+        )
+
+    def _migrate_download_history(self, cur):
+        """Move the legacy one-blob `download_history` setting into rows.
+
+        Runs inside the `_init_db` transaction, the legacy setting is deleted in
+        the same transaction so the migration happens exactly once.
+        """
+        cur.execute("SELECT value FROM settings WHERE key = %s", ("download_history",))
+        result = cur.fetchone()
+        if not result:
+            return
+
+        rows = []
+        for chat_id, messages in (result[0] or {}).items():
+            for message_id, info in (messages or {}).items():
+                # Only completed downloads are history, see download_stat.init_stat
+                if info.get("down_byte", 0) >= info.get("total_size", 1):
+                    rows.append(self._history_row(chat_id, message_id, info))
+
+        if rows:
+            execute_values(
+                cur,
+                """
+                INSERT INTO download_history
+                    (profile_id, chat_id, message_id, completed_at, info)
+                VALUES %s
+                ON CONFLICT (profile_id, chat_id, message_id) DO NOTHING
+                """,
+                rows,
+            )
+        cur.execute("DELETE FROM settings WHERE key = %s", ("download_history",))
+        logger.info(f"Migrated {len(rows)} legacy download history items to table")
 
     def _load_keepalive_interval(self):
         raw_interval = os.environ.get("DB_KEEPALIVE_INTERVAL_SECONDS", "14400")
@@ -102,7 +523,7 @@ class DB:
 
     def _ping(self):
         """Write and read the keepalive row to verify real database access."""
-        if not self.conn:
+        if not self.pool:
             return
         try:
             self._run_keepalive_check()
@@ -116,23 +537,25 @@ class DB:
 
     def _reconnect(self):
         """Attempt to reconnect to database"""
+        old_pool = self.pool
         try:
-            if self.conn:
-                try:
-                    self.conn.close()
-                except:
-                    pass
-            self.conn = psycopg2.connect(self.dsn)
+            self.pool = self._create_pool()
             self._init_db()
             logger.info("Database reconnected successfully")
         except Exception as e:
             logger.error(f"Database reconnect failed: {e}")
-            self.conn = None
+            self.pool = None
+        if old_pool:
+            try:
+                # Connections still borrowed by other threads are closed on putconn
+                old_pool.retire()
+            except Exception:
+                pass
 
     def _run_keepalive_check(self):
         expected_heartbeat_at = None
 
-        with self.conn.cursor() as cur:
+        with self._cursor("keepalive_write") as cur:
             cur.execute(
                 """
                 INSERT INTO app_keepalive (app_name, heartbeat_at)
@@ -148,9 +571,7 @@ class DB:
                 raise RuntimeError("keepalive write did not return heartbeat_at")
             expected_heartbeat_at = row[0]
 
-        self.conn.commit()
-
-        with self.conn.cursor() as cur:
+        with self._cursor("keepalive_read") as cur:
             cur.execute(
                 "SELECT heartbeat_at FROM app_keepalive WHERE app_name = %s",
                 (self.keepalive_app_name,),
@@ -162,6 +583,20 @@ class DB:
         if row[0] != expected_heartbeat_at:
             raise RuntimeError("keepalive readback does not match the last write")
 
+    def shutdown(self):
+        """Flush queued writes and stop background threads"""
+        if self.write_behind:
+            self.write_behind.stop()
+        self.stop_heartbeat()
+        if self._executor:
+            self._executor.shutdown(wait=False)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until all queued writes are stored"""
+        if not self.write_behind:
+            return True
+        return self.write_behind.flush(timeout)
+
     def stop_heartbeat(self):
         """Stop heartbeat thread"""
         self._stop_heartbeat.set()
@@ -171,7 +606,7 @@ class DB:
     def get_heartbeat_status(self):
         """Get heartbeat status"""
         is_alive = self._heartbeat_thread and self._heartbeat_thread.is_alive()
-        is_connected = self.conn is not None
+        is_connected = self.pool is not None
         return {
             "heartbeat_active": is_alive,
             "connected": is_connected,
@@ -185,45 +620,176 @@ class DB:
                 self.last_keepalive_at.isoformat() if self.last_keepalive_at else None
             ),
             "last_keepalive_error": self.last_keepalive_error,
+            "write_behind": self.write_behind.stats() if self.write_behind else None,
+            "pool": {
+                "min": self.pool_min,
+                "max": self.pool_max,
+                "in_use": self.pool.in_use if self.pool else 0,
+            },
+            "queries": self.get_query_stats(),
         }
 
+    def _execute_ops(self, ops: list) -> bool:
+        """Run ``(func, args)`` write ops in one transaction"""
+        if not self.pool:
+            return False
+        try:
+            with self._cursor("write_batch") as cur:
+                for func, args in ops:
+                    func(cur, *args)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to write {len(ops)} queued db ops: {e}")
+        return False
+
+    def _submit(self, key: tuple, func: Callable, *args):
+        """Queue a write op, or run it right away if write-behind is disabled"""
+        if self.write_behind:
+            self.write_behind.put(key, (func, args))
+        else:
+            self._execute_ops([(func, args)])
+
+    @staticmethod
+    def _op_save_setting(cur, key, payload):
+        if payload is None:
+            # Delete the setting when value is None
+            cur.execute("DELETE FROM settings WHERE key = %s", (key,))
+        else:
+            cur.execute(
+                """
+                INSERT INTO settings (key, value)
+                VALUES (%s, %s)
+                ON CONFLICT (key) DO UPDATE
+                SET value = EXCLUDED.value
+            """,
+                (key, payload),
+            )
+
+    @staticmethod
+    def _op_save_download_history(cur, row):
+        cur.execute(
+            """
+            INSERT INTO download_history
+                (profile_id, chat_id, message_id, completed_at, info)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (profile_id, chat_id, message_id) DO UPDATE
+            SET completed_at = EXCLUDED.completed_at, info = EXCLUDED.info
+        """,
+            row,
+        )
+
+    @staticmethod
+    def _op_delete_download_history(cur, chat_id, message_id, profile_id):
+        if profile_id is None:
+            cur.execute(
+                "DELETE FROM download_history WHERE chat_id = %s AND message_id = %s",
+                (chat_id, message_id),
+            )
+        else:
+            cur.execute(
+                "DELETE FROM download_history "
+                "WHERE profile_id = %s AND chat_id = %s AND message_id = %s",
+                (profile_id, chat_id, message_id),
+            )
+
+    @staticmethod
+    def _op_clear_download_history(cur):
+        cur.execute("DELETE FROM download_history")
+
     def load_setting(self, key):
-        if not self.conn:
+        if not self.pool:
             return None
+        if self.write_behind:
+            queued = self.write_behind.peek(("settings", key))
+            if queued:
+                payload = queued[1][1]
+                return json.loads(payload) if payload is not None else None
         try:
-            with self.conn.cursor() as cur:
+            with self._cursor("load_setting") as cur:
                 cur.execute("SELECT value FROM settings WHERE key = %s", (key,))
                 result = cur.fetchone()
                 if result:
                     return result[0]
         except Exception as e:
             logger.error(f"Failed to load setting {key}: {e}")
-            self.conn.rollback()
         return None
 
     def save_setting(self, key, value):
-        if not self.conn:
+        if not self.pool:
             return
         try:
-            with self.conn.cursor() as cur:
-                if value is None:
-                    # Delete the setting when value is None
-                    cur.execute("DELETE FROM settings WHERE key = %s", (key,))
-                    print(f"DEBUG: [db] Deleted setting: {key}")
-                else:
-                    cur.execute(
-                        """
-                        INSERT INTO settings (key, value)
-                        VALUES (%s, %s)
-                        ON CONFLICT (key) DO UPDATE
-                        SET value = EXCLUDED.value
-                    """,
-                        (key, Json(value)),
-                    )
-            self.conn.commit()
+            # Serialize now, the caller keeps mutating its dicts while the
+            # write waits in the queue.
+            payload = None if value is None else json.dumps(value)
         except Exception as e:
             logger.error(f"Failed to save setting {key}: {e}")
-            self.conn.rollback()
+            return
+        self._submit(("settings", key), self._op_save_setting, key, payload)
+
+    def load_download_history(self) -> list:
+        """Load all download history rows.
+
+        Returns
+        -------
+        list
+            ``(profile_id, chat_id, message_id, info)`` tuples, ``profile_id`` is
+            None for items saved before multi-account support.
+        """
+        if not self.pool:
+            return []
+        self.flush()
+        try:
+            with self._cursor("load_download_history") as cur:
+                cur.execute(
+                    "SELECT profile_id, chat_id, message_id, info FROM download_history"
+                )
+                return [
+                    (profile_id or None, chat_id, message_id, info)
+                    for profile_id, chat_id, message_id, info in cur.fetchall()
+                ]
+        except Exception as e:
+            logger.error(f"Failed to load download history: {e}")
+        return []
+
+    def save_download_history(self, chat_id, message_id, info: dict, profile_id=None):
+        """Insert or update one completed download"""
+        if not self.pool:
+            return
+        try:
+            row = self._history_row(chat_id, message_id, info, profile_id)
+        except Exception as e:
+            logger.error(f"Failed to save download history {chat_id}/{message_id}: {e}")
+            return
+        self._submit(
+            ("download_history",) + row[:3], self._op_save_download_history, row
+        )
+
+    def delete_download_history(self, chat_id, message_id, profile_id=None):
+        """Delete one download history item, all profiles if profile_id is None"""
+        if not self.pool:
+            return
+        chat_id, message_id = int(chat_id), int(message_id)
+        if self.write_behind and profile_id is None:
+            # Queued upserts of any profile for this item are superseded
+            self.write_behind.drop(
+                lambda key: key[0] == "download_history"
+                and key[2:] == (chat_id, message_id)
+            )
+        self._submit(
+            ("download_history", profile_id, chat_id, message_id),
+            self._op_delete_download_history,
+            chat_id,
+            message_id,
+            profile_id,
+        )
+
+    def clear_download_history(self):
+        """Delete all download history rows"""
+        if not self.pool:
+            return
+        if self.write_behind:
+            self.write_behind.drop(lambda key: key[0] == "download_history")
+        self._submit(("download_history_clear",), self._op_clear_download_history)
 
 
 db = DB()
@@ -0,0 +1,321 @@
+"""Resumable and parallel media download"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Callable, Optional
+
+import pyrogram
+from loguru import logger
+
+# Size of the chunks GetFile returns, stream_media offsets count in chunks.
+CHUNK_SIZE = 1024 * 1024
+PART_SUFFIX = ".part"
+MANIFEST_SUFFIX = ".resume.json"
+# Persist the manifest at most this often while downloading.
+MANIFEST_INTERVAL = 1.0
+
+
+def _load_manifest(manifest_path: str) -> Optional[dict]:
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_manifest(manifest_path: str, manifest: dict):
+    """Write the manifest atomically, a crash never leaves it half written"""
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def get_resume_offset(
+    temp_file_name: str, file_unique_id: str, total_size: int
+) -> int:
+    """Return how many bytes of ``temp_file_name`` can be kept.
+
+    The partial file is only reused when its manifest names the same file
+    and size, and the offset is rounded down to a whole chunk because
+    stream_media can only start at a chunk boundary.
+    """
+    part_path = temp_file_name + PART_SUFFIX
+    manifest = _load_manifest(temp_file_name + MANIFEST_SUFFIX)
+    if (
+        not manifest
+        or manifest.get("file_unique_id") != file_unique_id
+        or manifest.get("total_size") != total_size
+        or not os.path.exists(part_path)
+    ):
+        return 0
+
+    offset = min(int(manifest.get("offset", 0)), os.path.getsize(part_path))
+    return offset - offset % CHUNK_SIZE
+
+
+def discard_partial(temp_file_name: str):
+    """Drop the partial file and manifest of a download"""
+    _remove(temp_file_name + PART_SUFFIX)
+    _remove(temp_file_name + MANIFEST_SUFFIX)
+
+
+async def download_media_resumable(
+    client: pyrogram.Client,
+    message: pyrogram.types.Message,
+    media,
+    temp_file_name: str,
+    progress: Callable = None,
+    progress_args: tuple = (),
+) -> Optional[str]:
+    """Download the media of ``message`` to ``temp_file_name``.
+
+    Data goes to ``<temp_file_name>.part`` with a sidecar
+    ``<temp_file_name>.resume.json`` manifest holding the file id, size and
+    byte offset written so far. A later call, e.g. after a restart, keeps the
+    bytes already on disk and continues with offset based ``stream_media``
+    requests.
+
+    Returns the path of the finished file like ``client.download_media``,
+    or None when the transfer was stopped. The partial file is kept in that
+    case so the next attempt resumes from it.
+    """
+    file_unique_id = getattr(media, "file_unique_id", "")
+    total_size = getattr(media, "file_size", 0) or 0
+    part_path = temp_file_name + PART_SUFFIX
+    manifest_path = temp_file_name + MANIFEST_SUFFIX
+
+    directory = os.path.dirname(temp_file_name)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    offset = get_resume_offset(temp_file_name, file_unique_id, total_size)
+    if offset:
+        logger.info(
+            f"Message[{message.id}]: resuming download at {offset} of {total_size} bytes"
+        )
+
+    manifest = {
+        "file_unique_id": file_unique_id,
+        "total_size": total_size,
+        "offset": offset,
+    }
+    _save_manifest(manifest_path, manifest)
+
+    last_saved = time.time()
+    with open(part_path, "r+b" if offset else "wb") as f:
+        f.truncate(offset)
+        f.seek(offset)
+        try:
+            async for chunk in client.stream_media(
+                message, offset=offset // CHUNK_SIZE
+            ):
+                f.write(chunk)
+                offset += len(chunk)
+
+                now = time.time()
+                if now - last_saved >= MANIFEST_INTERVAL:
+                    # The data has to reach the file before the manifest
+                    # claims it.
+                    f.flush()
+                    manifest["offset"] = offset
+                    _save_manifest(manifest_path, manifest)
+                    last_saved = now
+
+                if progress:
+                    await progress(offset, total_size, *progress_args)
+        except pyrogram.StopTransmission:
+            return None
+        finally:
+            # Stopped, failed or finished: record what is on disk
+            f.flush()
+            manifest["offset"] = offset
+            _save_manifest(manifest_path, manifest)
+
+    os.replace(part_path, temp_file_name)
+    _remove(manifest_path)
+    return temp_file_name
+
+
+def _missing_runs(parts: int, done: set, parallelism: int) -> list:
+    """Group the parts still to fetch into ``[first, last)`` runs.
+
+    Every run is fetched by one ``stream_media`` call, i.e. one media
+    session, so consecutive parts are merged and the largest runs are split
+    until there is one run per connection.
+    """
+    runs = []
+    start = None
+    for index in range(parts + 1):
+        missing = index < parts and index not in done
+        if missing and start is None:
+            start = index
+        elif not missing and start is not None:
+            runs.append((start, index))
+            start = None
+
+    while runs and len(runs) < parallelism:
+        longest = max(runs, key=lambda run: run[1] - run[0])
+        if longest[1] - longest[0] < 2:
+            break
+        middle = (longest[0] + longest[1]) // 2
+        pos = runs.index(longest)
+        runs[pos : pos + 1] = [(longest[0], middle), (middle, longest[1])]
+    return runs
+
+
+def _positional_writer(f):
+    """Return ``write(data, offset)`` on the file ``f``"""
+    if hasattr(os, "pwrite"):
+        fd = f.fileno()
+
+        def write(data: bytes, offset: int):
+            while data:
+                written = os.pwrite(fd, data, offset)
+                data = data[written:]
+                offset += written
+
+    else:
+        # No pwrite (Windows): the writes run on the event loop thread one at
+        # a time, so seek + write cannot interleave.
+        def write(data: bytes, offset: int):
+            f.seek(offset)
+            f.write(data)
+
+    return write
+
+
+async def download_media_parallel(
+    client: pyrogram.Client,
+    message: pyrogram.types.Message,
+    media,
+    temp_file_name: str,
+    part_size: int,
+    parallelism: int,
+    progress: Callable = None,
+    progress_args: tuple = (),
+) -> Optional[str]:
+    """Download the media of ``message`` over several connections.
+
+    The file is split into parts of ``part_size`` bytes (rounded up to whole
+    1 MiB chunks). Runs of parts are fetched concurrently, each with its own
+    ``stream_media`` call and so its own media session, by at most
+    ``parallelism`` connections. Data goes straight to its place in the
+    preallocated ``<temp_file_name>.part`` through positional writes. The
+    manifest records finished parts, so a stopped download only fetches the
+    missing parts again.
+
+    Files that fit in one part use :func:`download_media_resumable`.
+    """
+    file_unique_id = getattr(media, "file_unique_id", "")
+    total_size = getattr(media, "file_size", 0) or 0
+    chunks_per_part = max(-(-part_size // CHUNK_SIZE), 1)
+    part_size = chunks_per_part * CHUNK_SIZE
+    if parallelism < 2 or total_size <= part_size:
+        return await download_media_resumable(
+            client, message, media, temp_file_name, progress, progress_args
+        )
+
+    part_path = temp_file_name + PART_SUFFIX
+    manifest_path = temp_file_name + MANIFEST_SUFFIX
+    parts = -(-total_size // part_size)
+
+    directory = os.path.dirname(temp_file_name)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    manifest = _load_manifest(manifest_path)
+    if (
+        manifest
+        and manifest.get("file_unique_id") == file_unique_id
+        and manifest.get("total_size") == total_size
+        and manifest.get("part_size") == part_size
+        and os.path.exists(part_path)
+    ):
+        done = set(manifest.get("done", []))
+        logger.info(
+            f"Message[{message.id}]: resuming download, "
+            f"{len(done)} of {parts} parts already done"
+        )
+    else:
+        done = set()
+    manifest = {
+        "file_unique_id": file_unique_id,
+        "total_size": total_size,
+        "part_size": part_size,
+        "done": sorted(done),
+    }
+
+    def part_length(index: int) -> int:
+        return min(part_size, total_size - index * part_size)
+
+    downloaded = sum(part_length(index) for index in done)
+
+    with open(part_path, "r+b" if done else "wb") as f:
+        # Preallocate, the parts are written at their offsets
+        f.truncate(total_size)
+        _save_manifest(manifest_path, manifest)
+        write = _positional_writer(f)
+
+        def mark_done(index: int):
+            done.add(index)
+            f.flush()
+            manifest["done"] = sorted(done)
+            _save_manifest(manifest_path, manifest)
+
+        async def fetch_run(first: int, last: int):
+            nonlocal downloaded
+            position = first * part_size
+            index = first
+            filled = 0
+            async for chunk in client.stream_media(
+                message,
+                offset=first * chunks_per_part,
+                limit=(last - first) * chunks_per_part,
+            ):
+                write(chunk, position)
+                position += len(chunk)
+                filled += len(chunk)
+                downloaded += len(chunk)
+                while index < last and filled >= part_length(index):
+                    filled -= part_length(index)
+                    mark_done(index)
+                    index += 1
+                if progress:
+                    await progress(downloaded, total_size, *progress_args)
+
+        connections = asyncio.Semaphore(parallelism)
+
+        async def fetch_run_limited(first: int, last: int):
+            async with connections:
+                await fetch_run(first, last)
+
+        tasks = [
+            asyncio.ensure_future(fetch_run_limited(first, last))
+            for first, last in _missing_runs(parts, done, parallelism)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except pyrogram.StopTransmission:
+            return None
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    if len(done) != parts:
+        # A connection ended early, fetch the missing parts on the retry
+        raise pyrogram.errors.exceptions.bad_request_400.BadRequest()
+
+    os.replace(part_path, temp_file_name)
+    _remove(manifest_path)
+    return temp_file_name
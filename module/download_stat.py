@@ -1,5 +1,4 @@
 """Download Stat"""
-import asyncio
 import os
 import time
 from enum import Enum
@@ -7,7 +6,11 @@ from enum import Enum
 from pyrogram import Client
 
 from module.app import TaskNode
+from module.change_feed import task_feed
 from module.db import db
+from module.history_index import history_index
+from module.progress import progress_registry
+from module.task_control import task_control
 
 
 class DownloadState(Enum):
@@ -18,9 +21,6 @@ class DownloadState(Enum):
 
 
 _download_result: dict = {}
-_total_download_speed: int = 0
-_total_download_size: int = 0
-_last_download_time: float = time.time()
 _download_state: DownloadState = DownloadState.Downloading
 _task_states: dict = (
     {}
@@ -36,36 +36,8 @@ def get_download_result() -> dict:
 
 
 def get_total_download_speed() -> int:
-    """get total download speed. Uses sum of active task speeds as fallback."""
-    global _total_download_speed
-
-    cur_time = time.time()
-
-    # If no download activity for more than 5 seconds, reset to 0
-    if _total_download_speed > 0 and cur_time - _last_download_time > 5.0:
-        _total_download_speed = 0
-
-    # Fallback: If calculated speed is 0, but we have active downloads with speeds,
-    # use the sum of individual task speeds instead
-    if _total_download_speed == 0 and _download_result:
-        total_from_tasks = 0
-        for chat_msgs in _download_result.values():
-            for task_info in chat_msgs.values():
-                task_speed = task_info.get("download_speed", 0)
-                end_time = task_info.get("end_time", 0)
-                down_byte = task_info.get("down_byte", 0)
-                total_size = task_info.get("total_size", 1)
-                # Only count incomplete tasks updated within last 5 seconds
-                if (
-                    task_speed > 0
-                    and down_byte < total_size
-                    and (cur_time - end_time) < 5.0
-                ):
-                    total_from_tasks += int(task_speed)
-        if total_from_tasks > 0:
-            return total_from_tasks
-
-    return _total_download_speed
+    """get total download speed, rolling over the last few seconds"""
+    return progress_registry.total_speed()
 
 
 def get_download_state() -> DownloadState:
@@ -78,6 +50,7 @@ def set_download_state(state: DownloadState):
     """set download state"""
     global _download_state
     _download_state = state
+    task_control.notify_all()
     if db.conn:
         try:
             db.save_setting("download_state", state.value)
@@ -86,6 +59,29 @@ def set_download_state(state: DownloadState):
             print(f"Error saving download state: {e}")
 
 
+def _history_entry(chat_id: int, message_id: int, item: dict):
+    """Return the history index entry for a finished item, else None"""
+    if item.get("down_byte", 0) < item.get("total_size", 1):
+        return None
+    return (
+        chat_id,
+        message_id,
+        item.get("end_time") or item.get("created_at") or item.get("start_time"),
+        item.get("file_name", ""),
+        item.get("profile_id"),
+    )
+
+
+def _update_history_index(chat_id: int, message_id: int):
+    """Keep the history index in step with a changed download_result entry"""
+    item = _download_result.get(chat_id, {}).get(message_id)
+    entry = _history_entry(chat_id, message_id, item) if item else None
+    if entry:
+        history_index.add(*entry)
+    else:
+        history_index.discard(chat_id, message_id)
+
+
 def _pending_key(chat_id: int, message_id: int, profile_id: str = None) -> str:
     profile_part = profile_id or "legacy"
     return f"{profile_part}:{chat_id}_{message_id}"
@@ -224,6 +220,28 @@ def _load_pending_downloads():
             print(f"Error loading pending downloads: {e}")
 
 
+async def wait_task_runnable(chat_id: int, message_id: int, node: TaskNode) -> str:
+    """Wait while the task or all downloads are paused.
+
+    Returns the task state once it is running or deleted, or right away when
+    the node is stopped. Waiting costs nothing: the task is parked on an
+    event woken by set_task_state, set_download_state and
+    TaskNode.stop_transmission.
+    """
+    profile_id = getattr(node, "profile_id", None)
+
+    def is_runnable() -> bool:
+        if node.is_stop_transmission:
+            return True
+        state = get_task_state(chat_id, message_id, profile_id)
+        if state == "deleted":
+            return True
+        return state != "paused" and _download_state != DownloadState.StopDownload
+
+    await task_control.wait((chat_id, message_id), is_runnable)
+    return get_task_state(chat_id, message_id, profile_id)
+
+
 async def update_download_status(
     down_byte: int,
     total_size: int,
@@ -233,90 +251,67 @@ async def update_download_status(
     node: TaskNode,
     client: Client,
 ):
-    """update_download_status"""
-    cur_time = time.time()
-    # pylint: disable = W0603
-    global _total_download_speed
-    global _total_download_size
-    global _last_download_time
+    """update_download_status
 
+    Called for every chunk Pyrogram reports. The per-chunk work is an O(1)
+    update of the progress registry; ``_download_result`` and the change feed
+    are only written when the registry publishes (about once per second and
+    on completion).
+    """
     if node.is_stop_transmission:
         client.stop_transmission()
 
     chat_id = node.chat_id
 
     # --- Per-task Control ---
-    state = get_task_state(chat_id, message_id, node.profile_id)
-
-    if state == "deleted":
-        client.stop_transmission()
-        return
-
-    # Global or local pause check
-    while state == "paused" or get_download_state() == DownloadState.StopDownload:
-        if node.is_stop_transmission:
-            client.stop_transmission()
-        await asyncio.sleep(1)
-        # Re-check state
-        state = get_task_state(chat_id, message_id, node.profile_id)
-        if state == "deleted":
+    # _task_states only holds non-running tasks, skip the lookup when empty
+    if _task_states or _download_state == DownloadState.StopDownload:
+        # Global or local pause: park until resumed, deleted or stopped
+        state = await wait_task_runnable(chat_id, message_id, node)
+        if state == "deleted" or node.is_stop_transmission:
             client.stop_transmission()
             return
     # -----------------------
 
-    if not _download_result.get(chat_id):
-        _download_result[chat_id] = {}
-
-    if _download_result[chat_id].get(message_id):
-        last_download_byte = _download_result[chat_id][message_id]["down_byte"]
-        last_time = _download_result[chat_id][message_id]["end_time"]
-        download_speed = _download_result[chat_id][message_id]["download_speed"]
-        each_second_total_download = _download_result[chat_id][message_id][
-            "each_second_total_download"
-        ]
-        end_time = _download_result[chat_id][message_id]["end_time"]
-
-        _total_download_size += down_byte - last_download_byte
-        each_second_total_download += down_byte - last_download_byte
-
-        if cur_time - last_time >= 1.0:
-            download_speed = int(each_second_total_download / (cur_time - last_time))
-            end_time = cur_time
-            each_second_total_download = 0
-
-        download_speed = max(download_speed, 0)
-
-        _download_result[chat_id][message_id]["down_byte"] = down_byte
-        _download_result[chat_id][message_id]["end_time"] = end_time
-        _download_result[chat_id][message_id]["download_speed"] = download_speed
-        _download_result[chat_id][message_id]["profile_id"] = node.profile_id
-        _download_result[chat_id][message_id][
-            "each_second_total_download"
-        ] = each_second_total_download
-    else:
-        each_second_total_download = down_byte
-        _download_result[chat_id][message_id] = {
+    slot = progress_registry.update(
+        chat_id,
+        message_id,
+        down_byte,
+        total_size,
+        file_name,
+        start_time,
+        node.task_id,
+        node.profile_id,
+    )
+    if slot is None:
+        return
+
+    cur_time = slot.updated_at
+    chat_result = _download_result.setdefault(chat_id, {})
+    item = chat_result.get(message_id)
+    if item is None:
+        chat_result[message_id] = {
             "down_byte": down_byte,
             "total_size": total_size,
             "file_name": file_name,
             "start_time": start_time,
             "end_time": cur_time,
             "created_at": cur_time,
-            "download_speed": down_byte / (cur_time - start_time),
-            "each_second_total_download": each_second_total_download,
+            "download_speed": slot.speed(cur_time),
             "task_id": node.task_id,
             "profile_id": node.profile_id,
         }
-        _total_download_size += down_byte
+    else:
+        item["down_byte"] = down_byte
+        item["total_size"] = total_size
+        item["end_time"] = cur_time
+        item["download_speed"] = slot.speed(cur_time)
+        item["profile_id"] = node.profile_id
 
-    if cur_time - _last_download_time >= 1.0:
-        # update speed
-        _total_download_speed = int(
-            _total_download_size / (cur_time - _last_download_time)
-        )
-        _total_download_speed = max(_total_download_speed, 0)
-        _total_download_size = 0
-        _last_download_time = cur_time
+    task_feed.touch((chat_id, message_id))
+    if down_byte >= total_size:
+        progress_registry.finish(chat_id, message_id)
+        _update_history_index(chat_id, message_id)
 
 
 def verify_and_save_download(
@@ -389,12 +384,15 @@ def verify_and_save_download(
                 f"DEBUG: [stat] Updated existing record for chat={chat_id}, msg={message_id}"
             )
 
+        task_feed.touch((chat_id, message_id))
+        progress_registry.finish(chat_id, message_id)
+        _update_history_index(chat_id, message_id)
+
         # Save to DB
         if db.conn:
-            db.save_setting("download_history", _download_result)
-            print(
-                f"DEBUG: [stat] Saved history to DB, total chats={len(_download_result)}"
-            )
+            item = _download_result[chat_id][message_id]
+            db.save_download_history(chat_id, message_id, item, item.get("profile_id"))
+            print(f"DEBUG: [stat] Saved history item to DB, chat={chat_id}, msg={message_id}")
 
         # Clean up task state (no longer needed once completed)
         global _task_states
@@ -419,41 +417,26 @@ def init_stat():
     global _download_result
     try:
         if db.conn:
-            saved = db.load_setting("download_history")
-            if saved:
-                # Keys in JSON are strings, but we need int keys for chat_id and message_id
-                # to match the rest of the application logic.
-                restored = {}
-                incomplete_count = 0
-                for chat_id_str, messages in saved.items():
-                    chat_id = int(chat_id_str)
-                    restored[chat_id] = {}
-                    for msg_id_str, info in messages.items():
-                        msg_id = int(msg_id_str)
-                        # Only keep completed downloads (100%)
-                        # Incomplete downloads are cleared since they can't be resumed after restart
-                        if info.get("down_byte", 0) >= info.get("total_size", 1):
-                            restored[chat_id][msg_id] = info
-                        else:
-                            incomplete_count += 1
-
-                # Remove empty chat entries
-                restored = {k: v for k, v in restored.items() if v}
-
-                _download_result = restored
-                completed_count = sum(len(v) for v in restored.values())
-                print(f"DEBUG: [stat] Loaded {completed_count} completed items from DB")
-                if incomplete_count > 0:
-                    print(
-                        f"DEBUG: [stat] Cleaned {incomplete_count} incomplete/stale download records"
-                    )
-                    # Save the cleaned history back to DB
-                    db.save_setting("download_history", _download_result)
-            else:
-                _download_result = {}
+            # Keys in the DB are BIGINT, so chat_id and message_id are already
+            # int and match the rest of the application logic.
+            restored: dict = {}
+            for profile_id, chat_id, msg_id, info in db.load_download_history():
+                info["profile_id"] = profile_id or info.get("profile_id")
+                restored.setdefault(chat_id, {})[msg_id] = info
+
+            _download_result = restored
+            completed_count = sum(len(v) for v in restored.values())
+            print(f"DEBUG: [stat] Loaded {completed_count} completed items from DB")
     except Exception as e:
         print(f"Error loading download history: {e}")
         _download_result = {}
+    task_feed.reset()
+    entries = (
+        _history_entry(chat_id, msg_id, info)
+        for chat_id, messages in _download_result.items()
+        for msg_id, info in messages.items()
+    )
+    history_index.rebuild(entry for entry in entries if entry)
 
     # Load download state
     global _download_state
@@ -510,9 +493,11 @@ def clear_download_history():
             active[chat_id] = active_msgs
 
     _download_result = active
+    task_feed.reset()
+    history_index.clear()
 
     if db.conn:
-        db.save_setting("download_history", _download_result)
+        db.clear_download_history()
 
     # Also clear upload history
     from module.upload_stat import clear_upload_history
@@ -541,8 +526,16 @@ def remove_download_task(chat_id: int, message_id: int, profile_id: str = None):
             del _download_result[chat_id]
 
         if db.conn:
-            db.save_setting("download_history", _download_result)
+            # only the row of this profile, legacy rows are stored under ""
+            db.delete_download_history(
+                chat_id,
+                message_id,
+                None if profile_id is None else item.get("profile_id") or "",
+            )
 
+        task_feed.touch((chat_id, message_id))
+        progress_registry.finish(chat_id, message_id)
+        history_index.discard(chat_id, message_id)
         removed = True
 
     # Also remove from upload_result
@@ -576,9 +569,12 @@ def set_task_state(
     # If state is deleted, also remove from pending downloads
     if state == "deleted":
         remove_pending_download(chat_id, message_id, profile_id)
+        progress_registry.finish(int(chat_id), int(message_id))
 
     # Save to DB
     _save_task_states()
+    task_feed.touch((int(chat_id), int(message_id)))
+    task_control.notify((int(chat_id), int(message_id)))
 
     return True
 
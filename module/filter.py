@@ -1,14 +1,86 @@
 """Filter for download"""
 
+import operator
 import re
 from datetime import datetime
-from typing import Any, Optional, Tuple
+from typing import Any, List, Optional, Sequence, Tuple
 
 from ply import lex, yacc
 
 from utils.format import get_byte_from_str
 from utils.meta_data import MetaData, NoneObj, ReString
 
+_ARITHMETIC = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+}
+
+_ORDERING = {
+    ">": operator.gt,
+    "<": operator.lt,
+    ">=": operator.ge,
+    "<=": operator.le,
+}
+
+
+def check_operands(left: Any, right: Any):
+    """Raise ValueError when the operands of a comparison do not match"""
+    if left is None or left is NoneObj or right is None or right is NoneObj:
+        return
+    if isinstance(left, str):
+        if not isinstance(right, str) and not isinstance(right, ReString):
+            raise ValueError(f"{left} is str but {right} is not")
+    elif isinstance(left, int):
+        if not isinstance(right, int):
+            raise ValueError(f"{left} is int but {right} is not")
+    elif isinstance(left, bool):
+        if not isinstance(right, bool):
+            raise ValueError(f"{left} is bool but {right} is not")
+    elif isinstance(left, datetime):
+        if not isinstance(right, datetime):
+            raise ValueError(f"{left} is datetime but {right} is not")
+
+
+def eval_arithmetic(op: str, left: Any, right: Any) -> Any:
+    """``left op right`` for + - * /, a missing value counts as 0"""
+    check_operands(left, right)
+    if isinstance(left, NoneObj):
+        left = 0
+    if isinstance(right, NoneObj):
+        right = 0
+    return _ARITHMETIC[op](left, right)
+
+
+def eval_ordering(op: str, left: Any, right: Any) -> bool:
+    """``left op right`` for > < >= <="""
+    check_operands(left, right)
+    if isinstance(left, NoneObj) or isinstance(right, NoneObj):
+        return True
+    if left is None or right is None:
+        return False
+    return _ORDERING[op](left, right)
+
+
+def eval_equal(left: Any, right: Any, negate: bool = False) -> Any:
+    """``left == right``, a ReString operand is a full regex match"""
+    check_operands(left, right)
+    if isinstance(left, NoneObj) or isinstance(right, NoneObj):
+        return True
+    if left is None or right is None:
+        return False
+
+    if isinstance(right, ReString):
+        left, right = right, left
+    if isinstance(left, ReString):
+        if not isinstance(right, str):
+            return 0
+        matched = re.fullmatch(left.re_string, right, re.MULTILINE) is not None
+    else:
+        matched = left == right
+    return not matched if negate else matched
+
 
 # pylint: disable = R0904
 class BaseFilter:
@@ -27,7 +99,7 @@ class BaseFilter:
         # Build the lexer and parser
         # lex.lex(module=self)
         self.lexer = lex.lex(module=self)
-        self.yacc = yacc.yacc(module=self)
+        self.yacc = yacc.yacc(module=self, write_tables=False, debug=False)
 
     def reset(self):
         """Reset all symbol"""
@@ -145,38 +217,13 @@ class BaseFilter:
         | expression '-' expression
         | expression '*' expression
         | expression '/' expression"""
-        self.check_type(p)
-        if isinstance(p[1], NoneObj):
-            p[1] = 0
-        if isinstance(p[3], NoneObj):
-            p[3] = 0
-
-        if p[2] == "+":
-            p[0] = p[1] + p[3]
-        elif p[2] == "-":
-            p[0] = p[1] - p[3]
-        elif p[2] == "*":
-            p[0] = p[1] * p[3]
-        elif p[2] == "/":
-            p[0] = p[1] / p[3]
-
+        p[0] = eval_arithmetic(p[2], p[1], p[3])
         self._output(f"binop {p[1]} {p[2]} {p[3]} = {p[0]}")
 
     def p_expression_comp(self, p):
         """expression : expression '>' expression
         | expression '<' expression"""
-        self.check_type(p)
-        if isinstance(p[1], NoneObj) or isinstance(p[3], NoneObj):
-            p[0] = True
-            return
-
-        if p[1] is None or p[3] is None:
-            p[0] = False
-            return
-        if p[2] == ">":
-            p[0] = p[1] > p[3]
-        elif p[2] == "<":
-            p[0] = p[1] < p[3]
+        p[0] = eval_ordering(p[2], p[1], p[3])
 
     def p_expression_uminus(self, p):
         "expression : '-' expression %prec UMINUS"
@@ -184,84 +231,23 @@ class BaseFilter:
 
     def p_expression_ge(self, p):
         "expression : expression GE expression"
-        self.check_type(p)
-        if isinstance(p[1], NoneObj) or isinstance(p[3], NoneObj):
-            p[0] = True
-            return
-
-        if p[1] is None or p[3] is None:
-            p[0] = False
-            return
-
-        p[0] = p[1] >= p[3]
+        p[0] = eval_ordering(">=", p[1], p[3])
         self._output(f"{p[1]} {p[2]} {p[3]} {p[0]}")
 
     def p_expression_le(self, p):
         "expression : expression LE expression"
-        self.check_type(p)
-        if isinstance(p[1], NoneObj) or isinstance(p[3], NoneObj):
-            p[0] = True
-            return
-
-        if p[1] is None or p[3] is None:
-            p[0] = False
-            return
-
-        p[0] = p[1] <= p[3]
+        p[0] = eval_ordering("<=", p[1], p[3])
         self._output(f"{p[1]} {p[2]} {p[3]} = {p[0]}")
 
     def p_expression_eq(self, p):
         "expression : expression EQ expression"
-        self.check_type(p)
-        if isinstance(p[1], NoneObj) or isinstance(p[3], NoneObj):
-            p[0] = True
-            return
-
-        if p[1] is None or p[3] is None:
-            p[0] = False
-            return
-
-        if isinstance(p[3], ReString):
-            if not isinstance(p[1], str):
-                p[0] = 0
-                return
-            p[0] = re.fullmatch(p[3].re_string, p[1], re.MULTILINE) is not None
-            self._output(f"{p[1]} {p[2]} {p[3].re_string} {p[0]}")
-        elif isinstance(p[1], ReString):
-            if not isinstance(p[3], str):
-                p[0] = 0
-                return
-            p[0] = re.fullmatch(p[1].re_string, p[3], re.MULTILINE) is not None
-            self._output(f"{p[1]} {p[2]} {p[3].re_string} {p[0]}")
-        else:
-            p[0] = p[1] == p[3]
-            self._output(f"{p[1]} {p[2]} {p[3]} {p[0]}")
+        p[0] = eval_equal(p[1], p[3])
+        self._output(f"{p[1]} {p[2]} {p[3]} {p[0]}")
 
     def p_expression_ne(self, p):
         "expression : expression NE expression"
-        self.check_type(p)
-        if isinstance(p[1], NoneObj) or isinstance(p[3], NoneObj):
-            p[0] = True
-            return
-
-        if p[1] is None or p[3] is None:
-            p[0] = False
-            return
-        if isinstance(p[3], ReString):
-            if not isinstance(p[1], str):
-                p[0] = 0
-                return
-            p[0] = re.fullmatch(p[3].re_string, p[1], re.MULTILINE) is None
-            self._output(f"{p[1]} {p[2]} {p[3].re_string} {p[0]}")
-        elif isinstance(p[1], ReString):
-            if not isinstance(p[3], str):
-                p[0] = 0
-                return
-            p[0] = re.fullmatch(p[1].re_string, p[3], re.MULTILINE) is None
-            self._output(f"{p[1]} {p[2]} {p[3].re_string} {p[0]}")
-        else:
-            p[0] = p[1] != p[3]
-            self._output(f"{p[1]} {p[2]} {p[3]} = {p[0]}")
+        p[0] = eval_equal(p[1], p[3], negate=True)
+        self._output(f"{p[1]} {p[2]} {p[3]} = {p[0]}")
 
     def p_expression_group(self, p):
         "expression : '(' expression ')'"
@@ -323,46 +309,56 @@ class BaseFilter:
 
     def check_type(self, p):
         """Check filter type if is right"""
-        if p[1] is None or p[1] is NoneObj or p[3] is None or p[3] is NoneObj:
-            return
-        if isinstance(p[1], str):
-            if not isinstance(p[3], str) and not isinstance(p[3], ReString):
-                raise ValueError(f"{p[1]} is str but {p[3]} is not")
-        elif isinstance(p[1], int):
-            if not isinstance(p[3], int):
-                raise ValueError(f"{p[1]} is int but {p[3]} is not")
-        elif isinstance(p[1], bool):
-            if not isinstance(p[3], bool):
-                raise ValueError(f"{p[1]} is bool but {p[3]} is not")
-        elif isinstance(p[1], datetime):
-            if not isinstance(p[3], datetime):
-                raise ValueError(f"{p[1]} is datetime but {p[3]} is not")
+        check_operands(p[1], p[3])
 
 
 class Filter:
     """filter for telegram download"""
 
     def __init__(self):
+        # pylint: disable = C0415
+        from module.filter_compiler import filter_compiler
+
         self.filter = BaseFilter()
+        self.compiler = filter_compiler
+        self.meta_data: Optional[MetaData] = None
 
     def set_meta_data(self, meta_data: MetaData):
         """Set meta data for filter"""
-        self.filter.reset()
-        self.filter.names = meta_data.data()
+        self.meta_data = meta_data
 
     def set_debug(self, debug: bool):
         """Set Filter Debug Model"""
         self.filter.debug = debug
 
     def exec(self, filter_str: str) -> bool:
-        """Exec filter str"""
+        """Exec filter str.
 
-        if self.filter.names:
+        The filter is compiled once and evaluated against the meta data
+        attributes, in debug mode the tracing interpreter runs instead.
+        """
+
+        if self.meta_data is None:
+            raise ValueError("meta data cannot be empty!")
+        if self.filter.debug:
+            self.filter.reset()
+            self.filter.names = self.meta_data.data()
             res = self.filter.exec(filter_str)
-            if isinstance(res, bool):
-                return res
-            return False
-        raise ValueError("meta data cannot be empty!")
+        else:
+            res = self.compiler.compile(filter_str)(self.meta_data)
+        if isinstance(res, bool):
+            return res
+        return False
+
+    def exec_batch(self, filter_str: str, metas: Sequence[MetaData]) -> List[bool]:
+        """Exec filter str for every meta data of ``metas`` at once"""
+        if self.filter.debug:
+            result = []
+            for meta_data in metas:
+                self.set_meta_data(meta_data)
+                result.append(self.exec(filter_str))
+            return result
+        return self.compiler.get(filter_str).select(metas)
 
     def check_filter(self, filter_str: str) -> Tuple[bool, Optional[str]]:
         """check filter str"""
@@ -0,0 +1,275 @@
+"""Columnar evaluation of compiled download filters"""
+
+import operator
+import re
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence
+
+from module.filter import check_operands, eval_arithmetic, eval_equal, eval_ordering
+from utils.meta_data import MetaData, ReString
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+_ORDERING = {
+    ">": operator.gt,
+    "<": operator.lt,
+    ">=": operator.ge,
+    "<=": operator.le,
+}
+
+
+class _Unsupported(Exception):
+    """The batch cannot be evaluated column by column"""
+
+
+class _Scalar:
+    """A value shared by every row"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+
+class _Column:
+    """One filter name over every row of the batch"""
+
+    __slots__ = ("raw", "values", "valid", "kind", "first")
+
+    def __init__(self, raw: list, values, valid, kind: str, first: Any):
+        self.raw = raw
+        # None rows hold a placeholder in ``values`` and False in ``valid``
+        self.values = values
+        self.valid = valid
+        self.kind = kind
+        # First non None value, stands in for the interpreter type check
+        self.first = first
+
+
+def _kind(value: Any) -> str:
+    if isinstance(value, bool):
+        raise _Unsupported()
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, str):
+        return "str"
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return "datetime"
+    raise _Unsupported()
+
+
+def _column(raw: list) -> _Column:
+    valid = np.fromiter((value is not None for value in raw), bool, len(raw))
+    first = next((value for value in raw if value is not None), None)
+    if first is None:
+        return _Column(raw, np.zeros(len(raw), dtype=np.int64), valid, "none", None)
+
+    kind = _kind(first)
+    for value in raw:
+        if value is not None and _kind(value) != kind:
+            raise _Unsupported()
+    try:
+        if kind == "int":
+            values = np.array([value or 0 for value in raw], dtype=np.int64)
+        elif kind == "datetime":
+            values = np.array(
+                [value or first for value in raw], dtype="datetime64[us]"
+            )
+        else:
+            values = np.array([value or "" for value in raw], dtype=object)
+    except OverflowError as e:
+        raise _Unsupported() from e
+    return _Column(raw, values, valid, kind, first)
+
+
+def _numpy_scalar(value: Any, kind: str) -> Any:
+    if _kind(value) != kind:
+        raise _Unsupported()
+    if kind == "datetime":
+        return np.datetime64(value, "us")
+    return value
+
+
+class _Batch:
+    """The rows of one evaluation, columns are built on first use"""
+
+    def __init__(self, metas: Sequence[MetaData]):
+        self.metas = metas
+        self.size = len(metas)
+        self._columns: dict = {}
+
+    def column(self, name: str) -> _Column:
+        column = self._columns.get(name)
+        if column is None:
+            getter = operator.attrgetter(MetaData.FIELDS[name])
+            column = _column([getter(meta) for meta in self.metas])
+            self._columns[name] = column
+        return column
+
+    def mask(self, value: Any):
+        """Turn a node result into a mask of rows where it is True"""
+        if isinstance(value, _Scalar):
+            return np.full(self.size, value.value is True)
+        if isinstance(value, _Column):
+            raise _Unsupported()
+        return value
+
+
+def _representative(left, right):
+    """Values of the first row where both operands are set, or None"""
+    if isinstance(left, _Column) and isinstance(right, _Column):
+        both = left.valid & right.valid
+        if not both.any():
+            return None
+        row = int(both.argmax())
+        return left.raw[row], right.raw[row]
+    if isinstance(left, _Column):
+        return (left.first, right.value) if left.first is not None else None
+    return (left.value, right.first) if right.first is not None else None
+
+
+def _operands(left, right):
+    """Check types like the interpreter and return ``(valid, lhs, rhs)``"""
+    pair = _representative(left, right)
+    if pair is None:
+        return None
+    check_operands(*pair)
+
+    column = left if isinstance(left, _Column) else right
+    valid = column.valid
+    if isinstance(left, _Column) and isinstance(right, _Column):
+        if left.kind != right.kind:
+            raise _Unsupported()
+        valid = left.valid & right.valid
+        return valid, left.values, right.values
+    if isinstance(left, _Column):
+        return valid, left.values, _numpy_scalar(right.value, left.kind)
+    return valid, _numpy_scalar(left.value, right.kind), right.values
+
+
+def _order(op: str, left, right, batch: _Batch):
+    if isinstance(left, _Scalar) and isinstance(right, _Scalar):
+        return _Scalar(eval_ordering(op, left.value, right.value))
+    operands = _operands(left, right)
+    if operands is None:
+        return np.zeros(batch.size, dtype=bool)
+    valid, lhs, rhs = operands
+    return valid & np.asarray(_ORDERING[op](lhs, rhs), dtype=bool)
+
+
+def _regex(column: _Column, re_string: ReString, negate: bool, size: int):
+    pattern = re.compile(re_string.re_string, re.MULTILINE)
+    matched = np.fromiter(
+        (pattern.fullmatch(value) is not None for value in column.values),
+        bool,
+        size,
+    )
+    return column.valid & (~matched if negate else matched)
+
+
+def _equal(negate: bool, left, right, batch: _Batch):
+    if isinstance(left, _Scalar) and isinstance(right, _Scalar):
+        return _Scalar(eval_equal(left.value, right.value, negate))
+
+    scalar = left if isinstance(left, _Scalar) else right
+    if isinstance(scalar, _Scalar) and isinstance(scalar.value, ReString):
+        column = right if scalar is left else left
+        if column.first is None:
+            return np.zeros(batch.size, dtype=bool)
+        if scalar is right:
+            check_operands(column.first, scalar.value)
+        if column.kind != "str":
+            # A regex against anything but a string is never a match
+            return np.zeros(batch.size, dtype=bool)
+        return _regex(column, scalar.value, negate, batch.size)
+
+    operands = _operands(left, right)
+    if operands is None:
+        return np.zeros(batch.size, dtype=bool)
+    valid, lhs, rhs = operands
+    if negate:
+        return valid & np.asarray(lhs != rhs, dtype=bool)
+    return valid & np.asarray(lhs == rhs, dtype=bool)
+
+
+def _evaluate(node: tuple, batch: _Batch):
+    kind = node[0]
+    if kind == "const":
+        return _Scalar(node[1])
+    if kind == "name":
+        return batch.column(node[1])
+    if kind == "neg":
+        operand = _evaluate(node[1], batch)
+        if isinstance(operand, _Scalar):
+            return _Scalar(-operand.value)
+        raise _Unsupported()
+    if kind in ("and", "or"):
+        left = _evaluate(node[1], batch)
+        right = _evaluate(node[2], batch)
+        if isinstance(left, _Scalar):
+            # ``5 and x`` is x, ``5 or x`` is 5: only the truth of a constant
+            # left side matters
+            if bool(left.value) == (kind == "and"):
+                return right
+            return left
+        if kind == "and":
+            return batch.mask(left) & batch.mask(right)
+        return batch.mask(left) | batch.mask(right)
+
+    left = _evaluate(node[2], batch)
+    right = _evaluate(node[3], batch)
+    if kind == "arith":
+        if isinstance(left, _Scalar) and isinstance(right, _Scalar):
+            return _Scalar(eval_arithmetic(node[1], left.value, right.value))
+        # int64 would wrap around silently where Python ints do not
+        raise _Unsupported()
+    if kind == "order":
+        return _order(node[1], left, right, batch)
+    return _equal(node[1], left, right, batch)
+
+
+class BatchPredicate:
+    """Evaluate a filter AST over many :class:`MetaData` at once.
+
+    With NumPy every name the filter uses becomes one array over the batch
+    (ints, naive datetimes and strings, with a validity mask for None), and
+    every comparison is one vectorized operation. Type checks run once per
+    comparison against the first row that has a value, so a bad filter fails
+    with the same ValueError as the interpreter.
+
+    Anything the arrays cannot express exactly, e.g. arithmetic on a name,
+    mixed types in a column or a non boolean result, and every batch when
+    NumPy is not installed, falls back to the row predicate.
+    """
+
+    def __init__(self, ast: tuple, predicate: Callable[[MetaData], Any]):
+        self.ast = ast
+        self.predicate = predicate
+
+    def _rows(self, metas: Sequence[MetaData]) -> List[bool]:
+        return [self.predicate(meta) is True for meta in metas]
+
+    def __call__(self, metas: Sequence[MetaData]) -> List[bool]:
+        """Return for every meta data if the filter selects it"""
+        if np is None or not metas:
+            return self._rows(metas)
+        batch = _Batch(metas)
+        try:
+            result = batch.mask(_evaluate(self.ast, batch))
+        except _Unsupported:
+            return self._rows(metas)
+        return result.tolist()
+
+    def vectorized(self, metas: Sequence[MetaData]) -> Optional[bool]:
+        """True if ``metas`` would be evaluated with NumPy, None without it"""
+        if np is None:
+            return None
+        batch = _Batch(metas)
+        try:
+            batch.mask(_evaluate(self.ast, batch))
+        except _Unsupported:
+            return False
+        return True
@@ -0,0 +1,276 @@
+"""Compile download filters into cached Python predicates"""
+
+import operator
+import re
+import threading
+from collections import OrderedDict
+from functools import partial
+from typing import Any, Callable, List, Optional, Sequence
+
+from ply import lex, yacc
+
+from module.filter import BaseFilter, eval_arithmetic, eval_equal, eval_ordering
+from module.filter_batch import BatchPredicate
+from utils.meta_data import MetaData, ReString
+
+# A compiled filter: ``predicate(meta_data)`` returns the filter value
+Predicate = Callable[[MetaData], Any]
+
+
+class _Constant:
+    """Node of a literal, or of an expression folded at compile time"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __call__(self, meta_data: MetaData) -> Any:
+        return self.value
+
+
+def _binary(evaluate: Callable, left: Predicate, right: Predicate) -> Predicate:
+    """Node applying ``evaluate(left, right)``, folded if both are constant"""
+    if isinstance(left, _Constant) and isinstance(right, _Constant):
+        return _Constant(evaluate(left.value, right.value))
+    if isinstance(right, _Constant):
+        right_value = right.value
+        return lambda meta_data: evaluate(left(meta_data), right_value)
+    if isinstance(left, _Constant):
+        left_value = left.value
+        return lambda meta_data: evaluate(left_value, right(meta_data))
+    return lambda meta_data: evaluate(left(meta_data), right(meta_data))
+
+
+def _equal(left: Predicate, right: Predicate, negate: bool) -> Predicate:
+    """Equality node, a constant regex is compiled once"""
+    if isinstance(right, _Constant) and isinstance(right.value, ReString):
+        operand, re_string, regex_left = left, right.value, False
+    elif isinstance(left, _Constant) and isinstance(left.value, ReString):
+        operand, re_string, regex_left = right, left.value, True
+    else:
+        return _binary(partial(eval_equal, negate=negate), left, right)
+    if isinstance(operand, _Constant):
+        return _binary(partial(eval_equal, negate=negate), left, right)
+
+    pattern = re.compile(re_string.re_string, re.MULTILINE)
+
+    def match(meta_data: MetaData) -> Any:
+        value = operand(meta_data)
+        if isinstance(value, str):
+            matched = pattern.fullmatch(value) is not None
+            return not matched if negate else matched
+        # Leave the type checks and None handling to the interpreter rules
+        if regex_left:
+            return eval_equal(re_string, value, negate)
+        return eval_equal(value, re_string, negate)
+
+    return match
+
+
+def _logical(is_and: bool, left: Predicate, right: Predicate) -> Predicate:
+    """``and``/``or`` node.
+
+    Both sides are evaluated like the interpreter does, so a type error on
+    the right still surfaces when the left side decides the result.
+    """
+
+    def evaluate(left_value, right_value):
+        if is_and:
+            return left_value and right_value
+        return left_value or right_value
+
+    return _binary(evaluate, left, right)
+
+
+def lower(node: tuple) -> Predicate:
+    """Turn a filter AST into a predicate over one :class:`MetaData`.
+
+    Nodes are tuples: ``("const", value)``, ``("name", name)``,
+    ``("arith", op, left, right)``, ``("order", op, left, right)``,
+    ``("eq", negate, left, right)``, ``("neg", operand)``,
+    ``("and", left, right)`` and ``("or", left, right)``.
+    """
+    kind = node[0]
+    if kind == "const":
+        return _Constant(node[1])
+    if kind == "name":
+        return operator.attrgetter(MetaData.FIELDS[node[1]])
+    if kind == "neg":
+        operand = lower(node[1])
+        if isinstance(operand, _Constant):
+            return _Constant(-operand.value)
+        return lambda meta_data: -operand(meta_data)
+    if kind in ("and", "or"):
+        return _logical(kind == "and", lower(node[1]), lower(node[2]))
+
+    left, right = lower(node[2]), lower(node[3])
+    if kind == "arith":
+        return _binary(partial(eval_arithmetic, node[1]), left, right)
+    if kind == "order":
+        return _binary(partial(eval_ordering, node[1]), left, right)
+    return _equal(left, right, negate=node[1])
+
+
+class CompiledFilter:
+    """A parsed filter with its row predicate and, built on first use, its
+    batch evaluator"""
+
+    __slots__ = ("ast", "predicate", "_batch")
+
+    def __init__(self, ast: tuple):
+        self.ast = ast
+        self.predicate = lower(ast)
+        self._batch: Optional[BatchPredicate] = None
+
+    def __call__(self, meta_data: MetaData) -> Any:
+        return self.predicate(meta_data)
+
+    def select(self, metas: Sequence[MetaData]) -> List[bool]:
+        """Return for every meta data if the filter selects it"""
+        if self._batch is None:
+            self._batch = BatchPredicate(self.ast, self.predicate)
+        return self._batch(metas)
+
+
+# pylint: disable = C0116
+class FilterCompiler(BaseFilter):
+    """Parse filters once into closures over :class:`MetaData` attributes.
+
+    The grammar actions of :class:`BaseFilter` are replaced by ones that
+    build an AST, which :func:`lower` turns into a predicate. Names resolve
+    to attribute reads through ``MetaData.FIELDS``, literals and
+    sub-expressions made of literals are folded, and constant regexes are
+    compiled once. Evaluation follows the interpreter: the same type checks,
+    ``None`` handling and error messages.
+
+    Compiled filters are kept in an LRU cache keyed by the filter string,
+    so a chat scan parses its filter once instead of once per message.
+    """
+
+    def __init__(self, cache_size: int = 256):
+        # pylint: disable = W0231
+        self.names: dict = {}
+        self.debug = False
+        self.cache_size = cache_size
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.lexer = lex.lex(module=self)
+        self.yacc = yacc.yacc(module=self, write_tables=False, debug=False)
+
+    def get(self, filter_str: str) -> CompiledFilter:
+        """Return the compiled ``filter_str``, parsing it on a cache miss.
+
+        Raises ValueError for a syntax error, an unknown name or mismatched
+        literal types, like :meth:`BaseFilter.exec`.
+        """
+        with self._lock:
+            compiled = self._cache.get(filter_str)
+            if compiled is not None:
+                self._cache.move_to_end(filter_str)
+                return compiled
+
+            compiled = CompiledFilter(self.yacc.parse(filter_str, lexer=self.lexer))
+            self._cache[filter_str] = compiled
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return compiled
+
+    def compile(self, filter_str: str) -> Predicate:
+        """Return the row predicate of ``filter_str``"""
+        return self.get(filter_str).predicate
+
+    def cache_clear(self):
+        """Drop every compiled filter"""
+        with self._lock:
+            self._cache.clear()
+
+    def p_statement_assign(self, p):
+        'statement : NAME "=" expression'
+        # Like the interpreter, this compares the name itself, not its value
+        p[0] = ("eq", False, ("const", p[1]), p[3])
+
+    def p_statement_expr(self, p):
+        "statement : expression"
+        p[0] = p[1]
+
+    def p_expression_binop(self, p):
+        """expression : expression '+' expression
+        | expression '-' expression
+        | expression '*' expression
+        | expression '/' expression"""
+        p[0] = ("arith", p[2], p[1], p[3])
+
+    def p_expression_comp(self, p):
+        """expression : expression '>' expression
+        | expression '<' expression"""
+        p[0] = ("order", p[2], p[1], p[3])
+
+    def p_expression_uminus(self, p):
+        "expression : '-' expression %prec UMINUS"
+        p[0] = ("neg", p[2])
+
+    def p_expression_ge(self, p):
+        "expression : expression GE expression"
+        p[0] = ("order", ">=", p[1], p[3])
+
+    def p_expression_le(self, p):
+        "expression : expression LE expression"
+        p[0] = ("order", "<=", p[1], p[3])
+
+    def p_expression_eq(self, p):
+        "expression : expression EQ expression"
+        p[0] = ("eq", False, p[1], p[3])
+
+    def p_expression_ne(self, p):
+        "expression : expression NE expression"
+        p[0] = ("eq", True, p[1], p[3])
+
+    def p_expression_group(self, p):
+        "expression : '(' expression ')'"
+        p[0] = p[2]
+
+    def p_expression_number(self, p):
+        "expression : NUMBER"
+        p[0] = ("const", p[1])
+
+    def p_expression_time(self, p):
+        "expression : TIME"
+        p[0] = ("const", p[1])
+
+    def p_expression_byte(self, p):
+        "expression : BYTE"
+        p[0] = ("const", p[1])
+
+    def p_expression_name(self, p):
+        "expression : NAME"
+        if p[1] not in MetaData.FIELDS:
+            raise ValueError(f"Undefined name {p[1]}")
+        p[0] = ("name", p[1])
+
+    def p_expression_lor(self, p):
+        "expression : expression LOR expression"
+        p[0] = ("or", p[1], p[3])
+
+    def p_expression_land(self, p):
+        "expression : expression LAND expression"
+        p[0] = ("and", p[1], p[3])
+
+    def p_expression_or(self, p):
+        "expression : expression OR expression"
+        p[0] = ("or", p[1], p[3])
+
+    def p_expression_and(self, p):
+        "expression : expression AND expression"
+        p[0] = ("and", p[1], p[3])
+
+    def p_expression_string(self, p):
+        "expression : STRING"
+        p[0] = ("const", p[1])
+
+    def p_expression_restring(self, p):
+        "expression : RESTRING"
+        p[0] = ("const", ReString(p[1]))
+
+
+filter_compiler = FilterCompiler()
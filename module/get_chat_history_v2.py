@@ -1,13 +1,20 @@
 """Rewrite pyrogram.get_chat_history"""
 
+import asyncio
 from datetime import datetime
 from typing import AsyncGenerator, Optional, Union
 
 import pyrogram
+from loguru import logger
 
 # pylint: disable = W0611
 from pyrogram import raw, types, utils
 
+from module.rate_limiter import HISTORY, rate_limiter
+
+# FloodWaits of one chunk waited out before the reader gives up
+FLOOD_RETRIES = 3
+
 
 async def get_chunk_v2(
     *,
@@ -47,6 +54,51 @@ async def get_chunk_v2(
     return messages
 
 
+async def _get_history_chunk(
+    client: pyrogram.Client,
+    chat_id: Union[int, str],
+    limit: int,
+    max_id: int,
+    offset: int,
+    offset_id: int,
+    offset_date: datetime,
+    reverse: bool,
+) -> list:
+    """Get the chunk after ``offset_id``, waiting out up to
+    ``FLOOD_RETRIES`` FloodWaits"""
+    for attempt in range(FLOOD_RETRIES + 1):
+        await rate_limiter.acquire(client, HISTORY)
+        try:
+            messages = await get_chunk_v2(
+                client=client,
+                chat_id=chat_id,
+                limit=limit,
+                offset=offset,
+                max_id=max_id + 1 if max_id else 0,
+                from_message_id=offset_id,
+                from_date=offset_date,
+                reverse=reverse,
+            )
+            break
+        except pyrogram.errors.FloodWait as wait_err:
+            logger.warning(f"Reading history of {chat_id}: FloodWait {wait_err.value}")
+            # the next acquire waits until the FloodWait is over
+            rate_limiter.flood_wait(client, HISTORY, wait_err.value)
+            if attempt == FLOOD_RETRIES:
+                raise
+
+    if not messages:
+        break_count = offset_id - 1
+        async for message in client.get_chat_history(chat_id):
+            if break_count:
+                break_count -= 1
+                continue
+            if len(messages) >= limit + 1:
+                break
+            messages.append(message)
+    return messages
+
+
 # pylint: disable = C0301
 async def get_chat_history_v2(
     self: pyrogram.Client,
@@ -57,42 +109,122 @@ async def get_chat_history_v2(
     offset_id: int = 0,
     offset_date: datetime = utils.zero_datetime(),
     reverse: bool = False,
+    read_ahead: int = 0,
 ) -> Optional[AsyncGenerator["types.Message", None]]:
-    """Get messages from a chat history."""
+    """Get messages from a chat history.
+
+    With ``read_ahead`` > 0 a background task requests the next chunks while
+    the caller is still working through the current one. At most
+    ``read_ahead`` chunks wait in the buffer, so memory stays bounded no
+    matter how long the chat is.
+    """
     current = 0
     total = limit or (1 << 31) - 1
     limit = min(100, total)
 
-    while True:
-        messages = await get_chunk_v2(
-            client=self,
-            chat_id=chat_id,
-            limit=limit,
-            offset=offset,
-            max_id=max_id + 1 if max_id else 0,
-            from_message_id=offset_id,
-            from_date=offset_date,
-            reverse=reverse,
+    if read_ahead > 0:
+        chunks = _read_ahead(
+            self,
+            chat_id,
+            total,
+            limit,
+            max_id,
+            offset,
+            offset_id,
+            offset_date,
+            reverse,
+            read_ahead,
         )
+    else:
+        chunks = _read_sequential(
+            self, chat_id, limit, max_id, offset, offset_id, offset_date, reverse
+        )
+
+    try:
+        async for messages in chunks:
+            for message in messages:
+                yield message
+
+                current += 1
 
+                if current >= total:
+                    return
+    finally:
+        await chunks.aclose()
+
+
+async def _read_sequential(
+    client: pyrogram.Client,
+    chat_id: Union[int, str],
+    limit: int,
+    max_id: int,
+    offset: int,
+    offset_id: int,
+    offset_date: datetime,
+    reverse: bool,
+) -> AsyncGenerator[list, None]:
+    """Yield chunks, requesting each only when the previous one is consumed"""
+    while True:
+        messages = await _get_history_chunk(
+            client, chat_id, limit, max_id, offset, offset_id, offset_date, reverse
+        )
         if not messages:
-            break_count = offset_id - 1
-            async for message in self.get_chat_history(chat_id):
-                if break_count:
-                    break_count -= 1
-                    continue
-                if len(messages) >= limit + 1:
-                    break
-                messages.append(message)
-            if not messages:
-                return
+            return
 
         offset_id = messages[-1].id + (1 if reverse else 0)
+        yield messages
 
-        for message in messages:
-            yield message
-
-            current += 1
 
-            if current >= total:
+async def _read_ahead(
+    client: pyrogram.Client,
+    chat_id: Union[int, str],
+    total: int,
+    limit: int,
+    max_id: int,
+    offset: int,
+    offset_id: int,
+    offset_date: datetime,
+    reverse: bool,
+    depth: int,
+) -> AsyncGenerator[list, None]:
+    """Yield chunks fetched by a producer running up to ``depth`` chunks ahead"""
+    buffer: asyncio.Queue = asyncio.Queue(maxsize=depth)
+
+    async def produce():
+        fetched = 0
+        next_offset_id = offset_id
+        try:
+            while fetched < total:
+                messages = await _get_history_chunk(
+                    client,
+                    chat_id,
+                    limit,
+                    max_id,
+                    offset,
+                    next_offset_id,
+                    offset_date,
+                    reverse,
+                )
+                if not messages:
+                    break
+                next_offset_id = messages[-1].id + (1 if reverse else 0)
+                fetched += len(messages)
+                await buffer.put(messages)
+        except Exception as e:
+            # Raised in the consumer, where the sequential reader raises it
+            await buffer.put(e)
+            return
+        await buffer.put(None)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            messages = await buffer.get()
+            if messages is None:
                 return
+            if isinstance(messages, Exception):
+                raise messages
+            yield messages
+    finally:
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
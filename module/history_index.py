@@ -0,0 +1,200 @@
+"""Sorted in-memory index over completed downloads"""
+
+import os
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Hashable, List, Optional, Tuple
+
+SORT_FIELDS = ("completed_at", "filename")
+
+
+class HistoryIndex:
+    """Keep completed downloads sorted by completion time and file name.
+
+    Every entry is stored in a few sorted lists of tuples ending with the
+    ``(chat_id, message_id)`` key, so a page of the history is a slice of one
+    list instead of a walk over the whole ``download_result``:
+
+    * ``by_time``   - ``(completed_at, chat_id, message_id)``
+    * ``by_name``   - ``(file_name, chat_id, message_id)``, for prefix search
+    * ``by_chat``   - per chat ``by_time`` list
+    * ``by_profile`` - per profile ``by_time`` list
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (chat_id, message_id) -> (completed_at, file_name, profile_id)
+        self._entries: dict = {}
+        self._by_time: list = []
+        self._by_name: list = []
+        self._by_chat: dict = {}
+        self._by_profile: dict = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    @staticmethod
+    def _name_key(file_name: str) -> str:
+        return os.path.basename((file_name or "").replace("\\", "/")).lower()
+
+    @staticmethod
+    def _remove(sorted_list: list, item: tuple):
+        pos = bisect_left(sorted_list, item)
+        if pos < len(sorted_list) and sorted_list[pos] == item:
+            del sorted_list[pos]
+
+    def _discard_locked(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        completed_at, name, profile_id = entry
+        time_item = (completed_at, *key)
+        self._remove(self._by_time, time_item)
+        self._remove(self._by_name, (name, *key))
+        for index, group in ((self._by_chat, key[0]), (self._by_profile, profile_id)):
+            items = index.get(group)
+            if items is not None:
+                self._remove(items, time_item)
+                if not items:
+                    del index[group]
+
+    def add(
+        self,
+        chat_id: int,
+        message_id: int,
+        completed_at: float,
+        file_name: str,
+        profile_id: Optional[str] = None,
+    ):
+        """Insert or move a completed download"""
+        key = (chat_id, message_id)
+        entry = (float(completed_at or 0), self._name_key(file_name), profile_id)
+        with self._lock:
+            if self._entries.get(key) == entry:
+                return
+            self._discard_locked(key)
+            self._entries[key] = entry
+            time_item = (entry[0], *key)
+            insort(self._by_time, time_item)
+            insort(self._by_name, (entry[1], *key))
+            insort(self._by_chat.setdefault(chat_id, []), time_item)
+            insort(self._by_profile.setdefault(profile_id, []), time_item)
+
+    def rebuild(self, entries):
+        """Replace the index with ``(chat_id, message_id, completed_at,
+        file_name, profile_id)`` tuples, sorting once instead of per insert.
+        """
+        with self._lock:
+            self._entries = {
+                (chat_id, message_id): (
+                    float(completed_at or 0),
+                    self._name_key(file_name),
+                    profile_id,
+                )
+                for chat_id, message_id, completed_at, file_name, profile_id in entries
+            }
+            self._by_time = []
+            self._by_name = []
+            self._by_chat = {}
+            self._by_profile = {}
+            for key, (completed_at, name, profile_id) in self._entries.items():
+                time_item = (completed_at, *key)
+                self._by_time.append(time_item)
+                self._by_name.append((name, *key))
+                self._by_chat.setdefault(key[0], []).append(time_item)
+                self._by_profile.setdefault(profile_id, []).append(time_item)
+            self._by_time.sort()
+            self._by_name.sort()
+            for index in (self._by_chat, self._by_profile):
+                for items in index.values():
+                    items.sort()
+
+    def discard(self, chat_id: int, message_id: int):
+        """Remove a download from the index if present"""
+        with self._lock:
+            self._discard_locked((chat_id, message_id))
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._by_time.clear()
+            self._by_name.clear()
+            self._by_chat.clear()
+            self._by_profile.clear()
+
+    def query(
+        self,
+        offset: int = 0,
+        limit: int = 50,
+        sort: str = "completed_at",
+        descending: bool = True,
+        chat_id: Optional[int] = None,
+        profile_id: Optional[str] = None,
+        prefix: Optional[str] = None,
+    ) -> Tuple[int, List[tuple]]:
+        """Return ``(total, keys)`` for one page of matching downloads.
+
+        Without filters a page is a slice of a sorted list. A filter picks the
+        narrowest list first (file name prefix, then chat, then profile) and
+        only the matching candidates are checked against the other filters.
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"unsupported sort field {sort}")
+        offset = max(int(offset), 0)
+        limit = max(int(limit), 0)
+
+        with self._lock:
+            if prefix:
+                name = prefix.lower()
+                start = bisect_left(self._by_name, (name,))
+                end = bisect_right(self._by_name, (name + "\U0010ffff",))
+                candidates = self._by_name[start:end]
+                if chat_id is not None or profile_id is not None:
+                    candidates = [
+                        item
+                        for item in candidates
+                        if self._match(item[1:], chat_id, profile_id)
+                    ]
+                if sort == "completed_at":
+                    candidates = sorted(
+                        (self._entries[item[1:]][0], *item[1:]) for item in candidates
+                    )
+            elif chat_id is not None or profile_id is not None:
+                if chat_id is not None:
+                    candidates = self._by_chat.get(chat_id, [])
+                    if profile_id is not None:
+                        candidates = [
+                            item
+                            for item in candidates
+                            if self._entries[item[1:]][2] == profile_id
+                        ]
+                else:
+                    candidates = self._by_profile.get(profile_id, [])
+                if sort == "filename":
+                    candidates = sorted(
+                        (self._entries[item[1:]][1], *item[1:]) for item in candidates
+                    )
+            else:
+                candidates = self._by_time if sort == "completed_at" else self._by_name
+
+            total = len(candidates)
+            if descending:
+                end = max(total - offset, 0)
+                page = candidates[max(end - limit, 0) : end][::-1]
+            else:
+                page = candidates[offset : offset + limit]
+            return total, [item[1:] for item in page]
+
+    def _match(self, key, chat_id, profile_id) -> bool:
+        if chat_id is not None and key[0] != chat_id:
+            return False
+        if profile_id is not None and self._entries[key][2] != profile_id:
+            return False
+        return True
+
+
+history_index = HistoryIndex()
@@ -0,0 +1,268 @@
+"""Freshness cache and batched refetch of messages"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+import pyrogram
+from loguru import logger
+
+from module.rate_limiter import MESSAGES, rate_limiter
+
+# Most ids one messages.GetMessages / channels.GetMessages call accepts
+MAX_BATCH = 200
+# FloodWaits waited out per batch before it is given up
+FLOOD_WAIT_RETRIES = 3
+
+
+class MessageFetcher:
+    """Serve messages for download without refetching fresh ones.
+
+    Messages coming straight from Telegram (chat history, ``get_messages``)
+    are remembered with the time they were fetched. ``get`` hands such a
+    message back as long as it is younger than ``max_age`` seconds, so a
+    queued message costs no extra ``get_messages`` call. Older or unknown
+    messages, and any message after a ``BadRequest`` such as
+    ``FILE_REFERENCE_EXPIRED`` (``force=True``), are refetched.
+
+    Refetches of the same client and chat that arrive within ``batch_delay``
+    seconds are coalesced into one multi-id ``get_messages`` call of at most
+    ``MAX_BATCH`` ids, and concurrent requests for one message share a
+    single fetch. At most ``max_size`` messages are kept, least
+    recently used first out.
+    """
+
+    def __init__(
+        self,
+        max_age: float = 3600.0,
+        max_size: int = 20000,
+        batch_delay: float = 0.05,
+    ):
+        self.max_age = max_age
+        self.max_size = max_size
+        self.batch_delay = batch_delay
+        # (chat_id, message_id) -> (message, fetched_at)
+        self._entries: OrderedDict = OrderedDict()
+        # (client id, chat_id) -> {message_id: future} not yet requested
+        self._pending: dict = {}
+        # (client id, chat_id, message_id) -> future, until the fetch is done
+        self._waiting: dict = {}
+        self._flushers: dict = {}
+        self.fetch_calls = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(message: pyrogram.types.Message) -> tuple:
+        return (message.chat.id, message.id)
+
+    def remember(self, message: pyrogram.types.Message, now: Optional[float] = None):
+        """Record a message that was just fetched from Telegram"""
+        if message is None or getattr(message, "empty", False) or not message.chat:
+            return
+        key = self._key(message)
+        self._entries[key] = (message, now or time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, chat_id: int, message_id: int):
+        """Forget a message, the next ``get`` refetches it"""
+        self._entries.pop((chat_id, message_id), None)
+
+    def clear(self):
+        """Forget every message"""
+        self._entries.clear()
+
+    def fresh(
+        self,
+        chat_id: int,
+        message_id: int,
+        max_age: Optional[float] = None,
+        now: Optional[float] = None,
+    ) -> Optional[pyrogram.types.Message]:
+        """The remembered message if it is younger than ``max_age``"""
+        entry = self._entries.get((chat_id, message_id))
+        if entry is None:
+            return None
+        message, fetched_at = entry
+        if max_age is None:
+            max_age = self.max_age
+        if (now or time.time()) - fetched_at > max_age:
+            return None
+        self._entries.move_to_end((chat_id, message_id))
+        return message
+
+    async def get(
+        self,
+        client: pyrogram.Client,
+        message: pyrogram.types.Message,
+        force: bool = False,
+        max_age: Optional[float] = None,
+    ) -> pyrogram.types.Message:
+        """Return ``message`` with a usable file reference.
+
+        Parameters
+        ----------
+        client: pyrogram.Client
+            Client that downloads the message
+        message: pyrogram.types.Message
+            The queued message
+        force: bool
+            Refetch even if the remembered copy is fresh, e.g. after the
+            download failed with ``FILE_REFERENCE_EXPIRED``
+        max_age: Optional[float]
+            Override of ``max_age`` in seconds, 0 refetches every message
+        """
+        fetched = await self.get_by_id(
+            client, *self._key(message), force=force, max_age=max_age
+        )
+        return fetched if fetched is not None else message
+
+    async def get_by_id(
+        self,
+        client: pyrogram.Client,
+        chat_id: int,
+        message_id: int,
+        force: bool = False,
+        max_age: Optional[float] = None,
+    ) -> Optional[pyrogram.types.Message]:
+        """Like ``get`` for a queued ``(chat_id, message_id)``, None if
+        Telegram no longer has the message"""
+        if force:
+            self.invalidate(chat_id, message_id)
+        else:
+            cached = self.fresh(chat_id, message_id, max_age)
+            if cached is not None:
+                return cached
+
+        loop = asyncio.get_running_loop()
+        group = (id(client), chat_id)
+        future = self._waiting.get((*group, message_id))
+        if future is None:
+            future = loop.create_future()
+            self._waiting[(*group, message_id)] = future
+            pending = self._pending.setdefault(group, {})
+            pending[message_id] = future
+            if len(pending) >= MAX_BATCH:
+                self._flush_now(client, group)
+            elif group not in self._flushers:
+                self._flushers[group] = loop.call_later(
+                    self.batch_delay, self._flush_now, client, group
+                )
+        # A cancelled waiter must not cancel the fetch others wait on too
+        fetched = await asyncio.shield(future)
+        if fetched is None or getattr(fetched, "empty", False):
+            return None
+        return fetched
+
+    def _flush_now(self, client: pyrogram.Client, group: tuple):
+        handle = self._flushers.pop(group, None)
+        if handle is not None:
+            handle.cancel()
+        pending = self._pending.pop(group, None)
+        if pending:
+            asyncio.ensure_future(self._fetch(client, group, pending))
+
+    async def _fetch(self, client: pyrogram.Client, group: tuple, pending: dict):
+        self.fetch_calls += 1
+        try:
+            messages = await rate_limiter.call(
+                client,
+                MESSAGES,
+                client.get_messages,
+                chat_id=group[1],
+                message_ids=list(pending),
+                flood_retries=FLOOD_WAIT_RETRIES,
+            )
+        except Exception as e:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            for message_id in pending:
+                self._waiting.pop((*group, message_id), None)
+
+        if not isinstance(messages, list):
+            messages = [messages]
+        now = time.time()
+        by_id = {}
+        for message in messages:
+            if message is not None:
+                by_id[message.id] = message
+                self.remember(message, now)
+        for message_id, future in pending.items():
+            if not future.done():
+                future.set_result(by_id.get(message_id))
+
+    async def fetch_many(
+        self,
+        client: pyrogram.Client,
+        ids_by_chat: Dict[int, Iterable[int]],
+        on_messages: Callable[[int, list, list], Awaitable[None]],
+        concurrency: int = 4,
+    ):
+        """Fetch many messages with as few ``get_messages`` calls as possible.
+
+        The ids of every chat are split into batches of ``MAX_BATCH``, which
+        run concurrently with at most ``concurrency`` calls in flight. A
+        FloodWait pauses every ``get_messages`` of the client through
+        ``rate_limiter`` and the batch is retried.
+
+        Parameters
+        ----------
+        client: pyrogram.Client
+            Client to fetch with
+        ids_by_chat: Dict[int, Iterable[int]]
+            Message ids to fetch per chat
+        on_messages: Callable
+            ``await on_messages(chat_id, ids, messages)`` as soon as a batch
+            arrives, ``messages`` is None if the batch failed. ``messages``
+            lines up with ``ids`` and holds None for a missing message.
+        concurrency: int
+            Most batches fetched at once
+        """
+        limiter = asyncio.Semaphore(max(concurrency, 1))
+
+        async def fetch_batch(chat_id: int, ids: list):
+            messages = None
+            async with limiter:
+                try:
+                    self.fetch_calls += 1
+                    messages = await rate_limiter.call(
+                        client,
+                        MESSAGES,
+                        client.get_messages,
+                        chat_id=chat_id,
+                        message_ids=ids,
+                        flood_retries=FLOOD_WAIT_RETRIES,
+                    )
+                except Exception as e:
+                    logger.error(
+                        f"Fetching {len(ids)} messages of {chat_id} failed: {e}"
+                    )
+
+            if messages is not None:
+                if not isinstance(messages, list):
+                    messages = [messages]
+                now = time.time()
+                by_id = {}
+                for message in messages:
+                    if message is not None and not message.empty:
+                        by_id[message.id] = message
+                        self.remember(message, now)
+                messages = [by_id.get(message_id) for message_id in ids]
+            await on_messages(chat_id, ids, messages)
+
+        batches = []
+        for chat_id, ids in ids_by_chat.items():
+            ids = list(dict.fromkeys(ids))
+            for start in range(0, len(ids), MAX_BATCH):
+                batches.append(fetch_batch(chat_id, ids[start : start + MAX_BATCH]))
+        await asyncio.gather(*batches)
+
+
+message_fetcher = MessageFetcher()
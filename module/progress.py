@@ -0,0 +1,265 @@
+"""Progress registry for active transfers"""
+
+import threading
+import time
+from typing import List, Optional
+
+
+class RateWindow:
+    """Ring buffer of per-second byte counters for a rolling throughput."""
+
+    __slots__ = ("_size", "_stamps", "_buckets", "_started")
+
+    def __init__(self, size: int = 5):
+        self._size = size
+        self._stamps = [-1] * size
+        self._buckets = [0] * size
+        self._started = 0.0
+
+    def reset(self, now: float):
+        """Forget every sample"""
+        for i in range(self._size):
+            self._stamps[i] = -1
+            self._buckets[i] = 0
+        self._started = now
+
+    def add(self, nbytes: int, now: float):
+        """Account ``nbytes`` transferred at ``now``"""
+        sec = int(now)
+        pos = sec % self._size
+        if self._stamps[pos] != sec:
+            self._stamps[pos] = sec
+            self._buckets[pos] = 0
+        self._buckets[pos] += nbytes
+
+    def rate(self, now: float) -> int:
+        """Bytes per second over the window, 0 once it ran dry"""
+        sec = int(now)
+        oldest = sec - self._size
+        total = 0
+        for stamp, nbytes in zip(self._stamps, self._buckets):
+            if oldest < stamp <= sec:
+                total += nbytes
+        if not total:
+            return 0
+        span = min(float(self._size), now - self._started)
+        return int(total / max(span, 1.0))
+
+
+class TransferSlot:
+    """Mutable record of one active transfer, reused through a free list."""
+
+    __slots__ = (
+        "chat_id",
+        "message_id",
+        "profile_id",
+        "task_id",
+        "file_name",
+        "total_size",
+        "down_byte",
+        "start_time",
+        "updated_at",
+        "published_at",
+        "window",
+    )
+
+    def __init__(self, window_size: int):
+        self.window = RateWindow(window_size)
+
+    def reset(
+        self,
+        chat_id: int,
+        message_id: int,
+        down_byte: int,
+        total_size: int,
+        file_name: str,
+        start_time: float,
+        task_id: int,
+        profile_id: Optional[str],
+        now: float,
+    ):
+        """Bind the slot to a new transfer"""
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.profile_id = profile_id
+        self.task_id = task_id
+        self.file_name = file_name
+        self.total_size = total_size
+        self.down_byte = down_byte
+        self.start_time = start_time
+        self.updated_at = now
+        self.published_at = 0.0
+        self.window.reset(now)
+
+    def speed(self, now: float) -> int:
+        """Rolling download speed in bytes per second"""
+        return self.window.rate(now)
+
+    def to_dict(self, now: float) -> dict:
+        """Plain dict view, as returned by ProgressRegistry.snapshot"""
+        return {
+            "chat_id": self.chat_id,
+            "message_id": self.message_id,
+            "profile_id": self.profile_id,
+            "task_id": self.task_id,
+            "file_name": self.file_name,
+            "total_size": self.total_size,
+            "down_byte": self.down_byte,
+            "download_speed": self.speed(now),
+            "start_time": self.start_time,
+            "updated_at": self.updated_at,
+        }
+
+
+class ProgressRegistry:
+    """Active transfers keyed by ``(chat_id, message_id)``.
+
+    ``update`` is O(1) per progress callback: one dict lookup and a few
+    attribute writes on a preallocated slot plus two ring buffer updates.
+    Readers use ``snapshot``/``get``, which cost O(active transfers) and
+    never walk the download history.
+    """
+
+    def __init__(
+        self,
+        window_size: int = 5,
+        publish_interval: float = 1.0,
+        idle_timeout: float = 300.0,
+    ):
+        self._lock = threading.Lock()
+        self._window_size = window_size
+        self._publish_interval = publish_interval
+        self._idle_timeout = idle_timeout
+        self._slots: dict = {}
+        self._free: List[TransferSlot] = []
+        self._total = RateWindow(window_size)
+        self._total.reset(time.time())
+        # profile_id -> bytes transferred since start, never reset
+        self._transferred: dict = {}
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def update(
+        self,
+        chat_id: int,
+        message_id: int,
+        down_byte: int,
+        total_size: int,
+        file_name: str = "",
+        start_time: float = 0,
+        task_id: int = 0,
+        profile_id: Optional[str] = None,
+        now: Optional[float] = None,
+    ) -> Optional[TransferSlot]:
+        """Record progress of a transfer.
+
+        Returns the slot when the change should be published to the slower
+        consumers (first report, once per ``publish_interval`` and on
+        completion), otherwise None.
+        """
+        now = now or time.time()
+        key = (chat_id, message_id)
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = (
+                    self._free.pop() if self._free else TransferSlot(self._window_size)
+                )
+                slot.reset(
+                    chat_id,
+                    message_id,
+                    down_byte,
+                    total_size,
+                    file_name,
+                    start_time or now,
+                    task_id,
+                    profile_id,
+                    now,
+                )
+                self._slots[key] = slot
+                # Bytes of a transfer that just started count towards the
+                # throughput, a slot recreated for an old transfer does not.
+                if down_byte > 0 and now - slot.start_time <= self._window_size:
+                    slot.window.add(down_byte, now)
+                    self._total.add(down_byte, now)
+                    self._count(profile_id, down_byte)
+            else:
+                delta = down_byte - slot.down_byte
+                if delta > 0:
+                    slot.window.add(delta, now)
+                    self._total.add(delta, now)
+                    self._count(slot.profile_id, delta)
+                slot.down_byte = down_byte
+                slot.total_size = total_size
+                slot.updated_at = now
+
+            if (
+                now - slot.published_at >= self._publish_interval
+                or down_byte >= total_size
+            ):
+                slot.published_at = now
+                return slot
+            return None
+
+    def _count(self, profile_id: Optional[str], nbytes: int):
+        self._transferred[profile_id] = self._transferred.get(profile_id, 0) + nbytes
+
+    def count(
+        self, profile_id: Optional[str], nbytes: int, now: Optional[float] = None
+    ):
+        """Account ``nbytes`` downloaded without a slot, for streamed uploads
+        whose progress is reported as upload progress"""
+        now = now or time.time()
+        with self._lock:
+            self._total.add(nbytes, now)
+            self._count(profile_id, nbytes)
+
+    def transferred(self, profile_id: Optional[str] = None) -> int:
+        """Bytes downloaded by a profile since start, for throughput samples"""
+        with self._lock:
+            return self._transferred.get(profile_id, 0)
+
+    def finish(self, chat_id: int, message_id: int):
+        """Release the slot of a finished, failed or removed transfer"""
+        with self._lock:
+            slot = self._slots.pop((chat_id, message_id), None)
+            if slot is not None:
+                self._free.append(slot)
+
+    def get(
+        self, chat_id: int, message_id: int, now: Optional[float] = None
+    ) -> Optional[dict]:
+        """Snapshot of one transfer or None"""
+        now = now or time.time()
+        with self._lock:
+            slot = self._slots.get((chat_id, message_id))
+            return slot.to_dict(now) if slot else None
+
+    def snapshot(
+        self, chat_id: Optional[int] = None, now: Optional[float] = None
+    ) -> List[dict]:
+        """Snapshot of the active transfers, optionally for one chat.
+
+        Slots idle for longer than ``idle_timeout`` (e.g. a download that
+        failed without reporting completion) are reclaimed here.
+        """
+        now = now or time.time()
+        result = []
+        with self._lock:
+            for key, slot in list(self._slots.items()):
+                if now - slot.updated_at > self._idle_timeout:
+                    self._free.append(self._slots.pop(key))
+                    continue
+                if chat_id is None or slot.chat_id == chat_id:
+                    result.append(slot.to_dict(now))
+        return result
+
+    def total_speed(self) -> int:
+        """Rolling download speed over every transfer, bytes per second"""
+        now = time.time()
+        with self._lock:
+            return self._total.rate(now)
+
+
+progress_registry = ProgressRegistry()
@@ -37,8 +37,10 @@ from module.app import (
     UploadProgressStat,
     UploadStatus,
 )
-from module.download_stat import get_download_result, get_total_download_speed
+from module.download_stat import get_total_download_speed
 from module.language import Language, _t
+from module.progress import progress_registry
+from module.rate_limiter import SEND, method_class, rate_limiter
 from module.send_media_group_v2 import cache_media, send_media_group_v2
 from module.upload_stat import update_upload_status, update_upload_status_str
 from utils.format import (
@@ -341,13 +343,15 @@ async def upload_telegram_chat_message(
     forward_status = ForwardStatus.FailedForward
     max_attempts = 3
     for _ in range(1, max_attempts + 1):
+        await rate_limiter.acquire(upload_user, SEND)
         try:
             forward_status = await _upload_telegram_chat_message(
                 client, upload_user, app, node, message, file_name
             )
             break
         except pyrogram.errors.exceptions.flood_420.FloodWait as wait_err:
-            await asyncio.sleep(wait_err.value * 2)
+            # every sender of this account waits, not only this upload
+            rate_limiter.flood_wait(upload_user, SEND, wait_err.value)
             logger.warning(
                 "Upload Message[{}]: FlowWait {}", message.id, wait_err.value
             )
@@ -1117,12 +1121,14 @@ async def _report_bot_status(
             )
 
         download_result_str = ""
-        download_result = get_download_result()
-        if node.chat_id in download_result:
-            messages = download_result[node.chat_id]
-            for idx, value in messages.items():
-                task_id = value.get("task_id", 0)
-                if task_id != node.task_id or value["down_byte"] == value["total_size"]:
+        active_downloads = progress_registry.snapshot(node.chat_id)
+        if active_downloads:
+            for value in active_downloads:
+                idx = value["message_id"]
+                if (
+                    value["task_id"] != node.task_id
+                    or value["down_byte"] >= value["total_size"]
+                ):
                     continue
 
                 temp_file_name = truncate_filename(
@@ -1240,12 +1246,15 @@ async def retry(func: Callable, args: tuple = (), max_attempts=3, wait_second=15
     if it succeeds within the maximum number of attempts, otherwise None.
     """
 
+    client = getattr(func, "__self__", None)
+    klass = method_class(func)
     for _ in range(1, max_attempts + 1):
+        await rate_limiter.acquire(client, klass)
         try:
             return await func(*args)
         except pyrogram.errors.exceptions.flood_420.FloodWait as wait_err:
             logger.warning("bad call retry: FlowWait {}", wait_err.value)
-            await asyncio.sleep(wait_err.value)
+            rate_limiter.flood_wait(client, klass, wait_err.value)
         except Exception as e:
             logger.exception("Error: {}", e)
             await asyncio.sleep(wait_second)
@@ -1414,7 +1423,7 @@ async def update_upload_stat(
     cur_time = time.time()
 
     # --- Per-task Control ---
-    from module.download_stat import DownloadState, get_download_state, get_task_state
+    from module.download_stat import get_task_state, wait_task_runnable
 
     chat_id = node.chat_id
     profile_id = getattr(node, "profile_id", None)
@@ -1428,17 +1437,11 @@ async def update_upload_stat(
     # Global or local pause check
     # Skip pause for streams to avoid 502/timeouts
     if not is_stream:
-        while state == "paused" or get_download_state() == DownloadState.StopDownload:
-            if node.is_stop_transmission:
-                if client:
-                    client.stop_transmission()
-            await asyncio.sleep(1)
-            # Re-check state
-            state = get_task_state(chat_id, message_id, profile_id)
-            if state == "deleted":
-                if client:
-                    client.stop_transmission()
-                return
+        state = await wait_task_runnable(chat_id, message_id, node)
+        if state == "deleted" or node.is_stop_transmission:
+            if client:
+                client.stop_transmission()
+            return
     # -----------------------
 
     if node.upload_stat_dict.get(message_id):
@@ -0,0 +1,229 @@
+"""Token bucket limits and shared FloodWait pauses for Telegram calls"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import pyrogram
+from loguru import logger
+
+# Method classes, Telegram counts FloodWaits per method so the calls of one
+# class share a bucket
+HISTORY = "history"
+MESSAGES = "messages"
+DOWNLOAD = "download"
+UPLOAD = "upload"
+SEND = "send"
+OTHER = "other"
+
+# calls per second, 0 is no limit. A download or upload is many file part
+# calls inside pyrogram, its class only shares FloodWait pauses by default
+DEFAULT_RATES = {
+    HISTORY: 5.0,
+    MESSAGES: 5.0,
+    DOWNLOAD: 0.0,
+    UPLOAD: 0.0,
+    SEND: 20.0,
+    OTHER: 10.0,
+}
+
+_METHOD_CLASSES = {
+    "get_chat_history": HISTORY,
+    "get_chunk": HISTORY,
+    "get_chunk_v2": HISTORY,
+    "get_messages": MESSAGES,
+    "get_media_group": MESSAGES,
+    "download_media": DOWNLOAD,
+    "stream_media": DOWNLOAD,
+    "save_file": UPLOAD,
+    "copy_message": SEND,
+    "copy_media_group": SEND,
+    "forward_messages": SEND,
+    "edit_message_text": SEND,
+}
+
+
+def method_class(func: Callable) -> str:
+    """Method class of a pyrogram method or function"""
+    name = getattr(func, "__name__", "")
+    if name in _METHOD_CLASSES:
+        return _METHOD_CLASSES[name]
+    if name.startswith("send_"):
+        return SEND
+    return OTHER
+
+
+class TokenBucket:
+    """``rate`` calls per second with bursts of ``burst``, closed while a
+    FloodWait runs"""
+
+    __slots__ = (
+        "rate",
+        "burst",
+        "tokens",
+        "updated",
+        "paused_until",
+        "calls",
+        "flood_waits",
+        "flood_wait_seconds",
+        "waits_avoided",
+        "paused_seconds",
+        "throttled_seconds",
+    )
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst or max(rate * 2, 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.calls = 0
+        self.flood_waits = 0
+        self.flood_wait_seconds = 0.0
+        self.waits_avoided = 0
+        self.paused_seconds = 0.0
+        self.throttled_seconds = 0.0
+
+    def take(self, now: float) -> float:
+        """Take a token, or return the seconds until one is available"""
+        if self.rate <= 0:
+            return 0.0
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """One :class:`TokenBucket` per client and method class.
+
+    Every Telegram call goes through ``acquire`` (or ``call``), which waits
+    for a token. A FloodWait reported by one caller with ``flood_wait``
+    closes the bucket for everyone until it is over, so the other workers
+    stop calling the same method instead of extending the ban. Callers held
+    back by such a pause count as ``waits_avoided``, the time they spent
+    paused as ``paused_seconds``.
+    """
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None):
+        self.rates = dict(DEFAULT_RATES)
+        if rates:
+            self.rates.update(rates)
+        # id(client) -> rates of that client over ``rates``
+        self._client_rates: Dict[int, Dict[str, float]] = {}
+        # (id(client), method class) -> bucket
+        self._buckets: Dict[tuple, TokenBucket] = {}
+
+    def configure(self, rates: Dict[str, float], client: Any = None):
+        """Change the calls per second of method classes, of every client
+        without own rates or only of ``client``"""
+        rates = {klass: float(rate) for klass, rate in rates.items()}
+        if client is None:
+            self.rates.update(rates)
+        else:
+            self._client_rates.setdefault(id(client), {}).update(rates)
+        for (client_id, klass), bucket in self._buckets.items():
+            if klass in rates:
+                bucket.rate = self.rate(client_id, klass)
+                bucket.burst = max(bucket.rate * 2, 1.0)
+
+    def rate(self, client_id: int, klass: str) -> float:
+        """Calls per second of ``klass`` on the client with ``client_id``"""
+        client_rates = self._client_rates.get(client_id, {})
+        if klass in client_rates:
+            return client_rates[klass]
+        return self.rates.get(klass, self.rates[OTHER])
+
+    def bucket(self, client: Any, klass: str) -> TokenBucket:
+        """Bucket of ``client`` and ``klass``"""
+        key = (id(client), klass)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate(id(client), klass))
+            self._buckets[key] = bucket
+        return bucket
+
+    async def acquire(self, client: Any, klass: str):
+        """Wait until ``client`` may make a call of ``klass``"""
+        bucket = self.bucket(client, klass)
+        held = False
+        while True:
+            now = time.monotonic()
+            if bucket.paused_until > now:
+                if not held:
+                    held = True
+                    bucket.waits_avoided += 1
+                delay = bucket.paused_until - now
+                bucket.paused_seconds += delay
+            else:
+                delay = bucket.take(now)
+                if not delay:
+                    bucket.calls += 1
+                    return
+                bucket.throttled_seconds += delay
+            await asyncio.sleep(delay)
+
+    def flood_wait(self, client: Any, klass: str, seconds: float):
+        """Pause every caller of ``klass`` on ``client`` for ``seconds``"""
+        bucket = self.bucket(client, klass)
+        until = time.monotonic() + seconds
+        bucket.flood_waits += 1
+        bucket.flood_wait_seconds += seconds
+        if until > bucket.paused_until:
+            bucket.paused_until = until
+            logger.warning(f"FloodWait {seconds}s, pausing {klass} calls")
+
+    async def call(
+        self,
+        client: Any,
+        klass: str,
+        func: Callable[..., Awaitable],
+        *args,
+        flood_retries: int = 3,
+        **kwargs,
+    ):
+        """``await func(*args, **kwargs)`` within the limits, FloodWaits
+        pause the class and are retried up to ``flood_retries`` times"""
+        for attempt in range(flood_retries + 1):
+            await self.acquire(client, klass)
+            try:
+                return await func(*args, **kwargs)
+            except pyrogram.errors.FloodWait as wait_err:
+                self.flood_wait(client, klass, wait_err.value)
+                if attempt == flood_retries:
+                    raise
+        return None
+
+    def stats(self) -> dict:
+        """Counters per method class over every client"""
+        now = time.monotonic()
+        result: dict = {}
+        for (_, klass), bucket in self._buckets.items():
+            item = result.setdefault(
+                klass,
+                {
+                    "rate": bucket.rate,
+                    "calls": 0,
+                    "flood_waits": 0,
+                    "flood_wait_seconds": 0.0,
+                    "waits_avoided": 0,
+                    "paused_seconds": 0.0,
+                    "throttled_seconds": 0.0,
+                    "paused_for": 0.0,
+                },
+            )
+            item["calls"] += bucket.calls
+            item["flood_waits"] += bucket.flood_waits
+            item["flood_wait_seconds"] += bucket.flood_wait_seconds
+            item["waits_avoided"] += bucket.waits_avoided
+            item["paused_seconds"] += round(bucket.paused_seconds, 3)
+            item["throttled_seconds"] += round(bucket.throttled_seconds, 3)
+            item["paused_for"] = max(
+                item["paused_for"], round(max(bucket.paused_until - now, 0), 3)
+            )
+        return result
+
+
+rate_limiter = RateLimiter()
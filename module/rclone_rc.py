@@ -0,0 +1,231 @@
+"""Uploads through one long running ``rclone rcd``"""
+
+import asyncio
+import itertools
+import os
+import secrets
+from typing import Awaitable, Callable, Dict, Optional
+
+import aiohttp
+from loguru import logger
+
+from utils.format import format_byte
+
+
+class RcloneRcError(Exception):
+    """An rc call was refused or the daemon could not be reached"""
+
+
+def format_stats(stats: dict) -> tuple:
+    """``(transferred, total, percentage, speed, eta)`` strings of a
+    ``core/stats`` result, as the progress callbacks of the rclone
+    adapter get them"""
+    transferred = stats.get("bytes") or 0
+    total = stats.get("totalBytes") or 0
+    percentage = int(transferred * 100 / total) if total else 0
+    eta = stats.get("eta")
+    return (
+        format_byte(transferred),
+        format_byte(total),
+        str(percentage),
+        format_byte(stats.get("speed") or 0) + "/s",
+        f"{int(eta)}s" if eta is not None else "-",
+    )
+
+
+class RcloneDaemon:
+    """Client of an ``rclone rcd`` that is started on first use.
+
+    Every upload is an async ``operations/copyfile`` job in a stats group
+    of its own, so uploads run side by side in one process that keeps its
+    remote logins and connections between files. ``copy_file`` polls
+    ``job/status`` until the job is finished and reports the progress of
+    its group from ``core/stats``. If an rc server already answers at
+    ``addr`` with the given credentials it is used instead of starting one.
+    """
+
+    # pylint: disable = R0913
+    def __init__(
+        self,
+        rclone_path: str,
+        addr: str = "127.0.0.1:5572",
+        user: str = "",
+        password: str = "",
+        start_timeout: float = 15.0,
+        poll_interval: float = 0.5,
+    ):
+        self.rclone_path = rclone_path
+        self.addr = addr
+        self.user = user or "tdl"
+        self.password = password or secrets.token_urlsafe(16)
+        self.start_timeout = start_timeout
+        self.poll_interval = poll_interval
+        self._proc: Optional[asyncio.subprocess.Process] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._started = False
+        self._groups = itertools.count(1)
+
+    @property
+    def url(self) -> str:
+        """Base url of the rc api"""
+        return f"http://{self.addr}/"
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                auth=aiohttp.BasicAuth(self.user, self.password),
+                timeout=aiohttp.ClientTimeout(total=60, connect=5),
+            )
+        return self._session
+
+    async def call(self, method: str, **params) -> dict:
+        """Call rc ``method`` with ``params``, raises ``RcloneRcError`` if
+        rclone reports an error"""
+        try:
+            async with self._get_session().post(
+                self.url + method, json=params
+            ) as resp:
+                try:
+                    result = await resp.json(content_type=None)
+                except ValueError:
+                    result = {"error": await resp.text()}
+                if resp.status != 200:
+                    error = (result or {}).get("error", resp.reason)
+                    raise RcloneRcError(f"{method}: {resp.status} {error}")
+                return result or {}
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise RcloneRcError(f"{method}: {e.__class__.__name__} {e}") from e
+
+    async def _alive(self) -> bool:
+        try:
+            await self.call("rc/noop")
+            return True
+        except RcloneRcError:
+            return False
+
+    async def start(self):
+        """Start ``rclone rcd`` unless it already answers"""
+        if self._started:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._started:
+                return
+            if not await self._alive():
+                await self._spawn()
+            self._started = True
+
+    async def _spawn(self):
+        logger.info(f"Starting rclone rcd on {self.addr}")
+        # the credentials go through the environment, a command line can be
+        # read by every local user
+        env = dict(os.environ, RCLONE_RC_USER=self.user, RCLONE_RC_PASS=self.password)
+        self._proc = await asyncio.create_subprocess_exec(
+            self.rclone_path,
+            "rcd",
+            f"--rc-addr={self.addr}",
+            stdout=asyncio.subprocess.DEVNULL,
+            env=env,
+        )
+        deadline = asyncio.get_running_loop().time() + self.start_timeout
+        while not await self._alive():
+            if self._proc.returncode is not None:
+                raise RcloneRcError(
+                    f"rclone rcd exited with code {self._proc.returncode}"
+                )
+            if asyncio.get_running_loop().time() > deadline:
+                raise RcloneRcError(f"rclone rcd did not answer on {self.addr}")
+            await asyncio.sleep(0.2)
+
+    async def close(self):
+        """Stop the daemon if it was started here"""
+        if self._proc and self._proc.returncode is None:
+            self._proc.terminate()
+            try:
+                await asyncio.wait_for(self._proc.wait(), 10)
+            except asyncio.TimeoutError:
+                self._proc.kill()
+        self._proc = None
+        self._started = False
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def copy_file(
+        self,
+        local_file_path: str,
+        dst_fs: str,
+        dst_remote: str,
+        progress: Callable[[dict], Awaitable] = None,
+        ignore_existing: bool = True,
+    ) -> bool:
+        """Copy a local file to ``dst_remote`` in ``dst_fs``.
+
+        ``progress`` is awaited with the ``core/stats`` of the upload after
+        every poll. Missing parent directories are created by rclone.
+        """
+        await self.start()
+        local_file_path = os.path.abspath(local_file_path)
+        group = f"upload/{next(self._groups)}"
+        job = await self.call(
+            "operations/copyfile",
+            srcFs=os.path.dirname(local_file_path),
+            srcRemote=os.path.basename(local_file_path),
+            dstFs=dst_fs,
+            dstRemote=dst_remote,
+            _async=True,
+            _group=group,
+            _config={"IgnoreExisting": ignore_existing},
+        )
+        job_id = job["jobid"]
+        try:
+            while True:
+                await asyncio.sleep(self.poll_interval)
+                status = await self.call("job/status", jobid=job_id)
+                if progress:
+                    await progress(await self.call("core/stats", group=group))
+                if status.get("finished"):
+                    break
+        except asyncio.CancelledError:
+            try:
+                await self.call("job/stop", jobid=job_id)
+            except RcloneRcError:
+                pass
+            raise
+        finally:
+            try:
+                await self.call("core/stats-delete", group=group)
+            except RcloneRcError:
+                pass
+
+        if not status.get("success"):
+            logger.error(f"rclone rc upload {local_file_path}: {status.get('error')}")
+            return False
+        return True
+
+
+_daemons: Dict[tuple, RcloneDaemon] = {}
+
+
+def get_daemon(
+    rclone_path: str, addr: str = "127.0.0.1:5572", user: str = "", password: str = ""
+) -> RcloneDaemon:
+    """The daemon of ``addr``, shared by every profile"""
+    key = (rclone_path, addr, user)
+    daemon = _daemons.get(key)
+    if daemon is None:
+        daemon = RcloneDaemon(rclone_path, addr, user, password)
+        _daemons[key] = daemon
+    return daemon
+
+
+async def close_daemons():
+    """Stop every daemon started by ``get_daemon``"""
+    for daemon in list(_daemons.values()):
+        try:
+            await daemon.close()
+        except Exception as e:
+            logger.warning(f"Failed to stop rclone rcd on {daemon.addr}: {e}")
+    _daemons.clear()
@@ -0,0 +1,77 @@
+"""Event based pause/resume for transfers"""
+
+import asyncio
+import threading
+from typing import Callable, Hashable
+
+
+class TaskControl:
+    """Park paused transfers on ``asyncio.Event`` until they may continue.
+
+    A transfer that cannot run registers an event under its task key and
+    waits on it, so it costs nothing until woken. ``notify(key)`` wakes one
+    task (pause/resume/delete of that task) and ``notify_all()`` wakes every
+    parked task (global pause/resume, a stopped TaskNode). Woken tasks
+    re-check their state and park again if they still cannot run.
+
+    The notify methods may be called from any thread, e.g. the Flask
+    handlers, and hand the wake-up to the waiter's event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> set of (loop, event)
+        self._waiters: dict = {}
+
+    async def wait(self, key: Hashable, is_runnable: Callable[[], bool]):
+        """Return once ``is_runnable()`` is true"""
+        loop = asyncio.get_running_loop()
+        while not is_runnable():
+            entry = (loop, asyncio.Event())
+            with self._lock:
+                self._waiters.setdefault(key, set()).add(entry)
+            try:
+                # A notify between the first check and registering the event
+                # would otherwise be lost.
+                if is_runnable():
+                    return
+                await entry[1].wait()
+            finally:
+                with self._lock:
+                    entries = self._waiters.get(key)
+                    if entries is not None:
+                        entries.discard(entry)
+                        if not entries:
+                            del self._waiters[key]
+
+    @staticmethod
+    def _wake(entries):
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        for loop, event in entries:
+            if loop is current:
+                event.set()
+            elif not loop.is_closed():
+                loop.call_soon_threadsafe(event.set)
+
+    def notify(self, key: Hashable):
+        """Wake the transfers parked under ``key``"""
+        with self._lock:
+            entries = list(self._waiters.get(key, ()))
+        self._wake(entries)
+
+    def notify_all(self):
+        """Wake every parked transfer"""
+        with self._lock:
+            entries = [entry for items in self._waiters.values() for entry in items]
+        self._wake(entries)
+
+    def parked(self) -> int:
+        """Number of parked transfers"""
+        with self._lock:
+            return sum(len(items) for items in self._waiters.values())
+
+
+task_control = TaskControl()
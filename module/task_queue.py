@@ -0,0 +1,337 @@
+"""Fair, bounded priority queue of download tasks"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Lower runs first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+
+
+class WaitStats:
+    """How long the tasks of one lane waited in the queue"""
+
+    __slots__ = ("name", "started", "wait_total", "wait_max")
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self.started = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, waited: float):
+        """Count a task that waited ``waited`` seconds before it started"""
+        self.started += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+    @property
+    def wait_avg(self) -> float:
+        """Average wait in seconds"""
+        return self.wait_total / self.started if self.started else 0.0
+
+    def to_dict(self) -> dict:
+        """Serialize for the status API"""
+        return {
+            "name": self.name,
+            "started": self.started,
+            "wait_avg": round(self.wait_avg, 3),
+            "wait_max": round(self.wait_max, 3),
+        }
+
+
+# (key, weight, limit, stats) of an item, see FairLanes
+LaneInfo = Tuple[Hashable, int, int, Optional[WaitStats]]
+
+
+def _single_lane(_item: Any) -> LaneInfo:
+    return (None, 1, 0, None)
+
+
+class _Lane:
+    __slots__ = ("key", "weight", "limit", "stats", "entries", "credit")
+
+    def __init__(self, key: Hashable, stats: Optional[WaitStats]):
+        self.key = key
+        self.weight = 1
+        self.limit = 0
+        self.stats = stats
+        # (queued_at, value)
+        self.entries: deque = deque()
+        self.credit = 0
+
+
+class FairLanes:
+    """Weighted round-robin over lanes of waiting values.
+
+    Values are pushed with a priority and a lane key. Lower priorities are
+    served first. Within a priority the lanes take turns, a lane of weight
+    ``n`` hands out up to ``n`` values per turn, and values of one lane keep
+    their order. A lane with ``limit`` values running (popped and not yet
+    ``done``) is skipped until one of them is done.
+    """
+
+    def __init__(self):
+        # priority -> deque of lanes that have values, the head is next
+        self._rings: Dict[int, deque] = {}
+        self._lanes: Dict[tuple, _Lane] = {}
+        # key -> number of its lanes with values, one per priority
+        self._queued: Dict[Hashable, int] = {}
+        self.running: Dict[Hashable, int] = {}
+        self.stats: Dict[Hashable, WaitStats] = {}
+        self.size = 0
+
+    def push(
+        self,
+        value: Any,
+        priority: int,
+        key: Hashable,
+        weight: int = 1,
+        limit: int = 0,
+        stats: Optional[WaitStats] = None,
+    ):
+        """Queue ``value`` in the lane ``key``"""
+        lane = self._lanes.get((priority, key))
+        if lane is None:
+            lane = _Lane(key, stats)
+            self._lanes[(priority, key)] = lane
+            self._queued[key] = self._queued.get(key, 0) + 1
+            self._rings.setdefault(priority, deque()).append(lane)
+        lane.weight = max(weight, 1)
+        lane.limit = max(limit, 0)
+        lane.entries.append((time.monotonic(), value))
+        if stats is not None:
+            self.stats[key] = stats
+        self.size += 1
+
+    def _capped(self, lane: _Lane) -> bool:
+        return bool(lane.limit) and self.running.get(lane.key, 0) >= lane.limit
+
+    def pop(self) -> Optional[Tuple[Hashable, Any, float]]:
+        """Take the next ``(key, value, seconds waited)``, None if every lane
+        is empty or capped"""
+        for priority in sorted(self._rings):
+            ring = self._rings[priority]
+            for _ in range(len(ring)):
+                lane = ring[0]
+                if self._capped(lane):
+                    ring.rotate(-1)
+                    continue
+                queued_at, value = lane.entries.popleft()
+                self.size -= 1
+                self.running[lane.key] = self.running.get(lane.key, 0) + 1
+                waited = time.monotonic() - queued_at
+                if lane.stats is not None:
+                    lane.stats.record(waited)
+
+                lane.credit += 1
+                if not lane.entries:
+                    ring.popleft()
+                    del self._lanes[(priority, lane.key)]
+                    self._drop_queued(lane.key)
+                    if not ring:
+                        del self._rings[priority]
+                elif lane.credit >= lane.weight:
+                    lane.credit = 0
+                    ring.rotate(-1)
+                return lane.key, value, waited
+        return None
+
+    def _drop_queued(self, key: Hashable):
+        queued = self._queued[key] - 1
+        if queued:
+            self._queued[key] = queued
+        else:
+            del self._queued[key]
+
+    def done(self, key: Hashable):
+        """A value popped from lane ``key`` finished running"""
+        running = self.running.get(key, 0) - 1
+        if running > 0:
+            self.running[key] = running
+        else:
+            self.running.pop(key, None)
+            if key not in self._queued:
+                self.stats.pop(key, None)
+
+    def clear(self):
+        """Drop every waiting value"""
+        self._rings.clear()
+        self._lanes.clear()
+        self._queued.clear()
+        self.size = 0
+
+    def snapshot(self) -> list:
+        """Wait statistics of the lanes that are queued or running"""
+        queued: Dict[Hashable, int] = {}
+        for (_, key), lane in self._lanes.items():
+            queued[key] = queued.get(key, 0) + len(lane.entries)
+        result = []
+        for key, stats in self.stats.items():
+            item = stats.to_dict()
+            item["queued"] = queued.get(key, 0)
+            item["running"] = self.running.get(key, 0)
+            result.append(item)
+        return result
+
+
+class TaskQueue:
+    """Bounded queue of download tasks, fair across tasks.
+
+    ``lane(item)`` returns ``(key, weight, limit, stats)`` for an item: tasks
+    with the same key share a lane of :class:`FairLanes`, so one huge chat
+    cannot starve the others, ``limit`` caps how many of them download at
+    once (0 is no cap) and ``stats`` collects their wait times. Without
+    ``lane`` every item is in one lane and the queue is FIFO per priority.
+
+    ``put`` waits while ``maxsize`` tasks are queued, so a chat history
+    producer never runs far ahead of the downloads. Workers call ``done``
+    with the item once it is finished to release its lane's cap. ``get``,
+    ``get_nowait``, ``put_nowait``, ``empty`` and ``qsize`` behave as on
+    ``asyncio.Queue``.
+    """
+
+    def __init__(
+        self, maxsize: int = 0, lane: Callable[[Any], LaneInfo] = None
+    ):
+        self.maxsize = maxsize
+        self._lane = lane or _single_lane
+        self._lanes = FairLanes()
+        self._changed: Optional[asyncio.Event] = None
+        self.wait = WaitStats("total")
+
+    def _event(self) -> asyncio.Event:
+        # Created on first use so the queue can be built outside of a loop
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        return self._changed
+
+    def _notify(self):
+        if self._changed is not None:
+            self._changed.set()
+
+    def qsize(self) -> int:
+        """Number of queued tasks"""
+        return self._lanes.size
+
+    def empty(self) -> bool:
+        """True if no task is queued"""
+        return self._lanes.size == 0
+
+    def full(self) -> bool:
+        """True if ``put`` has to wait"""
+        return 0 < self.maxsize <= self._lanes.size
+
+    def put_nowait(self, item: Any, priority: int = PRIORITY_NORMAL):
+        """Put ``item`` or raise ``asyncio.QueueFull``"""
+        if self.full():
+            raise asyncio.QueueFull
+        self._lanes.push(item, priority, *self._lane(item))
+        self._notify()
+
+    async def put(self, item: Any, priority: int = PRIORITY_NORMAL):
+        """Put ``item``, waiting while the queue is full"""
+        while self.full():
+            await self._wait()
+        self.put_nowait(item, priority)
+
+    def get_nowait(self) -> Any:
+        """Take the next task or raise ``asyncio.QueueEmpty``"""
+        popped = self._lanes.pop()
+        if popped is None:
+            raise asyncio.QueueEmpty
+        _, item, waited = popped
+        self.wait.record(waited)
+        self._notify()
+        return item
+
+    async def get(self) -> Any:
+        """Take the next task, waiting until one is queued and its lane is
+        below its cap"""
+        while True:
+            try:
+                return self.get_nowait()
+            except asyncio.QueueEmpty:
+                await self._wait()
+
+    def done(self, item: Any):
+        """``item`` taken from the queue finished"""
+        self._lanes.done(self._lane(item)[0])
+        self._notify()
+
+    async def _wait(self):
+        event = self._event()
+        event.clear()
+        await event.wait()
+
+    def clear(self):
+        """Drop every queued task"""
+        self._lanes.clear()
+        self._notify()
+
+    def stats(self) -> dict:
+        """Queue length and per task wait times for the status API"""
+        return {
+            "queued": self.qsize(),
+            "running": sum(self._lanes.running.values()),
+            "wait": self.wait.to_dict(),
+            "tasks": self._lanes.snapshot(),
+        }
+
+
+class FairGate:
+    """Process wide cap on downloads, shared fairly by profiles.
+
+    ``slot(key, weight)`` holds one of ``limit`` slots. When slots are
+    short the waiting keys get them in weighted round-robin order, so one
+    busy profile cannot keep the others waiting. A ``limit`` of 0 never
+    waits.
+    """
+
+    def __init__(self, limit: int = 0):
+        self.limit = limit
+        self.in_use = 0
+        self._waiters = FairLanes()
+
+    def _wake(self):
+        while self._waiters.size and (not self.limit or self.in_use < self.limit):
+            key, future, _ = self._waiters.pop()
+            # the waiter holds the slot, not the lane
+            self._waiters.done(key)
+            if not future.done():
+                self.in_use += 1
+                future.set_result(None)
+
+    async def acquire(self, key: Hashable, weight: int = 1):
+        """Wait for a slot"""
+        if not self._waiters.size and (not self.limit or self.in_use < self.limit):
+            self.in_use += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.push(future, PRIORITY_NORMAL, key, weight)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        """Give a slot back"""
+        self.in_use = max(self.in_use - 1, 0)
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self, key: Hashable, weight: int = 1):
+        """``async with gate.slot(profile_id):`` holds a slot"""
+        await self.acquire(key, weight)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+download_gate = FairGate()
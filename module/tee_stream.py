@@ -0,0 +1,183 @@
+"""Read a stream once and feed it to several sinks"""
+
+import asyncio
+import os
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Dict
+
+from loguru import logger
+
+
+class SinkTooSlow(Exception):
+    """A sink kept the source waiting longer than allowed and was detached"""
+
+
+class _Branch:
+    __slots__ = ("name", "chunks", "buffered", "readable", "writable", "closed")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.chunks: deque = deque()
+        self.buffered = 0
+        self.readable = asyncio.Event()
+        self.writable = asyncio.Event()
+        self.closed = False
+
+    def push(self, item):
+        self.chunks.append(item)
+        if isinstance(item, (bytes, bytearray, memoryview)):
+            self.buffered += len(item)
+        self.readable.set()
+
+
+class TeeStream:
+    """Fans the chunks of ``source`` out to branches.
+
+    The source is read once. Every chunk is queued on each branch, and a
+    branch buffers up to ``max_buffer`` bytes that its sink has not read
+    yet. When a buffer is full the source waits for that sink, so a slow
+    sink slows the download down instead of filling memory. A sink that
+    keeps the source waiting more than ``max_stall`` seconds for one chunk
+    is detached, its branch raises ``SinkTooSlow`` and the other sinks go
+    on at full speed. With a ``max_stall`` of 0 the source waits as long
+    as it takes. A sink that stops reading early is detached as well, the
+    source is only read while a branch is attached.
+    """
+
+    def __init__(
+        self,
+        source: AsyncIterator[bytes],
+        max_buffer: int = 8 * 1024 * 1024,
+        max_stall: float = 30.0,
+    ):
+        self.source = source
+        self.max_buffer = max(max_buffer, 1)
+        self.max_stall = max_stall
+        self._branches: Dict[str, _Branch] = {}
+
+    def branch(self, name: str) -> AsyncIterator[bytes]:
+        """Chunks of the source for the sink ``name``, made before ``run``"""
+        branch = _Branch(name)
+        self._branches[name] = branch
+        return self._read(branch)
+
+    def detach(self, name: str):
+        """Stop feeding the branch ``name``"""
+        branch = self._branches[name]
+        branch.closed = True
+        branch.writable.set()
+
+    async def _read(self, branch: _Branch):
+        try:
+            while True:
+                while not branch.chunks:
+                    branch.readable.clear()
+                    await branch.readable.wait()
+                item = branch.chunks.popleft()
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                branch.buffered -= len(item)
+                branch.writable.set()
+                yield item
+        finally:
+            self.detach(branch.name)
+
+    async def _offer(self, branch: _Branch, chunk: bytes):
+        while (
+            not branch.closed
+            and branch.buffered
+            and branch.buffered + len(chunk) > self.max_buffer
+        ):
+            branch.writable.clear()
+            await branch.writable.wait()
+        if not branch.closed:
+            branch.push(chunk)
+
+    async def _offer_within_stall(self, branch: _Branch, chunk: bytes):
+        if not self.max_stall:
+            await self._offer(branch, chunk)
+            return
+        try:
+            await asyncio.wait_for(self._offer(branch, chunk), self.max_stall)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Sink {branch.name} is more than {self.max_stall}s behind, "
+                "detached"
+            )
+            self.detach(branch.name)
+            branch.chunks.clear()
+            branch.buffered = 0
+            branch.push(SinkTooSlow(branch.name))
+
+    async def run(self):
+        """Read the source into the branches until it ends or no branch is
+        left"""
+        try:
+            async for chunk in self.source:
+                attached = [it for it in self._branches.values() if not it.closed]
+                if not attached:
+                    break
+                await asyncio.gather(
+                    *(self._offer_within_stall(it, chunk) for it in attached)
+                )
+        except Exception as e:
+            for branch in self._branches.values():
+                if not branch.closed:
+                    branch.push(e)
+            raise
+        finally:
+            if hasattr(self.source, "aclose"):
+                await self.source.aclose()
+        for branch in self._branches.values():
+            if not branch.closed:
+                branch.push(None)
+
+
+async def tee(
+    source: AsyncIterator[bytes],
+    sinks: Dict[str, Callable[[AsyncIterator[bytes]], Awaitable]],
+    max_buffer: int = 8 * 1024 * 1024,
+    max_stall: float = 30.0,
+) -> Dict[str, object]:
+    """Run every sink on its own branch of ``source``, see ``TeeStream``.
+
+    Returns the result of each sink by name, or the exception it raised.
+    """
+    stream = TeeStream(source, max_buffer, max_stall)
+
+    async def run_sink(name: str, branch: AsyncIterator[bytes]):
+        try:
+            return await sinks[name](branch)
+        finally:
+            # detach at once, also if the sink did not read to the end
+            await branch.aclose()
+            stream.detach(name)
+
+    names = list(sinks)
+    readers = [run_sink(name, stream.branch(name)) for name in names]
+    pump = asyncio.ensure_future(stream.run())
+    try:
+        results = await asyncio.gather(*readers, return_exceptions=True)
+    finally:
+        if not pump.done():
+            pump.cancel()
+        await asyncio.gather(pump, return_exceptions=True)
+    return dict(zip(names, results))
+
+
+async def file_sink(path: str, stream: AsyncIterator[bytes]) -> bool:
+    """Write ``stream`` to ``path``, a partial file is removed on error"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    try:
+        with open(path, "wb") as f:
+            async for chunk in stream:
+                f.write(chunk)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return True
@@ -0,0 +1,195 @@
+"""Upload files of one directory with a single ``rclone copy``"""
+
+import asyncio
+import json
+import os
+import tempfile
+from typing import Callable, Dict, Tuple
+
+from loguru import logger
+
+from module.rclone_rc import format_stats
+
+
+class _Batch:
+    __slots__ = ("files", "size", "timer")
+
+    def __init__(self):
+        # file name -> (future, progress callback, progress args)
+        self.files: Dict[str, tuple] = {}
+        self.size = 0
+        self.timer = None
+
+
+class RcloneBatcher:
+    """Collects files per source and remote directory and copies each
+    batch with one ``rclone copy --files-from-raw``.
+
+    A batch is uploaded ``window`` seconds after its first file came in,
+    or as soon as it holds ``max_files`` files or ``max_size`` bytes.
+    ``upload`` returns once the batch of the file finished. rclone runs
+    with ``--use-json-log``, so the result and the progress of every file
+    are read from the log lines that name it. A file counts as uploaded
+    only if rclone logged that it copied it, or if ``rclone lsjson`` finds
+    it on the remote afterwards, which is the case for files that were
+    already there. The file list is passed raw, rclone would skip names
+    starting with ``#`` or ``;`` and strip spaces from a plain
+    ``--files-from`` list without reporting an error.
+    """
+
+    def __init__(
+        self,
+        rclone_path: str,
+        window: float = 2,
+        max_files: int = 100,
+        max_size: int = 1024 * 1024 * 1024,
+    ):
+        self.rclone_path = rclone_path
+        self.window = window
+        self.max_files = max(max_files, 1)
+        self.max_size = max_size
+        self._batches: Dict[Tuple[str, str], _Batch] = {}
+        self._tasks: set = set()
+
+    async def upload(
+        self,
+        local_file_path: str,
+        remote_dir: str,
+        progress_callback: Callable = None,
+        progress_args: tuple = (),
+    ) -> bool:
+        """Upload ``local_file_path`` into ``remote_dir`` with its batch"""
+        src_dir, name = os.path.split(os.path.abspath(local_file_path))
+        key = (src_dir, remote_dir)
+        batch = self._batches.get(key)
+        if batch is not None and name in batch.files:
+            # the same file again, it goes with the next batch
+            self._flush(key)
+            batch = None
+        if batch is None:
+            batch = _Batch()
+            self._batches[key] = batch
+            batch.timer = asyncio.get_running_loop().call_later(
+                self.window, self._flush, key
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        batch.files[name] = (future, progress_callback, progress_args)
+        batch.size += os.path.getsize(local_file_path)
+        if len(batch.files) >= self.max_files or (
+            self.max_size and batch.size >= self.max_size
+        ):
+            self._flush(key)
+        return await future
+
+    def _flush(self, key: Tuple[str, str]):
+        batch = self._batches.pop(key, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        task = asyncio.ensure_future(self._run(key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    def _write_files_from(names) -> str:
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=".txt", delete=False, encoding="utf-8", newline="\n"
+        ) as files_from:
+            files_from.write("".join(f"{name}\n" for name in names))
+        return files_from.name
+
+    async def _existing(self, remote_dir: str, names: list) -> set:
+        """Which of ``names`` are files in ``remote_dir``"""
+        files_from = self._write_files_from(names)
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                self.rclone_path,
+                "lsjson",
+                remote_dir,
+                "--files-from-raw",
+                files_from,
+                "--files-only",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            stdout, _ = await proc.communicate()
+            if proc.returncode != 0:
+                return set()
+            return {it.get("Path") for it in json.loads(stdout)} & set(names)
+        except Exception as e:
+            logger.error(f"rclone lsjson of {remote_dir} failed: {e}")
+            return set()
+        finally:
+            os.remove(files_from)
+
+    async def _run(self, key: Tuple[str, str], batch: _Batch):
+        src_dir, remote_dir = key
+        files_from = self._write_files_from(batch.files)
+        copied: set = set()
+        failed: Dict[str, str] = {}
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                self.rclone_path,
+                "copy",
+                src_dir,
+                remote_dir,
+                "--files-from-raw",
+                files_from,
+                "--ignore-existing",
+                "--use-json-log",
+                "--verbose",
+                "--stats",
+                "1s",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+            )
+            if proc.stdout:
+                async for line in proc.stdout:
+                    await self._read_log(line, batch, copied, failed)
+            await proc.wait()
+        except Exception as e:
+            logger.error(f"rclone batch upload of {src_dir} failed: {e}")
+        finally:
+            os.remove(files_from)
+
+        # files rclone did not log were skipped, look whether they are there
+        unlogged = [it for it in batch.files if it not in copied and it not in failed]
+        existing = await self._existing(remote_dir, unlogged) if unlogged else set()
+
+        logger.info(
+            f"rclone batch {src_dir} -> {remote_dir}: {len(copied)} copied, "
+            f"{len(existing)} already there, {len(failed)} failed "
+            f"of {len(batch.files)}"
+        )
+        for name, (future, _, _) in batch.files.items():
+            if name in failed:
+                logger.error(f"upload file {name} failed: {failed[name]}")
+            elif name not in copied and name not in existing:
+                logger.error(f"upload file {name} failed: not found on {remote_dir}")
+            if not future.done():
+                future.set_result(name in copied or name in existing)
+
+    @staticmethod
+    async def _read_log(line: bytes, batch: _Batch, copied: set, failed: dict):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return
+        if not isinstance(entry, dict):
+            return
+
+        name = entry.get("object")
+        if name in batch.files:
+            if entry.get("msg", "").startswith("Copied"):
+                copied.add(name)
+            elif entry.get("level") == "error":
+                failed[name] = entry.get("msg", "")
+
+        for transfer in (entry.get("stats") or {}).get("transferring") or []:
+            item = batch.files.get(transfer.get("name"))
+            if not item or not item[1]:
+                continue
+            _, progress_callback, progress_args = item
+            stats = dict(transfer, totalBytes=transfer.get("size"))
+            await progress_callback(*format_stats(stats), *progress_args)
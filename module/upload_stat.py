@@ -3,6 +3,7 @@ import re
 import time
 from typing import Dict, Optional
 
+from module.change_feed import task_feed
 from module.db import db
 
 _upload_result: Dict = {}
@@ -40,6 +41,7 @@ def register_upload_task(
             "updated_at": time.time(),
             "state": "waiting",  # waiting, uploading, retrying, failed, success
         }
+        task_feed.touch((chat_id, message_id))
 
 
 def update_task_state(chat_id: int, message_id: int, state: str):
@@ -48,6 +50,7 @@ def update_task_state(chat_id: int, message_id: int, state: str):
     if chat_id in _upload_result and message_id in _upload_result[chat_id]:
         _upload_result[chat_id][message_id]["state"] = state
         _upload_result[chat_id][message_id]["updated_at"] = time.time()
+        task_feed.touch((chat_id, message_id))
 
 
 def get_upload_result() -> Dict:
@@ -152,6 +155,7 @@ def update_upload_status(
         "profile_id": profile_id,
         "updated_at": cur_time,
     }
+    task_feed.touch((chat_id, message_id))
 
     # Global Speed Calculation (tick every 1s)
     if cur_time - _last_upload_time >= 1.0:
@@ -212,6 +216,7 @@ def remove_upload_status(chat_id: int, message_id: int, profile_id: str = None):
         # Clean up empty chat dict
         if not _upload_result[chat_id]:
             del _upload_result[chat_id]
+        task_feed.touch((chat_id, message_id))
 
 
 def clear_upload_history():
@@ -234,3 +239,4 @@ def clear_upload_history():
             active[chat_id] = active_msgs
 
     _upload_result = active
+    task_feed.reset()
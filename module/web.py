@@ -55,7 +55,11 @@ from module.download_stat import (
     get_task_state,
 )
 from module.upload_stat import get_upload_result, get_total_upload_speed
+from module.change_feed import task_feed
 from module.cloud_drive import CloudDrive
+from module.history_index import history_index
+from module.progress import progress_registry
+from module.rate_limiter import rate_limiter
 from utils.crypto import AesBase64
 from utils.format import format_byte
 
@@ -180,6 +184,7 @@ def _save_current_config(new_config: dict) -> dict:
         print("DEBUG: [web] Updating in-memory app config from Web UI")
         _app_instance.config = new_config
         _app_instance.assign_config(new_config)
+        rate_limiter.configure(_app_instance.rate_limits)
         _sync_web_login_secret()
 
     if _update_runtime_config_callback and active_profile_id:
@@ -316,6 +321,8 @@ def _profile_to_account(
         "runtimeStatus": runtime_info.get("status") or "stopped",
         "runtimeMessage": runtime_info.get("message") or "",
         "botRunning": bool(runtime_info.get("bot_started")),
+        "queueStats": runtime_info.get("queue") or {},
+        "concurrency": runtime_info.get("concurrency"),
         "runtimeEnabled": bool(profile.get("runtime_enabled")),
         "botAccess": _bot_access_from_config(profile.get("config") or {}),
     }
@@ -1188,6 +1195,7 @@ def _apply_profile_to_app(profile: dict):
     _app_instance._chat_id = ""
     _app_instance.config = profile.get("config") or {}
     _app_instance.assign_config(_app_instance.config)
+    rate_limiter.configure(_app_instance.rate_limits)
     _app_instance.app_data = profile.get("app_data") or {}
     _app_instance.assign_app_data(_app_instance.app_data)
     _sync_web_login_secret()
@@ -1567,6 +1575,13 @@ def get_db_status():
     return jsonify(db.get_heartbeat_status())
 
 
+@_flask_app.route("/get_rate_limit_status")
+@login_required
+def get_rate_limit_status():
+    """Get Telegram call limits, FloodWaits and the time they cost"""
+    return jsonify(rate_limiter.stats())
+
+
 @_flask_app.route("/clear_history", methods=["POST"])
 @login_required
 def api_clear_history():
@@ -1614,179 +1629,243 @@ def get_download_list():
     return jsonify(_get_formatted_list(already_down))
 
 
+@_flask_app.route("/api/history")
+@login_required
+def api_history():
+    """Paginated, sortable download history.
+
+    Query args: page (1-based), page_size (max 500), sort (completed_at or
+    filename), order (asc or desc), chat, profile, prefix (file name prefix).
+    """
+    try:
+        page = max(int(request.args.get("page", 1)), 1)
+        page_size = min(max(int(request.args.get("page_size", 50)), 1), 500)
+        chat = request.args.get("chat")
+        chat_id = int(chat) if chat else None
+        total, keys = history_index.query(
+            offset=(page - 1) * page_size,
+            limit=page_size,
+            sort=request.args.get("sort", "completed_at"),
+            descending=request.args.get("order", "desc") != "asc",
+            chat_id=chat_id,
+            profile_id=request.args.get("profile") or None,
+            prefix=request.args.get("prefix") or None,
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    items = []
+    for chat_id, message_id in keys:
+        item = _format_task_item(chat_id, message_id)
+        if item is not None:
+            items.append(item)
+    return jsonify(
+        {
+            "success": True,
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "items": items,
+        }
+    )
+
+
 def _get_formatted_list(already_down=False):
-    """Helper to get formatted list data"""
-    download_result = get_download_result()
-    upload_result = get_upload_result()
-    data = []
+    """Helper to get formatted list data.
 
-    # 1. Collect all unique (chat_id, message_id) pairs
-    all_tasks = set()
-    for cid, msgs in download_result.items():
-        for mid in msgs.keys():
-            all_tasks.add((cid, mid))
-    for cid, msgs in upload_result.items():
-        for mid in msgs.keys():
-            all_tasks.add((cid, mid))
-
-    # 2. Iterate and format
-    for chat_id, idx in all_tasks:
-        d_item = download_result.get(chat_id, {}).get(idx)
-        u_item = upload_result.get(chat_id, {}).get(idx)
-        
-        # Use whatever is available as base
-        base_item = d_item if d_item else u_item
-        if not base_item:
+    Finished rows come from the history index, newest first, and are skipped
+    without formatting when the active rows are asked for.
+    """
+    if already_down:
+        _, keys = history_index.query(limit=len(history_index))
+    else:
+        keys = set()
+        for result in (get_download_result(), get_upload_result()):
+            for cid, msgs in list(result.items()):
+                keys.update((cid, mid) for mid in list(msgs.keys()))
+        keys = [key for key in keys if key not in history_index]
+
+    data = []
+    for chat_id, idx in keys:
+        item = _format_task_item(chat_id, idx)
+        if item is None or item["finished"] != already_down:
             continue
-        profile_id = (d_item or {}).get("profile_id") or (u_item or {}).get(
-            "profile_id"
-        )
+        data.append(item)
+    return data
 
-        # Extract basic info
-        file_name = base_item.get("file_name", "Unknown")
-        total_size = base_item.get("total_size") or base_item.get("total_bytes", 0)
-        
-        # --- Download Status ---
-        down_byte = 0
-        download_speed_val = 0
-        if d_item:
-            down_byte = d_item.get("down_byte", 0)
-            download_speed_val = d_item.get("download_speed", 0)
-        elif u_item:
-            # If no download record but uploading (Streaming), assume download matches upload
-            down_byte = u_item.get("processed_bytes", 0)
-            # Streaming mode: download speed equals upload speed (data flows simultaneously)
-            download_speed_val = u_item.get("upload_speed", 0)
-        
-        # --- Upload Status ---
-        upload_speed_val = 0
-        upload_processed = 0
-        upload_total = total_size
-        is_uploading = False
-        
-        if u_item:
-            is_uploading = True
-            upload_speed_val = u_item.get("upload_speed", 0)
-            upload_processed = u_item.get("processed_bytes", 0)
-            upload_total = u_item.get("total_bytes", total_size)
-            
-        # --- Progress Calculation ---
-        download_progress = 0
-        if total_size > 0:
-            download_progress = min(round(down_byte / total_size * 100, 1), 100.0)
-            
-        upload_progress = 0
-        if is_uploading:
-            if upload_total > 0:
-                upload_progress = min(round(upload_processed / upload_total * 100, 1), 100.0)
-        else:
-            # Fallback simulation for non-uploading tasks (old logic)
-            if download_progress >= 100:
-                upload_progress = 100.0
-            else:
-                upload_progress = min(download_progress, 99.9)
-
-        # --- Activity/Completion Check ---
-        # A task is ONLY "Completed" if it exists in download_result AND is 100%
-        # (This confirms verify_and_save_download was called after WebDAV confirmed success)
-        is_truly_finished = False
-        if d_item:
-            if d_item.get("down_byte", 0) >= d_item.get("total_size", 1):
-                is_truly_finished = True
-        
-        # If it's effectively 100% data transfer but NOT yet marked finished in history,
-        # it means it's "Finishing" (waiting for server to close the stream/confirm receipt)
-        is_finishing = False
-        raw_progress = (down_byte / total_size * 100) if total_size > 0 else 0
-        if not is_truly_finished and raw_progress >= 99.9:
-            is_finishing = True
-
-        # Filter based on requested list type
-        if already_down:
-            # Asking for History -> Show only truly physically finished
-            if not is_truly_finished:
-                continue
+
+def _get_formatted_changes(keys):
+    """Format the rows named by change feed keys.
+
+    Returns ``(tasks, history, removed)``: rows that now belong to the active
+    list, rows that now belong to the history list and rows that no longer
+    exist in either stats table.
+    """
+    tasks, history, removed = [], [], []
+    for chat_id, idx in keys:
+        item = _format_task_item(chat_id, idx)
+        if item is None:
+            removed.append({"chat": str(chat_id), "id": str(idx)})
+        elif item["finished"]:
+            history.append(item)
         else:
-            # Asking for Active -> Show only NOT finished
-            if is_truly_finished:
-                continue
+            tasks.append(item)
+    return tasks, history, removed
 
-        # --- Strings Formatting ---
-        download_speed_str = format_byte(download_speed_val) + "/s"
-        upload_speed_str = format_byte(upload_speed_val) + "/s"
-        
-        # Paths
-        local_path = file_name.replace("\\", "/")
-        remote_path = local_path
-        config_save_path = ""
-        relative_path = CloudDrive.get_relative_upload_path("", local_path)
-        if _app_instance and hasattr(_app_instance, 'cloud_drive_config'):
-            cloud_cfg = _app_instance.cloud_drive_config
-            if hasattr(_app_instance, "save_path"):
-                config_save_path = _app_instance.save_path.replace("\\", "/").rstrip("/")
-
-            relative_path = CloudDrive.get_relative_upload_path(
-                config_save_path, local_path
-            )
-            if hasattr(cloud_cfg, 'remote_dir') and cloud_cfg.remote_dir:
-                remote_path = f"{cloud_cfg.remote_dir.rstrip('/')}/{relative_path}"
 
-        # Valid Time
-        created_ts = base_item.get("created_at") or base_item.get("start_time") or time.time()
-        completed_ts = base_item.get("end_time") or base_item.get("updated_at") or created_ts
+def _format_task_item(chat_id, idx):
+    """Format one (chat_id, message_id) row, or None if it no longer exists"""
+    d_item = get_download_result().get(chat_id, {}).get(idx)
+    u_item = get_upload_result().get(chat_id, {}).get(idx)
+
+    # Use whatever is available as base
+    base_item = d_item if d_item else u_item
+    if not base_item:
+        return None
+    profile_id = (d_item or {}).get("profile_id") or (u_item or {}).get(
+        "profile_id"
+    )
+
+    # Extract basic info
+    file_name = base_item.get("file_name", "Unknown")
+    total_size = base_item.get("total_size") or base_item.get("total_bytes", 0)
+    
+    # --- Download Status ---
+    down_byte = 0
+    download_speed_val = 0
+    live = progress_registry.get(chat_id, idx) if d_item else None
+    if live:
+        # Active transfer: read the registry rather than the once-per-second copy
+        down_byte = live["down_byte"]
+        download_speed_val = live["download_speed"]
+    elif d_item:
+        down_byte = d_item.get("down_byte", 0)
+        download_speed_val = d_item.get("download_speed", 0)
+    elif u_item:
+        # If no download record but uploading (Streaming), assume download matches upload
+        down_byte = u_item.get("processed_bytes", 0)
+        # Streaming mode: download speed equals upload speed (data flows simultaneously)
+        download_speed_val = u_item.get("upload_speed", 0)
+    
+    # --- Upload Status ---
+    upload_speed_val = 0
+    upload_processed = 0
+    upload_total = total_size
+    is_uploading = False
+    
+    if u_item:
+        is_uploading = True
+        upload_speed_val = u_item.get("upload_speed", 0)
+        upload_processed = u_item.get("processed_bytes", 0)
+        upload_total = u_item.get("total_bytes", total_size)
         
-        beijing_tz = timezone(timedelta(hours=8))
-        created_at_fmt = datetime.fromtimestamp(created_ts, tz=beijing_tz).strftime("%Y-%m-%d %H:%M:%S")
-        completed_at_fmt = datetime.fromtimestamp(completed_ts, tz=beijing_tz).strftime("%Y-%m-%d %H:%M:%S")
-
-        # Custom progress string for finishing state
-        display_download_progress = str(download_progress)
-        display_upload_progress = str(upload_progress)
-        if is_finishing:
-             display_download_progress = "Finishing..."
-             display_upload_progress = "Finishing..."
-
-        # Determine status text
-        status_text = ""
-        if is_truly_finished:
-            status_text = "已完成"
-        elif is_finishing:
-            status_text = "正在完成..."
-        elif is_uploading:
-            if upload_progress > 0:
-                status_text = "上传中"
-            else:
-                status_text = "准备上传"
-        elif download_progress > 0:
-            status_text = "下载中"
+    # --- Progress Calculation ---
+    download_progress = 0
+    if total_size > 0:
+        download_progress = min(round(down_byte / total_size * 100, 1), 100.0)
+        
+    upload_progress = 0
+    if is_uploading:
+        if upload_total > 0:
+            upload_progress = min(round(upload_processed / upload_total * 100, 1), 100.0)
+    else:
+        # Fallback simulation for non-uploading tasks (old logic)
+        if download_progress >= 100:
+            upload_progress = 100.0
         else:
-            status_text = "等待中"
-
-        item = {
-            "chat": str(chat_id),
-            "id": str(idx),
-            "filename": os.path.basename(file_name),
-            "total_size": format_byte(total_size),
-            "download_progress": display_download_progress,
-            "upload_progress": display_upload_progress,
-            "download_speed": download_speed_str if not is_finishing else "0.0b/s",
-            "upload_speed": upload_speed_str if not is_finishing else "0.0b/s",
-            "save_path": local_path,
-            "remote_path": remote_path,
-            "relative_path": relative_path,
-            "created_at": created_at_fmt,
-            "completed_at": completed_at_fmt if is_truly_finished else None,
-            "created_ts": created_ts,
-            "completed_ts": completed_ts if is_truly_finished else None,
-            "profile_id": profile_id,
-            "profileId": profile_id,
-            "state": get_task_state(chat_id, idx, profile_id)
-            if not already_down
-            else 'finished',
-            "status": status_text
-        }
-        data.append(item)
-    return data
+            upload_progress = min(download_progress, 99.9)
+
+    # --- Activity/Completion Check ---
+    # A task is ONLY "Completed" if it exists in download_result AND is 100%
+    # (This confirms verify_and_save_download was called after WebDAV confirmed success)
+    is_truly_finished = False
+    if d_item:
+        if d_item.get("down_byte", 0) >= d_item.get("total_size", 1):
+            is_truly_finished = True
+    
+    # If it's effectively 100% data transfer but NOT yet marked finished in history,
+    # it means it's "Finishing" (waiting for server to close the stream/confirm receipt)
+    is_finishing = False
+    raw_progress = (down_byte / total_size * 100) if total_size > 0 else 0
+    if not is_truly_finished and raw_progress >= 99.9:
+        is_finishing = True
+
+    # --- Strings Formatting ---
+    download_speed_str = format_byte(download_speed_val) + "/s"
+    upload_speed_str = format_byte(upload_speed_val) + "/s"
+    
+    # Paths
+    local_path = file_name.replace("\\", "/")
+    remote_path = local_path
+    config_save_path = ""
+    relative_path = CloudDrive.get_relative_upload_path("", local_path)
+    if _app_instance and hasattr(_app_instance, 'cloud_drive_config'):
+        cloud_cfg = _app_instance.cloud_drive_config
+        if hasattr(_app_instance, "save_path"):
+            config_save_path = _app_instance.save_path.replace("\\", "/").rstrip("/")
+
+        relative_path = CloudDrive.get_relative_upload_path(
+            config_save_path, local_path
+        )
+        if hasattr(cloud_cfg, 'remote_dir') and cloud_cfg.remote_dir:
+            remote_path = f"{cloud_cfg.remote_dir.rstrip('/')}/{relative_path}"
+
+    # Valid Time
+    created_ts = base_item.get("created_at") or base_item.get("start_time") or time.time()
+    completed_ts = base_item.get("end_time") or base_item.get("updated_at") or created_ts
+    
+    beijing_tz = timezone(timedelta(hours=8))
+    created_at_fmt = datetime.fromtimestamp(created_ts, tz=beijing_tz).strftime("%Y-%m-%d %H:%M:%S")
+    completed_at_fmt = datetime.fromtimestamp(completed_ts, tz=beijing_tz).strftime("%Y-%m-%d %H:%M:%S")
+
+    # Custom progress string for finishing state
+    display_download_progress = str(download_progress)
+    display_upload_progress = str(upload_progress)
+    if is_finishing:
+         display_download_progress = "Finishing..."
+         display_upload_progress = "Finishing..."
+
+    # Determine status text
+    status_text = ""
+    if is_truly_finished:
+        status_text = "已完成"
+    elif is_finishing:
+        status_text = "正在完成..."
+    elif is_uploading:
+        if upload_progress > 0:
+            status_text = "上传中"
+        else:
+            status_text = "准备上传"
+    elif download_progress > 0:
+        status_text = "下载中"
+    else:
+        status_text = "等待中"
+
+    item = {
+        "chat": str(chat_id),
+        "id": str(idx),
+        "filename": os.path.basename(file_name),
+        "total_size": format_byte(total_size),
+        "download_progress": display_download_progress,
+        "upload_progress": display_upload_progress,
+        "download_speed": download_speed_str if not is_finishing else "0.0b/s",
+        "upload_speed": upload_speed_str if not is_finishing else "0.0b/s",
+        "save_path": local_path,
+        "remote_path": remote_path,
+        "relative_path": relative_path,
+        "created_at": created_at_fmt,
+        "completed_at": completed_at_fmt if is_truly_finished else None,
+        "created_ts": created_ts,
+        "completed_ts": completed_ts if is_truly_finished else None,
+        "profile_id": profile_id,
+        "profileId": profile_id,
+        "state": get_task_state(chat_id, idx, profile_id)
+        if not is_truly_finished
+        else 'finished',
+        "status": status_text,
+        "finished": is_truly_finished,
+    }
+    return item
 
 
 @_flask_app.route("/task_control", methods=["POST"])
@@ -1825,9 +1904,16 @@ def api_task_control():
 @_flask_app.route("/stream")
 @login_required
 def stream():
-    """Server-Sent Events for Dashboard"""
+    """Server-Sent Events for Dashboard.
+
+    A full snapshot (``type: update``) is sent when the browser (re)connects,
+    after that only rows changed since the last sent ``seq`` (``type: delta``).
+    The history is not part of the snapshot, only its size: the browser reads
+    it page by page from ``/api/history`` and patches the shown page with the
+    deltas.
+    """
     def generate():
-        history_tick = 0
+        last_seq = None
         while True:
             try:
                 # 1. Status (Speed)
@@ -1836,28 +1922,42 @@ def stream():
                     "upload_speed": format_byte(get_total_upload_speed()) + "/s"
                 }
 
-                # 2. Active Tasks
-                active_tasks = _get_formatted_list(already_down=False)
-
-                payload = {
-                    "type": "update",
-                    "status": speed_data,
-                    "tasks": active_tasks
-                }
-
-                # 3. History (Every 5 seconds)
-                if history_tick % 5 == 0:
-                    history = _get_formatted_list(already_down=True)
-                    payload["history"] = history
-                
-                history_tick += 1
+                keys = None
+                if last_seq is not None:
+                    seq, keys = task_feed.changes_since(last_seq)
+
+                if keys is None:
+                    # 2. Full snapshot. Take seq first so rows changed while
+                    # building it are sent again with the next delta.
+                    seq = task_feed.seq
+                    payload = {
+                        "type": "update",
+                        "seq": seq,
+                        "status": speed_data,
+                        "tasks": _get_formatted_list(already_down=False),
+                        "history_total": len(history_index),
+                    }
+                else:
+                    # 3. Only rows touched since the last message
+                    tasks, history, removed = _get_formatted_changes(keys)
+                    payload = {
+                        "type": "delta",
+                        "seq": seq,
+                        "status": speed_data,
+                        "tasks": tasks,
+                        "history": history,
+                        "history_total": len(history_index),
+                        "removed": removed,
+                    }
+                last_seq = seq
 
                 yield f"data: {json.dumps(payload)}\n\n"
                 
                 time.sleep(1)
             except Exception as e:
                 print(f"Stream Error: {e}")
-                # Send empty or error event to keep alive or reconnect
+                # Send error event and fall back to a snapshot on the next tick
+                last_seq = None
                 yield f"event: error\ndata: {str(e)}\n\n"
                 time.sleep(5)
 
@@ -0,0 +1,399 @@
+"""Pooled WebDAV session with an index of the remote directories"""
+
+import asyncio
+import re
+import urllib.parse
+import uuid
+import weakref
+import xml.etree.ElementTree as ET
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+import aiohttp
+from loguru import logger
+
+from module.db import db
+
+DIR_INDEX_KEY = "webdav_dir_index"
+
+# How a file is uploaded in segments, see WebDavClient.upload_mode
+UPLOAD_PUT = "put"
+UPLOAD_NEXTCLOUD = "nextcloud"
+UPLOAD_PARTIAL = "partial"
+
+_NEXTCLOUD_FILES = re.compile(r"^(?P<root>.*/remote\.php/dav)/files/(?P<user>[^/]+)")
+_PARTIAL_UPDATE = "application/x-sabredav-partialupdate"
+
+_PROPFIND_BODY = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<d:propfind xmlns:d="DAV:"><d:prop><d:resourcetype/></d:prop></d:propfind>'
+)
+
+# base url -> remote directories known to exist, shared by the clients of
+# every profile and saved with the settings
+_dir_index: Dict[str, Set[str]] = {}
+_index_loaded = False
+_clients: weakref.WeakSet = weakref.WeakSet()
+
+
+async def _load_dir_index():
+    global _index_loaded
+    if _index_loaded:
+        return
+    _index_loaded = True
+    if not db.conn:
+        return
+    try:
+        saved = await db.load_setting_async(DIR_INDEX_KEY) or {}
+    except Exception as e:
+        logger.warning(f"Failed to load WebDAV directory index: {e}")
+        return
+    for url, dirs in saved.items():
+        _dir_index.setdefault(url, set()).update(dirs)
+
+
+def _save_dir_index():
+    if db.conn:
+        db.save_setting(
+            DIR_INDEX_KEY, {url: sorted(dirs) for url, dirs in _dir_index.items()}
+        )
+
+
+class WebDavClient:
+    """Long lived WebDAV client of one ``CloudDriveConfig``.
+
+    Every request goes through one ``aiohttp.ClientSession`` whose connector
+    keeps up to ``connections`` keep-alive connections open, so an upload
+    does not pay for a new TCP and TLS handshake.
+
+    ``ensure_dir`` looks directories up in an index of the remote tree
+    first. A parent that was not looked at yet is listed once with
+    PROPFIND Depth 1 and only directories that are still missing get a
+    MKCOL. The index is saved with the settings, so after a restart known
+    directories cost no request at all.
+    """
+
+    def __init__(
+        self, url: str, username: str = "", password: str = "", connections: int = 8
+    ):
+        self.url = url.rstrip("/")
+        self.username = username
+        self.password = password
+        self.connections = max(connections, 1)
+        self.dirs = _dir_index.setdefault(self.url, set())
+        self.propfind_count = 0
+        self.mkcol_count = 0
+        # parents whose subdirectories are all in the index
+        self._listed: Set[str] = set()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._upload_mode: Optional[str] = None
+        # seconds before the first retry of a segment, grows per attempt
+        self.retry_delay = 2.0
+        _clients.add(self)
+
+    def session(self) -> aiohttp.ClientSession:
+        """The pooled session, created on first use in the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            auth = None
+            if self.username:
+                auth = aiohttp.BasicAuth(self.username, self.password)
+            connector = aiohttp.TCPConnector(
+                limit=self.connections,
+                limit_per_host=self.connections,
+                keepalive_timeout=60,
+            )
+            # 10s for connect, 2 hours for total upload. Large videos need more time.
+            self._session = aiohttp.ClientSession(
+                auth=auth,
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=7200, connect=10),
+            )
+            self._loop = loop
+            self._locks.clear()
+        return self._session
+
+    def file_url(self, path: str) -> str:
+        """Url of ``path``, every segment is quoted on its own"""
+        path = path.strip("/")
+        if not path:
+            return self.url + "/"
+        return f"{self.url}/" + "/".join(
+            urllib.parse.quote(part) for part in path.split("/")
+        )
+
+    def _add(self, dirs: Set[str]):
+        new = dirs - self.dirs
+        if new:
+            self.dirs.update(new)
+            _save_dir_index()
+
+    def forget(self, path: str):
+        """Drop ``path`` and everything below it from the index, for a
+        directory that was removed on the server"""
+        path = path.strip("/")
+        prefix = path + "/"
+        stale = {it for it in self.dirs if it == path or it.startswith(prefix)}
+        self._listed = {
+            it for it in self._listed if it != path and not it.startswith(prefix)
+        }
+        if stale:
+            self.dirs.difference_update(stale)
+            _save_dir_index()
+
+    async def list_dirs(self, parent: str) -> Set[str]:
+        """Subdirectories of ``parent`` by one PROPFIND Depth 1"""
+        self.propfind_count += 1
+        url = self.file_url(parent)
+        if parent:
+            url += "/"
+        async with self.session().request(
+            "PROPFIND",
+            url,
+            data=_PROPFIND_BODY,
+            headers={"Depth": "1", "Content-Type": "application/xml"},
+        ) as resp:
+            if resp.status != 207:
+                return set()
+            body = await resp.read()
+
+        try:
+            root = ET.fromstring(body)
+        except ET.ParseError:
+            return set()
+        base_path = urllib.parse.unquote(urllib.parse.urlparse(self.url).path)
+        base_path = base_path.rstrip("/")
+        found = set()
+        for response in root.iter("{DAV:}response"):
+            if response.find(".//{DAV:}collection") is None:
+                continue
+            href = response.findtext("{DAV:}href", "")
+            path = urllib.parse.unquote(urllib.parse.urlparse(href).path)
+            if path.startswith(base_path):
+                rel_path = path[len(base_path) :].strip("/")
+                if rel_path:
+                    found.add(rel_path)
+        return found
+
+    async def _mkcol(self, path: str):
+        self.mkcol_count += 1
+        url = self.file_url(path)
+        async with self.session().request("MKCOL", url) as resp:
+            if resp.status == 201:
+                logger.info(f"[WebDAV] Created directory: {url}")
+                # a new directory has no subdirectories to look up
+                self._listed.add(path)
+            elif resp.status == 405:
+                # Already exists (Method Not Allowed for existing dir)
+                pass
+            elif resp.status == 423:
+                # Locked - wait and continue, another process is creating it
+                logger.warning(f"[WebDAV] Directory locked, waiting: {url}")
+                await asyncio.sleep(1)
+            else:
+                logger.warning(f"[WebDAV] MKCOL {url} returned {resp.status}")
+                return
+        self._add({path})
+
+    async def ensure_dir(self, path: str):
+        """Create ``path`` and its missing parents"""
+        await _load_dir_index()
+        path = path.strip("/")
+        if not path or path in self.dirs:
+            return
+        parts = path.split("/")
+        for i in range(len(parts)):
+            current = "/".join(parts[: i + 1])
+            if current in self.dirs:
+                continue
+            async with self._locks.setdefault(current, asyncio.Lock()):
+                if current in self.dirs:
+                    continue
+                parent = "/".join(parts[:i])
+                if parent not in self._listed:
+                    self._listed.add(parent)
+                    try:
+                        self._add(await self.list_dirs(parent))
+                    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                        logger.warning(f"[WebDAV] PROPFIND error: {e}")
+                    if current in self.dirs:
+                        continue
+                try:
+                    await self._mkcol(current)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    logger.warning(f"[WebDAV] MKCOL error: {e}")
+
+    async def upload_mode(self) -> str:
+        """How the server takes a file in segments, detected once.
+
+        ``UPLOAD_NEXTCLOUD`` for the ``remote.php/dav/files/<user>`` tree of
+        Nextcloud (chunking v2), ``UPLOAD_PARTIAL`` for servers announcing
+        sabre/dav partial updates in ``Accept-Patch``, ``UPLOAD_PUT`` if
+        the file can only be sent with one PUT.
+        """
+        if self._upload_mode is not None:
+            return self._upload_mode
+        self._upload_mode = UPLOAD_PUT
+        if _NEXTCLOUD_FILES.match(urllib.parse.urlparse(self.url).path):
+            self._upload_mode = UPLOAD_NEXTCLOUD
+        else:
+            try:
+                async with self.session().options(self.url + "/") as resp:
+                    if _PARTIAL_UPDATE in resp.headers.get("Accept-Patch", ""):
+                        self._upload_mode = UPLOAD_PARTIAL
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"[WebDAV] OPTIONS error: {e}")
+        logger.info(f"[WebDAV] {self.url} upload mode: {self._upload_mode}")
+        return self._upload_mode
+
+    async def _send(self, method: str, url: str, retries: int, **kwargs) -> bool:
+        for attempt in range(retries):
+            try:
+                async with self.session().request(method, url, **kwargs) as resp:
+                    if resp.status in (200, 201, 204):
+                        return True
+                    text = await resp.text()
+                    logger.warning(
+                        f"[WebDAV] {method} {url} returned {resp.status} - "
+                        f"{text[:200]}, retry {attempt + 1}/{retries}"
+                    )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(
+                    f"[WebDAV] {method} {url} error: {type(e).__name__}: {e}, "
+                    f"retry {attempt + 1}/{retries}"
+                )
+            if attempt < retries - 1:
+                await asyncio.sleep(self.retry_delay * (attempt + 1))
+        return False
+
+    # pylint: disable = R0913,R0914
+    async def upload_chunked(
+        self,
+        path: str,
+        stream: AsyncIterator[bytes],
+        total_size: int,
+        chunk_size: int,
+        progress: Callable[[int], Awaitable] = None,
+        retries: int = 3,
+        spool: int = 2,
+    ) -> bool:
+        """Upload ``stream`` to ``path`` in segments of ``chunk_size``.
+
+        The stream is read ahead into at most ``spool`` segments while the
+        current one is sent, so a segment that fails is sent again from
+        memory instead of the whole file being downloaded again. Needs an
+        ``upload_mode`` other than ``UPLOAD_PUT``. ``progress`` is awaited
+        with the bytes uploaded after every segment.
+        """
+        mode = await self.upload_mode()
+        if mode == UPLOAD_PUT:
+            raise ValueError(f"{self.url} does not take uploads in segments")
+        url = self.file_url(path)
+
+        headers: Dict[str, str] = {}
+        upload_dir = ""
+        if mode == UPLOAD_NEXTCLOUD:
+            parsed = urllib.parse.urlparse(self.url)
+            match = _NEXTCLOUD_FILES.match(parsed.path)
+            upload_dir = (
+                f"{parsed.scheme}://{parsed.netloc}{match['root']}/uploads/"
+                f"{match['user']}/tmd-{uuid.uuid4().hex}"
+            )
+            headers = {"Destination": url, "OC-Total-Length": str(total_size)}
+            if not await self._send("MKCOL", upload_dir, retries, headers=headers):
+                return False
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max(spool - 1, 1))
+
+        async def produce():
+            try:
+                buffer = bytearray()
+                async for chunk in stream:
+                    buffer += chunk
+                    while len(buffer) >= chunk_size:
+                        await queue.put(bytes(buffer[:chunk_size]))
+                        del buffer[:chunk_size]
+                if buffer:
+                    await queue.put(bytes(buffer))
+                await queue.put(None)
+            except Exception as e:
+                await queue.put(e)
+
+        producer = asyncio.ensure_future(produce())
+        success = False
+        try:
+            index = 0
+            offset = 0
+            while True:
+                segment = await queue.get()
+                if segment is None:
+                    break
+                if isinstance(segment, Exception):
+                    raise segment
+
+                if mode == UPLOAD_NEXTCLOUD:
+                    sent = await self._send(
+                        "PUT",
+                        f"{upload_dir}/{index + 1:05d}",
+                        retries,
+                        data=segment,
+                        headers=headers,
+                    )
+                elif index == 0:
+                    # the first segment creates the file
+                    sent = await self._send("PUT", url, retries, data=segment)
+                else:
+                    sent = await self._send(
+                        "PATCH",
+                        url,
+                        retries,
+                        data=segment,
+                        headers={
+                            "Content-Type": _PARTIAL_UPDATE,
+                            "X-Update-Range": (
+                                f"bytes={offset}-{offset + len(segment) - 1}"
+                            ),
+                        },
+                    )
+                if not sent:
+                    logger.error(
+                        f"[WebDAV] Segment {index + 1} of {path} failed "
+                        f"after {retries} retries"
+                    )
+                    return False
+                index += 1
+                offset += len(segment)
+                if progress:
+                    await progress(offset)
+
+            if mode == UPLOAD_NEXTCLOUD:
+                success = await self._send(
+                    "MOVE",
+                    f"{upload_dir}/.file",
+                    retries,
+                    headers=dict(headers, Overwrite="T"),
+                )
+            else:
+                success = True
+            return success
+        finally:
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+            if upload_dir and not success:
+                await self._send("DELETE", upload_dir, 1)
+
+    async def close(self):
+        """Close the pooled connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+async def close_clients():
+    """Close the sessions of every client"""
+    for client in list(_clients):
+        try:
+            await client.close()
+        except Exception as e:
+            logger.warning(f"Failed to close WebDAV session of {client.url}: {e}")
@@ -0,0 +1,52 @@
+"""test benchmark pipeline"""
+
+import sys
+import unittest
+
+from benchmark.pipeline import BenchConfig, compare_results, run_benchmark
+from module.db import db
+
+sys.path.append("..")  # Adds higher directory to python modules path.
+
+
+def _result(name, files_per_s, lag_p99):
+    return {
+        "config": {"name": name},
+        "metrics": {
+            "files_per_s": files_per_s,
+            "bytes_per_s": files_per_s * 10,
+            "cpu_seconds_per_gb": 1.0,
+            "db_writes_per_file": None,
+            "loop_lag": {"p99_ms": lag_p99},
+        },
+    }
+
+
+class BenchmarkPipelineTestCase(unittest.TestCase):
+    def test_run_benchmark(self):
+        run = run_benchmark(
+            BenchConfig(
+                name="test",
+                files=2,
+                file_size=1024 * 1024 + 1,
+                latency_ms=0,
+                max_download_task=2,
+            )
+        )
+        metrics = run["metrics"]
+        self.assertEqual(run["config"]["name"], "test")
+        self.assertEqual(metrics["succeeded"], 2)
+        self.assertEqual(metrics["bytes"], 2 * (1024 * 1024 + 1))
+        self.assertGreater(metrics["files_per_s"], 0)
+        self.assertIn("p99_ms", metrics["loop_lag"])
+        # counted on the DB stand-in, which is taken down again
+        self.assertGreater(metrics["db_writes_per_file"], 0)
+        self.assertIsNone(db.pool)
+
+    def test_compare_results(self):
+        baseline = {"runs": [_result("a", 10.0, 1.0), _result("b", 10.0, 1.0)]}
+        current = {"runs": [_result("a", 8.0, 1.0), _result("c", 1.0, 1.0)]}
+        rows = compare_results(baseline, current, threshold=0.1)
+        regressed = {metric for name, metric, *_, worse in rows if worse}
+        self.assertEqual({row[0] for row in rows}, {"a"})
+        self.assertEqual(regressed, {"files_per_s", "bytes_per_s"})
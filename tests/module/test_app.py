@@ -1,12 +1,19 @@
 """test app"""
 
+import asyncio
 import os
 import sys
 import unittest
 from unittest import mock
 
 import module.app
-from module.app import Application, ChatDownloadConfig, DownloadStatus
+from module.app import (
+    Application,
+    ChatDownloadConfig,
+    DownloadStatus,
+    LimitCall,
+    TaskNode,
+)
 
 sys.path.append("..")  # Adds higher directory to python modules path.
 
@@ -69,3 +76,93 @@ class AppTestCase(unittest.TestCase):
         app.config["chat"] = [{"chat_id": 123, "last_read_message_id": 0}]
         app.update_config()
         mock_open.assert_called_with("data_test.yaml", "w", encoding="utf-8")
+
+    def test_forward_limit_zero(self):
+        app = Application("", "")
+        app.assign_config({"forward_limit": 5})
+        self.assertEqual(app.forward_limit_call.max_limit_call_times, 5)
+        # 0 is no limit, not unset
+        app.assign_config({"forward_limit": 0})
+        self.assertEqual(app.forward_limit_call.max_limit_call_times, 0)
+
+    def test_limit_call(self):
+        limit_call = LimitCall(max_limit_call_times=3, period=60, limits={-200: 1})
+
+        # the limit goes at once, the next calls wait for the window to move
+        self.assertEqual(
+            [limit_call.reserve(-100, now=0) for _ in range(5)],
+            [0, 0, 0, 60, 60],
+        )
+        # no more than 3 calls in any 60 second window
+        self.assertEqual(limit_call.reserve(-100, now=30), 30)
+        self.assertEqual(limit_call.reserve(-100, now=60), 60)
+        # other destinations have their own budget
+        self.assertEqual(limit_call.reserve(-300, now=60), 0)
+        self.assertEqual(limit_call.reserve(-200, now=60), 0)
+        self.assertEqual(limit_call.reserve(-200, now=60), 60)
+        limit_call.release(-200, 120)
+        self.assertEqual(limit_call.reserve(-200, now=70), 50)
+        self.assertEqual(LimitCall().reserve(-100), 0)
+
+    def test_limit_call_release(self):
+        limit_call = LimitCall(max_limit_call_times=1, period=60)
+        self.assertEqual(
+            [limit_call.reserve(-100, now=0) for _ in range(3)], [0, 60, 120]
+        )
+        # the waiter in the middle gives up, the last one keeps its call
+        limit_call.release(-100, 60)
+        self.assertEqual(limit_call.reserve(-100, now=0), 180)
+        # nothing to give back
+        limit_call.release(-100, 60)
+        self.assertEqual(list(limit_call._calls[-100]), [0, 120, 180])
+
+    def test_limit_call_wait_cancel(self):
+        limit_call = LimitCall(max_limit_call_times=1, period=60)
+        node = TaskNode(chat_id=1, upload_telegram_chat_id=-100)
+
+        async def run():
+            await limit_call.wait(node)
+            waiters = [asyncio.ensure_future(limit_call.wait(node)) for _ in range(2)]
+            await asyncio.sleep(0)
+            _, first, second = limit_call._calls[-100]
+            self.assertLess(first, second)
+            waiters[0].cancel()
+            await asyncio.gather(waiters[0], return_exceptions=True)
+            # only the reservation of the cancelled waiter was given back
+            self.assertEqual(list(limit_call._calls[-100])[1:], [second])
+            waiters[1].cancel()
+            await asyncio.gather(waiters[1], return_exceptions=True)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(run())
+        finally:
+            loop.close()
+
+    def test_limit_call_wait(self):
+        limit_call = LimitCall(max_limit_call_times=2, period=0.2)
+        node = TaskNode(chat_id=1, upload_telegram_chat_id=-100)
+        loop = asyncio.new_event_loop()
+        try:
+            start = loop.time()
+            for _ in range(3):
+                loop.run_until_complete(limit_call.wait(node))
+            self.assertGreaterEqual(loop.time() - start, 0.09)
+        finally:
+            loop.close()
+
+    def test_limit_call_wait_stop(self):
+        limit_call = LimitCall(max_limit_call_times=1, period=60)
+        node = TaskNode(chat_id=1, upload_telegram_chat_id=-100)
+
+        async def run():
+            await limit_call.wait(node)
+            waiter = asyncio.ensure_future(limit_call.wait(node))
+            await asyncio.sleep(0)
+            self.assertEqual(len(limit_call._calls[-100]), 2)
+            node.stop_transmission()
+            await asyncio.wait_for(waiter, 1)
+            # the stopped waiter gave its reservation back
+            self.assertEqual(len(limit_call._calls[-100]), 1)
+
+        asyncio.run(run())
@@ -0,0 +1,36 @@
+"""test change feed"""
+
+import sys
+import unittest
+
+from module.change_feed import ChangeFeed
+
+sys.path.append("..")  # Adds higher directory to python modules path.
+
+
+class ChangeFeedTestCase(unittest.TestCase):
+    def test_changes_since(self):
+        feed = ChangeFeed()
+        start = feed.seq
+        feed.touch((1, 1))
+        feed.touch((1, 2))
+        seq = feed.touch((1, 1))
+
+        self.assertEqual(feed.changes_since(start), (seq, [(1, 2), (1, 1)]))
+        self.assertEqual(feed.changes_since(seq - 1), (seq, [(1, 1)]))
+        self.assertEqual(feed.changes_since(seq), (seq, []))
+
+    def test_reset_forces_snapshot(self):
+        feed = ChangeFeed()
+        seq = feed.touch((1, 1))
+        feed.reset()
+        self.assertIsNone(feed.changes_since(seq)[1])
+        self.assertEqual(feed.changes_since(feed.seq), (feed.seq, []))
+
+    def test_trimmed_history_forces_snapshot(self):
+        feed = ChangeFeed(max_keys=2)
+        feed.touch((1, 1))
+        feed.touch((1, 2))
+        feed.touch((1, 3))
+        self.assertIsNone(feed.changes_since(0)[1])
+        self.assertEqual(feed.changes_since(1), (3, [(1, 2), (1, 3)]))
@@ -0,0 +1,95 @@
+"""test adaptive concurrency"""
+
+import asyncio
+import sys
+import unittest
+
+from module.concurrency import AdaptiveConcurrency, ResizableSemaphore
+
+sys.path.append("..")  # Adds higher directory to python modules path.
+
+
+class _Client:
+    pass
+
+
+class ResizableSemaphoreTestCase(unittest.TestCase):
+    def test_resize(self):
+        async def run():
+            semaphore = ResizableSemaphore(1)
+            await semaphore.acquire()
+            waiter = asyncio.ensure_future(semaphore.acquire())
+            await asyncio.sleep(0)
+            self.assertFalse(waiter.done())
+
+            semaphore.resize(2)
+            await waiter
+            self.assertEqual(semaphore.in_use, 2)
+
+            # holders keep their slots, new ones wait for the smaller limit
+            semaphore.resize(1)
+            semaphore.release()
+            self.assertTrue(semaphore.locked())
+            semaphore.release()
+            async with semaphore:
+                self.assertEqual(semaphore.in_use, 1)
+            self.assertEqual(semaphore.in_use, 0)
+
+        asyncio.run(run())
+
+
+class AdaptiveConcurrencyTestCase(unittest.TestCase):
+    def test_aimd(self):
+        controller = AdaptiveConcurrency(
+            2, maximum=8, interval=1, transmissions_per_worker=2
+        )
+        client = _Client()
+        controller.attach(client)
+        self.assertIs(client.get_file_semaphore, controller.transmission_slots)
+        self.assertEqual(controller.transmission_slots.limit, 4)
+
+        now = 1000.0
+        transferred = 0
+
+        def sample(rate):
+            nonlocal now, transferred
+            now += 1
+            transferred += rate
+            return controller.update(transferred, now)
+
+        controller.update(transferred, now)
+        # throughput rises with every added download
+        self.assertEqual(sample(100), "increase")
+        self.assertEqual(sample(150), "increase")
+        self.assertEqual(controller.limit, 4)
+        self.assertEqual(controller.worker_slots.limit, 4)
+        self.assertEqual(controller.transmission_slots.limit, 8)
+
+        # saturated: the last increase is taken back
+        self.assertEqual(sample(150), "hold")
+        self.assertEqual(controller.limit, 3)
+        self.assertEqual(sample(150), "hold")
+        self.assertEqual(controller.limit, 3)
+
+        controller.backoff("FloodWait 30s")
+        self.assertEqual(sample(150), "decrease")
+        self.assertEqual(controller.limit, 1)
+        self.assertEqual(controller.reason, "FloodWait 30s")
+
+        self.assertEqual(sample(0), "idle")
+        status = controller.to_dict()
+        self.assertEqual(status["limit"], 1)
+        self.assertEqual(
+            [item["decision"] for item in status["history"]],
+            ["increase", "increase", "hold", "decrease", "idle"],
+        )
+
+    def test_bounds(self):
+        controller = AdaptiveConcurrency(10, minimum=2, maximum=3)
+        self.assertEqual(controller.limit, 3)
+        controller.update(0, 1.0)
+        self.assertEqual(controller.update(100, 2.0), "hold")
+        self.assertEqual(controller.reason, "at maximum")
+        controller.backoff("timeout")
+        controller.update(200, 3.0)
+        self.assertEqual(controller.limit, 2)
@@ -0,0 +1,353 @@
+"""test db"""
+
+import asyncio
+import json
+import sys
+import threading
+import unittest
+from collections import deque
+from types import SimpleNamespace
+
+import mock
+
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.pool import PoolError
+
+from module.db import DB, BlockingConnectionPool, WriteBehindQueue
+
+sys.path.append("..")  # Adds higher directory to python modules path.
+
+
+class WriteBehindQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.batches = []
+        self.fail = False
+
+        def execute_batch(ops):
+            if self.fail:
+                return False
+            self.batches.append([args for _, args in ops])
+            return True
+
+        self.queue = WriteBehindQueue(execute_batch, 10, 100)
+
+    def test_coalesce_and_order(self):
+        self.queue.put(("settings", "a"), (None, ("a", 1)))
+        self.queue.put(("settings", "b"), (None, ("b", 1)))
+        self.queue.put(("settings", "a"), (None, ("a", 2)))
+
+        self.assertEqual(self.queue.peek(("settings", "a")), (None, ("a", 2)))
+        self.assertTrue(self.queue.flush())
+        self.assertEqual(self.batches, [[("b", 1), ("a", 2)]])
+
+        stats = self.queue.stats()
+        self.assertEqual(stats["queue_depth"], 0)
+        self.assertEqual(stats["enqueued_total"], 3)
+        self.assertEqual(stats["coalesced_total"], 1)
+        self.assertEqual(stats["flushed_total"], 2)
+
+    def test_failed_flush_is_retried(self):
+        self.fail = True
+        self.queue.put(("settings", "a"), (None, ("a", 1)))
+        self.queue.put(("settings", "b"), (None, ("b", 1)))
+        self.assertFalse(self.queue.flush(0.1))
+        self.assertEqual(self.queue.stats()["queue_depth"], 2)
+
+        self.fail = False
+        self.queue.put(("settings", "a"), (None, ("a", 2)))
+        self.assertTrue(self.queue.flush())
+        self.assertEqual(self.batches, [[("b", 1), ("a", 2)]])
+
+    def test_drop(self):
+        self.queue.put(("download_history", "", 1, 2), (None, ("upsert",)))
+        self.queue.put(("settings", "a"), (None, ("a", 1)))
+        self.queue.drop(lambda key: key[0] == "download_history")
+        self.assertTrue(self.queue.flush())
+        self.assertEqual(self.batches, [[("a", 1)]])
+
+    def test_background_thread(self):
+        self.queue.start()
+        try:
+            self.queue.put(("settings", "a"), (None, ("a", 1)))
+            self.assertTrue(self.queue.flush())
+            self.assertEqual(self.batches, [[("a", 1)]])
+        finally:
+            self.queue.stop()
+
+
+class _FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, args=None):
+        if self.conn.fail:
+            raise self.conn.fail
+        self.conn.queries.append((" ".join(query.split()), args))
+
+    def fetchone(self):
+        return self.conn.results.popleft() if self.conn.results else None
+
+    def fetchall(self):
+        return self.conn.results.popleft() if self.conn.results else []
+
+
+class _FakeConn:
+    def __init__(self):
+        self.closed = 0
+        self.info = SimpleNamespace(transaction_status=TRANSACTION_STATUS_IDLE)
+        self.fail = None
+        self.queries = []
+        self.results: deque = deque()
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+class _FakePool(BlockingConnectionPool):
+    """Pool of fake connections, keeps every connection it made"""
+
+    def __init__(self, *args, **kwargs):
+        self.made = []
+        super().__init__(*args, **kwargs)
+
+    def _connect(self, key=None):
+        conn = _FakeConn()
+        self.made.append(conn)
+        if key is not None:
+            self._used[key] = conn
+            self._rused[id(conn)] = key
+        else:
+            self._pool.append(conn)
+        return conn
+
+
+class BlockingConnectionPoolTestCase(unittest.TestCase):
+    def test_wait_for_free_connection(self):
+        pool = _FakePool(1, 2, timeout=0.05, loop_reserve=0)
+        first, second = pool.getconn(), pool.getconn()
+        self.assertEqual(pool.in_use, 2)
+        with self.assertRaises(PoolError):
+            pool.getconn()
+
+        threading.Timer(0.01, pool.putconn, (first,)).start()
+        pool.timeout = 5
+        third = pool.getconn()
+        self.assertEqual(pool.in_use, 2)
+        pool.putconn(second)
+        pool.putconn(third)
+        self.assertEqual(pool.in_use, 0)
+
+    def test_event_loop_reserve(self):
+        pool = _FakePool(1, 2, timeout=0.05)
+        # worker threads only get the unreserved connection
+        worker = pool.getconn()
+        with self.assertRaises(PoolError):
+            pool.getconn()
+
+        async def on_loop():
+            conn = pool.getconn()
+            pool.putconn(conn)
+            return conn
+
+        loop = asyncio.new_event_loop()
+        try:
+            self.assertIsNot(loop.run_until_complete(on_loop()), worker)
+        finally:
+            loop.close()
+        pool.putconn(worker)
+        self.assertEqual(pool.in_use, 0)
+
+    def test_retire(self):
+        pool = _FakePool(2, 3)
+        borrowed = pool.getconn()
+        idle = [it for it in pool.made if it is not borrowed]
+        pool.retire()
+        # idle connections go at once, the borrowed one keeps working
+        self.assertTrue(all(it.closed for it in idle))
+        self.assertFalse(borrowed.closed)
+        self.assertFalse(pool.closed)
+
+        pool.putconn(borrowed)
+        self.assertTrue(borrowed.closed)
+        self.assertTrue(pool.closed)
+        self.assertEqual(pool.in_use, 0)
+
+
+def _fake_db() -> DB:
+    """DB on a pool of one fake connection, with a write-behind queue that
+    is flushed by hand"""
+    db = DB.__new__(DB)
+    db.pool = _FakePool(1, 1, loop_reserve=0)
+    db.pool_max = 1
+    db.query_stats = {}
+    db._stats_lock = threading.Lock()
+    db._executor = None
+    db.write_behind = WriteBehindQueue(db._execute_ops, 10, 100)
+    return db
+
+
+class DBCursorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.db = _fake_db()
+
+    def tearDown(self):
+        if self.db._executor:
+            self.db._executor.shutdown()
+
+    def test_commit(self):
+        with self.db._cursor("select") as cur:
+            cur.execute("SELECT 1")
+        conn = self.db.pool.made[-1]
+        self.assertEqual(conn.queries, [("SELECT 1", None)])
+        self.assertEqual((conn.commits, conn.rollbacks), (1, 0))
+        self.assertEqual(self.db.get_query_stats()["select"]["count"], 1)
+        self.assertEqual(self.db.pool.in_use, 0)
+        # the healthy connection went back to the pool
+        self.assertFalse(conn.closed)
+
+    def test_rollback(self):
+        conn = self.db.pool.made[-1]
+        conn.fail = psycopg2.OperationalError("server closed the connection")
+        with self.assertRaises(psycopg2.OperationalError):
+            with self.db._cursor("select") as cur:
+                cur.execute("SELECT 1")
+        self.assertEqual((conn.commits, conn.rollbacks), (0, 1))
+        # a broken connection is not reused
+        self.assertTrue(conn.closed)
+        self.assertEqual(self.db.pool.in_use, 0)
+
+        self.db.pool = None
+        with self.assertRaises(psycopg2.InterfaceError):
+            with self.db._cursor("select"):
+                pass
+
+    def test_run_async(self):
+        def blocking(value):
+            return value, threading.current_thread().name
+
+        loop = asyncio.new_event_loop()
+        try:
+            value, thread = loop.run_until_complete(self.db.run_async(blocking, 1))
+        finally:
+            loop.close()
+        self.assertEqual(value, 1)
+        self.assertTrue(thread.startswith("db"))
+
+
+class DownloadHistoryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.db = _fake_db()
+        self.conn = self.db.pool.made[0]
+
+    def _statements(self) -> list:
+        self.assertTrue(self.db.flush())
+        queries = [(query.split()[0], args) for query, args in self.conn.queries]
+        self.conn.queries.clear()
+        return queries
+
+    def test_save_and_delete(self):
+        self.db.save_download_history(1, 2, {"end_time": 5.0}, "a")
+        self.db.save_download_history("1", "2", {"end_time": 6.0}, "b")
+        self.db.save_download_history(1, 3, {"end_time": 7.0, "profile_id": "a"})
+        # only the row of profile "a" is deleted, its queued upsert is dropped
+        self.db.delete_download_history(1, 2, "a")
+        self.assertEqual(
+            self._statements(),
+            [
+                ("INSERT", ("b", 1, 2, 6.0, '{"end_time": 6.0}')),
+                (
+                    "INSERT",
+                    ("a", 1, 3, 7.0, '{"end_time": 7.0, "profile_id": "a"}'),
+                ),
+                ("DELETE", ("a", 1, 2)),
+            ],
+        )
+
+        # without a profile every profile's row goes
+        self.db.save_download_history(1, 2, {"end_time": 8.0}, "a")
+        self.db.save_download_history(1, 2, {"end_time": 8.0}, "b")
+        self.db.delete_download_history(1, 2)
+        self.assertEqual(self._statements(), [("DELETE", (1, 2))])
+
+    def test_clear(self):
+        self.db.save_download_history(1, 2, {}, "a")
+        self.db.clear_download_history()
+        self.assertEqual(self._statements(), [("DELETE", None)])
+
+    def test_load(self):
+        self.conn.results.append(
+            [("", 1, 2, {"end_time": 1.0}), ("a", 1, 3, {"end_time": 2.0})]
+        )
+        self.db.save_download_history(1, 4, {}, "a")
+        self.assertEqual(
+            self.db.load_download_history(),
+            [(None, 1, 2, {"end_time": 1.0}), ("a", 1, 3, {"end_time": 2.0})],
+        )
+        # queued writes are stored before reading
+        self.assertEqual(
+            [query.split()[0] for query, _ in self.conn.queries], ["INSERT", "SELECT"]
+        )
+
+    def test_migrate_legacy_history(self):
+        legacy = {
+            "1": {
+                "2": {"down_byte": 10, "total_size": 10, "end_time": 3.0},
+                # unfinished downloads are not history
+                "3": {"down_byte": 1, "total_size": 10},
+            }
+        }
+        self.conn.results.append((legacy,))
+        with mock.patch("module.db.execute_values") as execute_values:
+            with self.db._cursor("init_db") as cur:
+                self.db._migrate_download_history(cur)
+        rows = execute_values.call_args[0][2]
+        self.assertEqual(
+            rows, [("", 1, 2, 3.0, json.dumps(legacy["1"]["2"]))]
+        )
+        self.assertEqual(
+            self.conn.queries[-1],
+            ("DELETE FROM settings WHERE key = %s", ("download_history",)),
+        )
+
+        # nothing left to migrate
+        self.conn.queries.clear()
+        with mock.patch("module.db.execute_values") as execute_values:
+            with self.db._cursor("init_db") as cur:
+                self.db._migrate_download_history(cur)
+        execute_values.assert_not_called()
+        self.assertEqual(len(self.conn.queries), 1)
+
+    def test_remove_download_task_keeps_other_profiles(self):
+        from module import download_stat
+
+        download_stat._download_result[-7] = {
+            1: {"profile_id": "a"},
+            2: {"profile_id": None},
+        }
+        with mock.patch.object(download_stat, "db") as db:
+            self.assertFalse(download_stat.remove_download_task(-7, 1, "b"))
+            self.assertTrue(download_stat.remove_download_task(-7, 1, "a"))
+            self.assertTrue(download_stat.remove_download_task(-7, 2, "a"))
+        self.assertEqual(
+            db.delete_download_history.call_args_list,
+            [mock.call(-7, 1, "a"), mock.call(-7, 2, "")],
+        )
+        self.assertNotIn(-7, download_stat._download_result)
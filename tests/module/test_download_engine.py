@@ -0,0 +1,139 @@
+"""test resumable download"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import pyrogram
+
+from module import download_engine
+from module.download_engine import (
+    _missing_runs,
+    download_media_parallel,
+    download_media_resumable,
+    get_resume_offset,
+)
+
+sys.path.append("..")  # Adds higher directory to python modules path.
+
+DATA = b"0123456789abcdefghij"
+
+
+class FakeMedia:
+    file_unique_id = "unique"
+    file_size = len(DATA)
+
+
+class FakeMessage:
+    id = 1
+
+
+class FakeClient:
+    def __init__(self):
+        self.offsets = []
+
+    async def stream_media(self, message, limit=0, offset=0):
+        self.offsets.append(offset)
+        size = download_engine.CHUNK_SIZE
+        end = (offset + limit) * size if limit else len(DATA)
+        for pos in range(offset * size, min(end, len(DATA)), size):
+            await asyncio.sleep(0)
+            yield DATA[pos : pos + size]
+
+
+@mock.patch.object(download_engine, "CHUNK_SIZE", 4)
+class ResumableDownloadTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.temp_file_name = os.path.join(self.tmp_dir.name, "a", "video.mp4")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_resume_after_stop(self):
+        client = FakeClient()
+
+        async def stop_after_two_chunks(down_byte, total_size):
+            if down_byte >= 8:
+                raise pyrogram.StopTransmission()
+
+        path = asyncio.run(
+            download_media_resumable(
+                client,
+                FakeMessage(),
+                FakeMedia(),
+                self.temp_file_name,
+                progress=stop_after_two_chunks,
+            )
+        )
+        self.assertIsNone(path)
+        self.assertEqual(
+            get_resume_offset(self.temp_file_name, "unique", len(DATA)), 8
+        )
+        # a different file does not reuse the partial data
+        self.assertEqual(get_resume_offset(self.temp_file_name, "other", len(DATA)), 0)
+
+        path = asyncio.run(
+            download_media_resumable(
+                client, FakeMessage(), FakeMedia(), self.temp_file_name
+            )
+        )
+        self.assertEqual(path, self.temp_file_name)
+        self.assertEqual(client.offsets, [0, 2])
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), DATA)
+        self.assertFalse(
+            os.path.exists(self.temp_file_name + download_engine.MANIFEST_SUFFIX)
+        )
+        self.assertFalse(
+            os.path.exists(self.temp_file_name + download_engine.PART_SUFFIX)
+        )
+
+    def test_parallel(self):
+        client = FakeClient()
+        calls = []
+
+        async def stop_at_second_report(down_byte, total_size):
+            calls.append(down_byte)
+            if len(calls) == 2:
+                raise pyrogram.StopTransmission()
+
+        path = asyncio.run(
+            download_media_parallel(
+                client,
+                FakeMessage(),
+                FakeMedia(),
+                self.temp_file_name,
+                part_size=4,
+                parallelism=2,
+                progress=stop_at_second_report,
+            )
+        )
+        self.assertIsNone(path)
+        self.assertEqual(sorted(client.offsets), [0, 2])
+
+        client.offsets = []
+        path = asyncio.run(
+            download_media_parallel(
+                client,
+                FakeMessage(),
+                FakeMedia(),
+                self.temp_file_name,
+                part_size=4,
+                parallelism=2,
+            )
+        )
+        self.assertEqual(path, self.temp_file_name)
+        # the parts finished before the stop are not fetched again
+        self.assertEqual(sorted(client.offsets), [3, 4])
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), DATA)
+
+    def test_missing_runs(self):
+        self.assertEqual(_missing_runs(5, set(), 2), [(0, 2), (2, 5)])
+        self.assertEqual(_missing_runs(5, {1, 2}, 1), [(0, 1), (3, 5)])
+        self.assertEqual(_missing_runs(2, set(), 4), [(0, 1), (1, 2)])
+        self.assertEqual(_missing_runs(3, {0, 1, 2}, 2), [])
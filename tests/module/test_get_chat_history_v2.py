@@ -0,0 +1,96 @@
+"""test get_chat_history_v2 read-ahead"""
+
+import asyncio
+import sys
+import unittest
+
+import mock
+import pyrogram
+
+from module.get_chat_history_v2 import get_chat_history_v2
+
+sys.path.append("..")  # Adds higher directory to python modules path.
+
+
+class _Message:
+    def __init__(self, message_id: int):
+        self.id = message_id
+
+
+class _History:
+    """Fake get_chunk_v2 over messages 1..count, oldest first"""
+
+    def __init__(self, count: int, flood_wait_at: int = None, floods: int = 1):
+        self.count = count
+        self.flood_wait_at = flood_wait_at
+        self.floods = floods
+        self.requests = []
+
+    async def get_chunk(self, *, limit, from_message_id, **_):
+        self.requests.append(from_message_id)
+        await asyncio.sleep(0)
+        if from_message_id == self.flood_wait_at and self.floods:
+            self.floods -= 1
+            raise pyrogram.errors.FloodWait(value=0)
+        first = max(from_message_id, 1)
+        last = min(first + limit, self.count + 1)
+        return [_Message(i) for i in range(first, last)]
+
+    async def get_chat_history(self, chat_id):
+        for _ in ():
+            yield _
+
+
+class GetChatHistoryTestCase(unittest.TestCase):
+    def _read(self, history, read_ahead, limit=0, stop_after=None, on_message=None):
+        async def run():
+            result = []
+            with mock.patch(
+                "module.get_chat_history_v2.get_chunk_v2", new=history.get_chunk
+            ):
+                messages = get_chat_history_v2(
+                    history, -100, limit=limit, reverse=True, read_ahead=read_ahead
+                )
+                async for message in messages:
+                    result.append(message.id)
+                    if on_message:
+                        await on_message()
+                    if stop_after and len(result) >= stop_after:
+                        break
+                await messages.aclose()
+            return result
+
+        return asyncio.run(run())
+
+    def test_same_messages_as_sequential(self):
+        for read_ahead in (0, 1, 3):
+            history = _History(450)
+            self.assertEqual(self._read(history, read_ahead), list(range(1, 451)))
+            self.assertEqual(self._read(_History(450), read_ahead, limit=150)[-1], 150)
+
+    def test_reads_ahead_within_depth(self):
+        history = _History(2000)
+        seen = []
+
+        async def on_message():
+            # let the producer run while the consumer "filters"
+            await asyncio.sleep(0)
+            seen.append(len(history.requests))
+
+        self._read(history, 2, stop_after=100, on_message=on_message)
+        # chunk 1 is consumed, chunk 2 and 3 wait in the buffer and chunk 4
+        # is blocked on the full buffer
+        self.assertEqual(max(seen), 4)
+
+    def test_flood_wait_is_retried(self):
+        history = _History(250, flood_wait_at=101)
+        self.assertEqual(self._read(history, 2), list(range(1, 251)))
+        self.assertEqual(history.requests.count(101), 2)
+
+    def test_flood_wait_gives_up(self):
+        for read_ahead in (0, 2):
+            history = _History(250, flood_wait_at=101, floods=100)
+            with self.assertRaises(pyrogram.errors.FloodWait):
+                self._read(history, read_ahead)
+            # the first try and three retries
+            self.assertEqual(history.requests.count(101), 4)
@@ -0,0 +1,60 @@
+"""test history index"""
+
+import sys
+import unittest
+
+from module.history_index import HistoryIndex
+
+sys.path.append("..")  # Adds higher directory to python modules path.
+
+
+class HistoryIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.index = HistoryIndex()
+        self.index.add(1, 1, 10.0, "/data/b.mp4", "p1")
+        self.index.add(1, 2, 30.0, "/data/a.jpg", "p2")
+        self.index.add(2, 1, 20.0, "C:\\data\\Ab.zip", "p1")
+
+    def test_sort_by_time(self):
+        self.assertEqual(self.index.query(), (3, [(1, 2), (2, 1), (1, 1)]))
+        self.assertEqual(
+            self.index.query(offset=1, limit=1, descending=False), (3, [(2, 1)])
+        )
+
+    def test_sort_by_name(self):
+        self.assertEqual(
+            self.index.query(sort="filename", descending=False),
+            (3, [(1, 2), (2, 1), (1, 1)]),
+        )
+
+    def test_filters(self):
+        self.assertEqual(self.index.query(chat_id=1), (2, [(1, 2), (1, 1)]))
+        self.assertEqual(self.index.query(profile_id="p1"), (2, [(2, 1), (1, 1)]))
+        self.assertEqual(self.index.query(prefix="A"), (2, [(1, 2), (2, 1)]))
+        self.assertEqual(
+            self.index.query(prefix="a", chat_id=2, profile_id="p1"), (1, [(2, 1)])
+        )
+
+    def test_update_and_discard(self):
+        self.index.add(1, 1, 40.0, "/data/b.mp4", "p1")
+        self.assertEqual(self.index.query(limit=1), (3, [(1, 1)]))
+
+        self.index.discard(1, 1)
+        self.assertNotIn((1, 1), self.index)
+        self.assertEqual(self.index.query(chat_id=1), (1, [(1, 2)]))
+        self.assertEqual(self.index.query(profile_id="p1"), (1, [(2, 1)]))
+
+        self.index.clear()
+        self.assertEqual(self.index.query(), (0, []))
+
+    def test_invalid_sort(self):
+        self.assertRaises(ValueError, self.index.query, sort="size")
+
+    def test_rebuild(self):
+        self.index.rebuild(
+            [(3, 1, 5.0, "z.txt", None), (3, 2, 1.0, "y.txt", None)]
+        )
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(self.index.query(), (2, [(3, 1), (3, 2)]))
+        self.assertEqual(self.index.query(profile_id="p1"), (0, []))
+        self.assertEqual(self.index.query(prefix="y"), (1, [(3, 2)]))
@@ -0,0 +1,142 @@
+"""test message fetcher"""
+
+import asyncio
+import sys
+import unittest
+
+from module.message_fetcher import MAX_BATCH, MessageFetcher
+from tests.test_common import Chat
+
+sys.path.append("..")  # Adds higher directory to python modules path.
+
+
+class _Message:
+    def __init__(self, chat_id: int, message_id: int, version: int = 0):
+        self.chat = Chat(chat_id, "test")
+        self.id = message_id
+        self.empty = False
+        self.version = version
+
+
+class _Client:
+    def __init__(self):
+        self.calls = []
+
+    async def get_messages(self, chat_id, message_ids):
+        self.calls.append((chat_id, list(message_ids)))
+        await asyncio.sleep(0)
+        return [_Message(chat_id, message_id, 1) for message_id in message_ids]
+
+
+class MessageFetcherTestCase(unittest.TestCase):
+    def test_fresh_message_is_not_refetched(self):
+        fetcher = MessageFetcher(max_age=60, batch_delay=0)
+        client = _Client()
+        message = _Message(-100, 1)
+
+        async def run():
+            fetcher.remember(message)
+            self.assertIs(await fetcher.get(client, message), message)
+            self.assertEqual(client.calls, [])
+
+            # a BadRequest forces a refetch, the result is remembered
+            refetched = await fetcher.get(client, message, force=True)
+            self.assertEqual(refetched.version, 1)
+            self.assertIs(await fetcher.get(client, message), refetched)
+            self.assertEqual(client.calls, [(-100, [1])])
+
+            # too old
+            self.assertEqual((await fetcher.get(client, message, max_age=0)).version, 1)
+            self.assertEqual(len(client.calls), 2)
+
+        asyncio.run(run())
+
+    def test_refetches_are_batched(self):
+        fetcher = MessageFetcher(batch_delay=0.01)
+        client = _Client()
+
+        async def run():
+            messages = [_Message(-100, i) for i in range(MAX_BATCH + 10)]
+            messages += [_Message(-200, 1), _Message(-100, 0)]
+            results = await asyncio.gather(
+                *(fetcher.get(client, message) for message in messages)
+            )
+            self.assertEqual([result.id for result in results], [m.id for m in messages])
+            self.assertTrue(all(result.version == 1 for result in results))
+            self.assertEqual(
+                sorted((chat_id, len(ids)) for chat_id, ids in client.calls),
+                sorted([(-200, 1), (-100, 10), (-100, MAX_BATCH)]),
+            )
+
+        asyncio.run(run())
+
+    def test_lru_bound_and_errors(self):
+        fetcher = MessageFetcher(max_size=2, batch_delay=0)
+
+        for i in range(3):
+            fetcher.remember(_Message(-100, i))
+        self.assertEqual(len(fetcher), 2)
+        self.assertIsNone(fetcher.fresh(-100, 0))
+        self.assertIsNotNone(fetcher.fresh(-100, 2))
+
+        class _FailingClient:
+            async def get_messages(self, chat_id, message_ids):
+                raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(fetcher.get(_FailingClient(), _Message(-100, 5)))
+
+    def test_fetch_many(self):
+        fetcher = MessageFetcher()
+
+        class _PartialClient(_Client):
+            async def get_messages(self, chat_id, message_ids):
+                messages = await super().get_messages(chat_id, message_ids)
+                # odd ids were deleted
+                for message in messages:
+                    message.empty = bool(message.id % 2)
+                return messages
+
+        client = _PartialClient()
+        received = []
+
+        async def on_messages(chat_id, ids, messages):
+            received.append((chat_id, ids, messages))
+
+        ids_by_chat = {-100: list(range(MAX_BATCH * 2 + 1)), -200: [4, 4, 6]}
+        asyncio.run(fetcher.fetch_many(client, ids_by_chat, on_messages, concurrency=2))
+
+        self.assertEqual(len(client.calls), 4)
+        self.assertEqual(
+            sorted(len(ids) for _, ids, _ in received), [1, 2, MAX_BATCH, MAX_BATCH]
+        )
+        for chat_id, ids, messages in received:
+            for message_id, message in zip(ids, messages):
+                if message_id % 2:
+                    self.assertIsNone(message)
+                else:
+                    self.assertEqual((message.chat.id, message.id), (chat_id, message_id))
+        # fetched messages are fresh for download_media
+        self.assertIsNotNone(fetcher.fresh(-200, 6))
+
+    def test_get_by_id(self):
+        fetcher = MessageFetcher(batch_delay=0)
+
+        class _DeletingClient(_Client):
+            async def get_messages(self, chat_id, message_ids):
+                messages = await super().get_messages(chat_id, message_ids)
+                for message in messages:
+                    message.empty = message.id == 2
+                return messages
+
+        client = _DeletingClient()
+        message = _Message(-100, 1)
+        fetcher.remember(message)
+
+        async def run():
+            self.assertIs(await fetcher.get_by_id(client, -100, 1), message)
+            self.assertEqual((await fetcher.get_by_id(client, -100, 3)).version, 1)
+            # deleted messages are not handed to the worker
+            self.assertIsNone(await fetcher.get_by_id(client, -100, 2))
+
+        asyncio.run(run())
@@ -0,0 +1,66 @@
+"""test progress registry"""
+
+import sys
+import unittest
+
+from module.progress import ProgressRegistry, RateWindow
+
+sys.path.append("..")  # Adds higher directory to python modules path.
+
+
+class RateWindowTestCase(unittest.TestCase):
+    def test_rate(self):
+        window = RateWindow(5)
+        window.reset(100.0)
+        window.add(100, 101.0)
+        window.add(300, 104.5)
+        self.assertEqual(window.rate(105.0), 80)
+        # samples older than the window are ignored
+        self.assertEqual(window.rate(107.0), 60)
+        self.assertEqual(window.rate(200.0), 0)
+
+
+class ProgressRegistryTestCase(unittest.TestCase):
+    def test_update_publish_and_finish(self):
+        registry = ProgressRegistry(publish_interval=1.0)
+        slot = registry.update(1, 2, 0, 100, "a.mp4", 10.0, 3, "p", now=10.0)
+        self.assertIsNotNone(slot)
+        self.assertIsNone(registry.update(1, 2, 50, 100, now=10.5))
+        self.assertIsNotNone(registry.update(1, 2, 60, 100, now=11.0))
+        self.assertIsNotNone(registry.update(1, 2, 100, 100, now=11.2))
+
+        snapshot = registry.snapshot(1, now=11.5)
+        self.assertEqual(len(snapshot), 1)
+        self.assertEqual(snapshot[0]["down_byte"], 100)
+        self.assertEqual(snapshot[0]["task_id"], 3)
+        self.assertEqual(snapshot[0]["download_speed"], 66)
+        self.assertEqual(registry.snapshot(2, now=11.5), [])
+
+        # idle transfers are reclaimed
+        self.assertEqual(registry.snapshot(now=1000.0), [])
+        self.assertEqual(len(registry), 0)
+        registry.update(1, 2, 0, 100, now=1000.0)
+
+        registry.finish(1, 2)
+        self.assertEqual(len(registry), 0)
+        self.assertIsNone(registry.get(1, 2))
+
+        # the released slot is reused for the next transfer
+        reused = registry.update(1, 3, 0, 10, now=12.0)
+        self.assertIs(reused, slot)
+        self.assertEqual(reused.message_id, 3)
+
+    def test_transferred_per_profile(self):
+        registry = ProgressRegistry()
+        registry.update(1, 1, 0, 100, profile_id="a", now=10.0)
+        registry.update(1, 1, 60, 100, profile_id="a", now=10.5)
+        registry.update(1, 1, 100, 100, profile_id="a", now=11.0)
+        registry.update(2, 1, 0, 50, profile_id="b", now=10.0)
+        registry.update(2, 1, 50, 50, profile_id="b", now=10.5)
+        self.assertEqual(registry.transferred("a"), 100)
+        self.assertEqual(registry.transferred("b"), 50)
+        self.assertEqual(registry.transferred(), 0)
+        # bytes of streamed uploads have no slot but count as well
+        registry.count("a", 25, now=11.5)
+        self.assertEqual(registry.transferred("a"), 125)
+        self.assertEqual(len(registry), 2)
@@ -0,0 +1,112 @@
+"""test rate limiter"""
+
+import asyncio
+import sys
+import time
+import unittest
+
+import pyrogram
+
+from module.rate_limiter import (
+    DOWNLOAD,
+    MESSAGES,
+    OTHER,
+    SEND,
+    RateLimiter,
+    TokenBucket,
+    method_class,
+)
+
+sys.path.append("..")  # Adds higher directory to python modules path.
+
+
+class _Client:
+    def __init__(self, flood_waits: int = 0):
+        self.flood_waits = flood_waits
+        self.calls = []
+
+    async def get_messages(self, chat_id, message_ids):
+        self.calls.append(time.monotonic())
+        if self.flood_waits:
+            self.flood_waits -= 1
+            raise pyrogram.errors.FloodWait(value=0)
+        return message_ids
+
+
+class RateLimiterTestCase(unittest.TestCase):
+    def test_method_class(self):
+        client = _Client()
+        self.assertEqual(method_class(client.get_messages), MESSAGES)
+        self.assertEqual(method_class(pyrogram.Client.send_message), SEND)
+        self.assertEqual(method_class(pyrogram.Client.download_media), DOWNLOAD)
+        self.assertEqual(method_class(len), OTHER)
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=2, burst=2)
+        now = bucket.updated
+        self.assertEqual(bucket.take(now), 0)
+        self.assertEqual(bucket.take(now), 0)
+        self.assertAlmostEqual(bucket.take(now), 0.5)
+        self.assertEqual(bucket.take(now + 0.5), 0)
+        self.assertEqual(TokenBucket(rate=0).take(now), 0)
+
+    def test_configure_per_client(self):
+        limiter = RateLimiter()
+        first, second = _Client(), _Client()
+        bucket = limiter.bucket(first, MESSAGES)
+        limiter.configure({MESSAGES: 1}, client=first)
+        self.assertEqual(bucket.rate, 1)
+        self.assertEqual(limiter.bucket(second, MESSAGES).rate, 5)
+        # the global rates leave the own rates of a client alone
+        limiter.configure({MESSAGES: 3, SEND: 7})
+        self.assertEqual(bucket.rate, 1)
+        self.assertEqual(limiter.bucket(first, SEND).rate, 7)
+        self.assertEqual(limiter.bucket(second, MESSAGES).rate, 3)
+
+    def test_flood_wait_pauses_every_caller(self):
+        limiter = RateLimiter({MESSAGES: 0})
+        client = _Client(flood_waits=1)
+        other_client = _Client()
+
+        async def run():
+            # a FloodWait of one call is retried once it is over
+            self.assertEqual(
+                await limiter.call(client, MESSAGES, client.get_messages, 1, [1]), [1]
+            )
+            self.assertEqual(len(client.calls), 2)
+
+            # and holds back every other caller of the class meanwhile
+            limiter.flood_wait(client, MESSAGES, 0.05)
+            started = time.monotonic()
+            await asyncio.gather(
+                limiter.call(client, MESSAGES, client.get_messages, 1, [2]),
+                limiter.call(client, MESSAGES, client.get_messages, 1, [3]),
+            )
+            self.assertGreaterEqual(min(client.calls[2:]) - started, 0.04)
+            # other clients are not paused
+            started = time.monotonic()
+            limiter.flood_wait(client, MESSAGES, 10)
+            await limiter.call(
+                other_client, MESSAGES, other_client.get_messages, 1, [4]
+            )
+            self.assertLess(time.monotonic() - started, 1)
+
+        asyncio.run(run())
+        stats = limiter.stats()[MESSAGES]
+        self.assertEqual(stats["flood_waits"], 3)
+        self.assertEqual(stats["flood_wait_seconds"], 10.05)
+        self.assertEqual(stats["waits_avoided"], 2)
+        self.assertEqual(stats["calls"], 5)
+        self.assertGreater(stats["paused_seconds"], 0)
+        self.assertGreater(stats["paused_for"], 5)
+
+    def test_flood_wait_gives_up(self):
+        limiter = RateLimiter({MESSAGES: 0})
+        client = _Client(flood_waits=5)
+        with self.assertRaises(pyrogram.errors.FloodWait):
+            asyncio.run(
+                limiter.call(
+                    client, MESSAGES, client.get_messages, 1, [1], flood_retries=1
+                )
+            )
+        self.assertEqual(len(client.calls), 2)
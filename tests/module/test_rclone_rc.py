@@ -0,0 +1,147 @@
+"""test rclone rc client"""
+
+import asyncio
+import json
+import os
+import stat
+import sys
+import tempfile
+import unittest
+
+from aiohttp import web
+
+from module.rclone_rc import RcloneDaemon, RcloneRcError, format_stats
+
+sys.path.append("..")  # Adds higher directory to python modules path.
+
+
+class _FakeRcd:
+    """rc api answering like ``rclone rcd`` with jobs that finish after
+    two polls"""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls = []
+        self.polls = {}
+        self.groups = set()
+        self.runner = None
+
+    async def handle(self, request: web.Request):
+        method = request.match_info["method"]
+        params = await request.json()
+        self.calls.append((method, params))
+        if method == "rc/noop":
+            return web.json_response(params)
+        if method == "operations/copyfile":
+            job_id = len(self.polls) + 1
+            self.polls[job_id] = 0
+            self.groups.add(params["_group"])
+            return web.json_response({"jobid": job_id})
+        if method == "job/status":
+            self.polls[params["jobid"]] += 1
+            finished = self.polls[params["jobid"]] >= 2
+            return web.json_response(
+                {
+                    "finished": finished,
+                    "success": finished and not self.fail,
+                    "error": "quota exceeded" if finished and self.fail else "",
+                }
+            )
+        if method == "core/stats":
+            done = 50 * self.polls[len(self.polls)]
+            return web.json_response(
+                {"bytes": done, "totalBytes": 100, "speed": 2048, "eta": 1}
+            )
+        if method == "core/stats-delete":
+            self.groups.discard(params["group"])
+            return web.json_response({})
+        return web.json_response({"error": "unknown method"}, status=404)
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post("/{method:.+}", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"127.0.0.1:{port}"
+
+
+class RcloneDaemonTestCase(unittest.TestCase):
+    def test_format_stats(self):
+        self.assertEqual(
+            format_stats({"bytes": 512, "totalBytes": 2048, "speed": 1024}),
+            ("512B", "2.0KB", "25", "1.0KB/s", "-"),
+        )
+
+    def _copy(self, fail: bool = False):
+        async def run():
+            rcd = _FakeRcd(fail)
+            addr = await rcd.start()
+            # the fake already answers, so the binary is never started
+            daemon = RcloneDaemon("/nonexistent/rclone", addr, poll_interval=0)
+            reports = []
+
+            async def progress(stats):
+                reports.append(format_stats(stats)[2])
+
+            try:
+                ok = await daemon.copy_file(
+                    "/data/chat/a.jpg", "drive:backup", "chat/a.jpg", progress
+                )
+            finally:
+                await daemon.close()
+                await rcd.runner.cleanup()
+            return ok, rcd, reports
+
+        return asyncio.run(run())
+
+    def test_copy_file(self):
+        ok, rcd, reports = self._copy()
+        self.assertTrue(ok)
+        self.assertEqual(reports, ["50", "100"])
+        method, params = rcd.calls[1]
+        self.assertEqual(method, "operations/copyfile")
+        self.assertEqual(params["srcFs"], "/data/chat")
+        self.assertEqual(params["srcRemote"], "a.jpg")
+        self.assertEqual(params["dstFs"], "drive:backup")
+        self.assertEqual(params["dstRemote"], "chat/a.jpg")
+        self.assertTrue(params["_async"])
+        # the stats group of the job is dropped once it finished
+        self.assertEqual(rcd.groups, set())
+
+    def test_copy_file_failed(self):
+        ok, rcd, _ = self._copy(fail=True)
+        self.assertFalse(ok)
+        self.assertEqual(rcd.calls[-1][0], "core/stats-delete")
+
+    def test_spawn_credentials(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            seen = os.path.join(tmp, "seen.json")
+            rclone = os.path.join(tmp, "rclone")
+            with open(rclone, "w", encoding="utf-8") as f:
+                f.write(
+                    f"#!{sys.executable}\n"
+                    "import json, os, sys\n"
+                    f"with open({seen!r}, 'w') as f:\n"
+                    "    json.dump([sys.argv[1:], os.environ.get('RCLONE_RC_USER'),"
+                    " os.environ.get('RCLONE_RC_PASS')], f)\n"
+                    "sys.exit(1)\n"
+                )
+            os.chmod(rclone, os.stat(rclone).st_mode | stat.S_IEXEC)
+            daemon = RcloneDaemon(rclone, "127.0.0.1:9", "tdl", "s3cret", 5)
+
+            async def run():
+                try:
+                    await daemon.start()
+                finally:
+                    await daemon.close()
+
+            with self.assertRaises(RcloneRcError):
+                asyncio.run(run())
+            with open(seen, encoding="utf-8") as f:
+                args, user, password = json.load(f)
+        # nothing secret on the command line
+        self.assertEqual(args, ["rcd", "--rc-addr=127.0.0.1:9"])
+        self.assertEqual((user, password), ("tdl", "s3cret"))
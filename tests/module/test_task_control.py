@@ -0,0 +1,66 @@
+"""test task control"""
+
+import asyncio
+import sys
+import threading
+import unittest
+
+from module.task_control import TaskControl
+
+sys.path.append("..")  # Adds higher directory to python modules path.
+
+
+class TaskControlTestCase(unittest.TestCase):
+    def test_wait_and_notify(self):
+        control = TaskControl()
+        state = {"paused": True}
+
+        async def run():
+            waiter = asyncio.ensure_future(
+                control.wait((1, 2), lambda: not state["paused"])
+            )
+            await asyncio.sleep(0)
+            self.assertEqual(control.parked(), 1)
+
+            # waking without a state change parks the task again
+            control.notify((1, 2))
+            await asyncio.sleep(0)
+            self.assertFalse(waiter.done())
+
+            state["paused"] = False
+            control.notify((1, 2))
+            await asyncio.wait_for(waiter, 1)
+            self.assertEqual(control.parked(), 0)
+
+        asyncio.run(run())
+
+    def test_notify_all_from_thread(self):
+        control = TaskControl()
+        state = {"paused": True}
+
+        async def run():
+            waiters = [
+                asyncio.ensure_future(
+                    control.wait((1, i), lambda: not state["paused"])
+                )
+                for i in range(3)
+            ]
+            await asyncio.sleep(0)
+            self.assertEqual(control.parked(), 3)
+
+            def resume():
+                state["paused"] = False
+                control.notify_all()
+
+            thread = threading.Thread(target=resume)
+            thread.start()
+            await asyncio.wait_for(asyncio.gather(*waiters), 1)
+            thread.join()
+            self.assertEqual(control.parked(), 0)
+
+        asyncio.run(run())
+
+    def test_runnable_returns_immediately(self):
+        control = TaskControl()
+        asyncio.run(control.wait((1, 1), lambda: True))
+        self.assertEqual(control.parked(), 0)
@@ -0,0 +1,165 @@
+"""test task queue"""
+
+import asyncio
+import sys
+import unittest
+
+from module.task_queue import (
+    PRIORITY_HIGH,
+    PRIORITY_NORMAL,
+    FairGate,
+    FairLanes,
+    TaskQueue,
+    WaitStats,
+)
+
+sys.path.append("..")  # Adds higher directory to python modules path.
+
+
+class TaskQueueTestCase(unittest.TestCase):
+    def test_priority_and_order(self):
+        async def run():
+            queue = TaskQueue()
+            for i in range(3):
+                await queue.put(("bulk", i))
+            await queue.put(("link", 0), PRIORITY_HIGH)
+            queue.put_nowait(("link", 1), PRIORITY_HIGH)
+            self.assertEqual(queue.qsize(), 5)
+            result = []
+            while not queue.empty():
+                result.append(queue.get_nowait())
+            with self.assertRaises(asyncio.QueueEmpty):
+                queue.get_nowait()
+            return result
+
+        self.assertEqual(
+            asyncio.run(run()),
+            [("link", 0), ("link", 1), ("bulk", 0), ("bulk", 1), ("bulk", 2)],
+        )
+
+    def test_backpressure(self):
+        async def run():
+            queue = TaskQueue(2)
+            produced = []
+
+            async def producer():
+                for i in range(5):
+                    await queue.put(i)
+                    produced.append(i)
+
+            task = asyncio.ensure_future(producer())
+            await asyncio.sleep(0.01)
+            # the producer waits on the full queue
+            self.assertEqual(produced, [0, 1])
+            with self.assertRaises(asyncio.QueueFull):
+                queue.put_nowait(9, PRIORITY_HIGH)
+
+            consumed = [await queue.get() for _ in range(5)]
+            await task
+            return consumed
+
+        self.assertEqual(asyncio.run(run()), [0, 1, 2, 3, 4])
+
+    def test_weighted_round_robin(self):
+        stats = {name: WaitStats(name) for name in ("big", "small", "bot")}
+        weights = {"big": 2, "small": 1, "bot": 1}
+
+        def lane(item):
+            return (item[0], weights[item[0]], 0, stats[item[0]])
+
+        async def run():
+            queue = TaskQueue(lane=lane)
+            for i in range(6):
+                await queue.put(("big", i))
+            for i in range(2):
+                await queue.put(("small", i))
+            await queue.put(("bot", 0))
+            result = []
+            while not queue.empty():
+                item = queue.get_nowait()
+                result.append(item)
+                queue.done(item)
+            return result, queue.stats()
+
+        result, queue_stats = asyncio.run(run())
+        self.assertEqual(
+            result,
+            [
+                ("big", 0),
+                ("big", 1),
+                ("small", 0),
+                ("bot", 0),
+                ("big", 2),
+                ("big", 3),
+                ("small", 1),
+                ("big", 4),
+                ("big", 5),
+            ],
+        )
+        self.assertEqual(stats["big"].started, 6)
+        self.assertEqual(queue_stats["wait"]["started"], 9)
+        # finished lanes are not reported
+        self.assertEqual(queue_stats["tasks"], [])
+
+    def test_lane_limit(self):
+        def lane(item):
+            return (item[0], 1, 2 if item[0] == "a" else 0, None)
+
+        async def run():
+            queue = TaskQueue(lane=lane)
+            for i in range(4):
+                await queue.put(("a", i))
+            await queue.put(("b", 0))
+
+            first = [queue.get_nowait() for _ in range(3)]
+            self.assertEqual(first, [("a", 0), ("b", 0), ("a", 1)])
+            # "a" has two running, the rest waits until one is done
+            self.assertFalse(queue.empty())
+            with self.assertRaises(asyncio.QueueEmpty):
+                queue.get_nowait()
+            self.assertEqual(queue.stats()["running"], 3)
+
+            waiter = asyncio.ensure_future(queue.get())
+            await asyncio.sleep(0)
+            self.assertFalse(waiter.done())
+            queue.done(("a", 0))
+            self.assertEqual(await waiter, ("a", 2))
+
+        asyncio.run(run())
+
+    def test_stats_while_queued(self):
+        stats = WaitStats("a")
+        lanes = FairLanes()
+        lanes.push(1, PRIORITY_HIGH, "a", stats=stats)
+        lanes.push(2, PRIORITY_NORMAL, "a", stats=stats)
+        key, _, _ = lanes.pop()
+        lanes.done(key)
+        # the lane of the other priority still waits
+        self.assertEqual([it["name"] for it in lanes.snapshot()], ["a"])
+        key, _, _ = lanes.pop()
+        lanes.done(key)
+        self.assertEqual(lanes.snapshot(), [])
+
+    def test_fair_gate(self):
+        async def run():
+            gate = FairGate(1)
+            order = []
+
+            async def download(key, i):
+                async with gate.slot(key):
+                    order.append((key, i))
+                    await asyncio.sleep(0)
+
+            await asyncio.gather(
+                *(download("p1", i) for i in range(3)),
+                *(download("p2", i) for i in range(3)),
+            )
+            self.assertEqual(gate.in_use, 0)
+            return order
+
+        order = asyncio.run(run())
+        # the first p1 download got the free slot, then the profiles alternate
+        self.assertEqual(
+            order,
+            [("p1", 0), ("p1", 1), ("p2", 0), ("p1", 2), ("p2", 1), ("p2", 2)],
+        )
@@ -0,0 +1,122 @@
+"""test tee stream"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+
+from module.tee_stream import SinkTooSlow, file_sink, tee
+
+sys.path.append("..")  # Adds higher directory to python modules path.
+
+
+class _Source:
+    """``count`` chunks of ``size`` bytes, fails after ``fail_after`` chunks"""
+
+    def __init__(self, count: int, size: int = 4, fail_after: int = -1):
+        self.count = count
+        self.size = size
+        self.fail_after = fail_after
+        self.read = 0
+
+    async def __aiter__(self):
+        for i in range(self.count):
+            if i == self.fail_after:
+                raise ConnectionError("telegram gone")
+            self.read += 1
+            yield bytes([i]) * self.size
+            await asyncio.sleep(0)
+
+
+async def _collect(stream, delay: float = 0, received=None):
+    data = b""
+    async for chunk in stream:
+        data += chunk
+        if received is not None:
+            received.append(len(data))
+        if delay:
+            await asyncio.sleep(delay)
+    return data
+
+
+class TeeStreamTestCase(unittest.TestCase):
+    def test_fan_out(self):
+        source = _Source(10)
+        results = asyncio.run(
+            tee(
+                source.__aiter__(),
+                {"webdav": _collect, "rclone": _collect},
+                max_buffer=8,
+            )
+        )
+        expected = b"".join(bytes([i]) * 4 for i in range(10))
+        self.assertEqual(results, {"webdav": expected, "rclone": expected})
+        self.assertEqual(source.read, 10)
+
+    def test_backpressure(self):
+        source = _Source(20)
+        received = []
+
+        async def slow(stream):
+            return await _collect(stream, 0.001, received)
+
+        async def run():
+            async def watch(stream):
+                async for _ in stream:
+                    # the fast sink is never more than the buffer of the
+                    # slow one ahead of it
+                    slow_read = received[-1] if received else 0
+                    self.assertLessEqual(source.read * 4 - slow_read, 8 + 4)
+                return True
+
+            return await tee(
+                source.__aiter__(), {"slow": slow, "fast": watch}, 8, max_stall=0
+            )
+
+        results = asyncio.run(run())
+        self.assertEqual(len(results["slow"]), 80)
+        self.assertTrue(results["fast"])
+
+    def test_slow_sink_detached(self):
+        async def stuck(stream):
+            async for _ in stream:
+                await asyncio.sleep(0.3)
+
+        results = asyncio.run(
+            tee(
+                _Source(10).__aiter__(),
+                {"stuck": stuck, "local": _collect},
+                max_buffer=8,
+                max_stall=0.05,
+            )
+        )
+        self.assertIsInstance(results["stuck"], SinkTooSlow)
+        self.assertEqual(len(results["local"]), 40)
+
+    def test_file_sink(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "chat", "video.mp4")
+            results = asyncio.run(
+                tee(
+                    _Source(3).__aiter__(),
+                    {"local": lambda stream: file_sink(path, stream)},
+                )
+            )
+            self.assertTrue(results["local"])
+            with open(path, "rb") as f:
+                self.assertEqual(len(f.read()), 12)
+
+            # a source that breaks off leaves no partial file behind
+            results = asyncio.run(
+                tee(
+                    _Source(3, fail_after=2).__aiter__(),
+                    {
+                        "local": lambda stream: file_sink(path, stream),
+                        "upload": _collect,
+                    },
+                )
+            )
+            self.assertIsInstance(results["local"], ConnectionError)
+            self.assertIsInstance(results["upload"], ConnectionError)
+            self.assertFalse(os.path.exists(path))
@@ -0,0 +1,156 @@
+"""test rclone upload batcher"""
+
+import asyncio
+import json
+import os
+import stat
+import sys
+import tempfile
+import unittest
+
+from module.upload_batcher import RcloneBatcher
+
+sys.path.append("..")  # Adds higher directory to python modules path.
+
+# Stands in for rclone: records its arguments, reads the file list by the
+# rules of rclone and logs like ``rclone copy --use-json-log --verbose``.
+# The remote is a local directory, files already there are skipped without
+# a log line as with ``--ignore-existing``, "bad.jpg" fails and
+# "skipped.jpg" is left out without a word.
+_FAKE_RCLONE = """#!{python}
+import json, os, shutil, sys
+args = sys.argv[1:]
+with open({calls!r}, "a") as f:
+    f.write(json.dumps(args) + "\\n")
+if "--files-from-raw" in args:
+    with open(args[args.index("--files-from-raw") + 1], encoding="utf-8") as f:
+        names = [n for n in f.read().split("\\n") if n]
+else:
+    # rclone strips the lines and skips comments
+    with open(args[args.index("--files-from") + 1], encoding="utf-8") as f:
+        names = [n.strip() for n in f.read().split("\\n")]
+    names = [n for n in names if n and n[0] not in "#;"]
+if args[0] == "lsjson":
+    dst = args[1]
+    print(json.dumps([
+        {{"Path": n, "Name": n, "IsDir": False}}
+        for n in names if os.path.isfile(os.path.join(dst, n))
+    ]))
+    sys.exit(0)
+src, dst = args[1], args[2]
+os.makedirs(dst, exist_ok=True)
+print(json.dumps({{"level": "info", "msg": "stats", "stats": {{"transferring": [
+    {{"name": n, "bytes": 5, "size": 10, "speed": 1024, "eta": 1}} for n in names
+]}}}}))
+print("not a json line")
+failed = False
+for n in names:
+    if n == "bad.jpg":
+        failed = True
+        print(json.dumps({{"level": "error", "msg": "Failed to copy: denied",
+                          "object": n}}))
+    elif n != "skipped.jpg" and not os.path.exists(os.path.join(dst, n)):
+        shutil.copy(os.path.join(src, n), os.path.join(dst, n))
+        print(json.dumps({{"level": "info", "msg": "Copied (new)", "object": n}}))
+sys.exit(1 if failed else 0)
+"""
+
+
+class RcloneBatcherTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.calls = os.path.join(self.tmp.name, "calls.txt")
+        self.rclone = os.path.join(self.tmp.name, "rclone")
+        with open(self.rclone, "w", encoding="utf-8") as f:
+            f.write(_FAKE_RCLONE.format(python=sys.executable, calls=self.calls))
+        os.chmod(self.rclone, os.stat(self.rclone).st_mode | stat.S_IEXEC)
+        self.src = os.path.join(self.tmp.name, "chat")
+        os.makedirs(self.src)
+        self.remote = os.path.join(self.tmp.name, "remote")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _file(self, name: str) -> str:
+        path = os.path.join(self.src, name)
+        with open(path, "wb") as f:
+            f.write(b"0123456789")
+        return path
+
+    def _invocations(self, command: str = "copy") -> int:
+        with open(self.calls, encoding="utf-8") as f:
+            return sum(json.loads(it)[0] == command for it in f)
+
+    def test_batch_by_count(self):
+        progress = []
+
+        async def callback(transferred, total, percentage, speed, eta, name):
+            progress.append((name, percentage))
+
+        async def run():
+            batcher = RcloneBatcher(self.rclone, window=60, max_files=3)
+            return await asyncio.gather(
+                *(
+                    batcher.upload(self._file(name), self.remote, callback, (name,))
+                    for name in ("a.jpg", "bad.jpg", "c.jpg")
+                )
+            )
+
+        self.assertEqual(asyncio.run(run()), [True, False, True])
+        # one rclone process for the three files
+        self.assertEqual(self._invocations(), 1)
+        self.assertEqual(
+            sorted(progress), [("a.jpg", "50"), ("bad.jpg", "50"), ("c.jpg", "50")]
+        )
+
+    def test_batch_by_window(self):
+        async def run():
+            batcher = RcloneBatcher(self.rclone, window=0.05, max_files=100)
+            first = await asyncio.gather(
+                batcher.upload(self._file("a.jpg"), self.remote),
+                batcher.upload(self._file("b.jpg"), self.remote),
+            )
+            second = await batcher.upload(self._file("c.jpg"), self.remote + "2")
+            return first, second
+
+        self.assertEqual(asyncio.run(run()), ([True, True], True))
+        self.assertEqual(self._invocations(), 2)
+
+    def test_names_rclone_would_skip(self):
+        names = ["#travel.jpg", ";draft.txt", " padded .jpg", "two words.mp4"]
+
+        async def run():
+            batcher = RcloneBatcher(self.rclone, window=60, max_files=len(names))
+            return await asyncio.gather(
+                *(batcher.upload(self._file(name), self.remote) for name in names)
+            )
+
+        self.assertEqual(asyncio.run(run()), [True] * len(names))
+        self.assertEqual(sorted(os.listdir(self.remote)), sorted(names))
+        # every file was logged as copied, nothing left to look up
+        self.assertEqual(self._invocations("lsjson"), 0)
+
+    def test_existing_and_missing(self):
+        os.makedirs(self.remote)
+        with open(os.path.join(self.remote, "old.jpg"), "wb") as f:
+            f.write(b"0123456789")
+
+        async def run():
+            batcher = RcloneBatcher(self.rclone, window=60, max_files=2)
+            return await asyncio.gather(
+                batcher.upload(self._file("old.jpg"), self.remote),
+                batcher.upload(self._file("new.jpg"), self.remote),
+            )
+
+        self.assertEqual(asyncio.run(run()), [True, True])
+        self.assertEqual(self._invocations("lsjson"), 1)
+
+
+    def test_silently_skipped(self):
+        async def run():
+            batcher = RcloneBatcher(self.rclone, window=60, max_files=1)
+            return await batcher.upload(self._file("skipped.jpg"), self.remote)
+
+        # rclone exits with 0, but the file is not on the remote
+        self.assertFalse(asyncio.run(run()))
+        self.assertEqual(self._invocations("lsjson"), 1)
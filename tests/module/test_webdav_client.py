@@ -0,0 +1,246 @@
+"""test pooled webdav client"""
+
+import asyncio
+import sys
+import unittest
+import urllib.parse
+
+from aiohttp import web
+
+from module.webdav_client import WebDavClient
+
+sys.path.append("..")  # Adds higher directory to python modules path.
+
+
+class _FakeDav:
+    """WebDAV server below ``/dav`` that keeps its directories in a set"""
+
+    def __init__(self, dirs=()):
+        self.dirs = set(dirs)
+        self.requests = []
+        self.ports = set()
+        self.runner = None
+
+    async def handle(self, request: web.Request):
+        path = request.match_info["path"].strip("/")
+        self.requests.append((request.method, path))
+        self.ports.add(request.transport.get_extra_info("peername")[1])
+        if request.method == "PROPFIND":
+            children = [
+                it
+                for it in self.dirs
+                if it.rpartition("/")[0] == path and (not path or it != path)
+            ]
+            body = "".join(
+                "<d:response><d:href>/dav/%s/</d:href><d:propstat><d:prop>"
+                "<d:resourcetype><d:collection/></d:resourcetype>"
+                "</d:prop></d:propstat></d:response>" % it.replace(" ", "%20")
+                for it in children
+            )
+            return web.Response(
+                status=207,
+                body=f'<d:multistatus xmlns:d="DAV:">{body}</d:multistatus>',
+            )
+        if request.method == "MKCOL":
+            if path in self.dirs:
+                return web.Response(status=405)
+            self.dirs.add(path)
+            return web.Response(status=201)
+        if request.method == "PUT":
+            await request.read()
+            if path.rpartition("/")[0] not in self.dirs:
+                return web.Response(status=409)
+            return web.Response(status=201)
+        return web.Response(status=400)
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_route("*", "/dav/{path:.*}", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/dav/"
+
+
+class WebDavClientTestCase(unittest.TestCase):
+    def test_ensure_dir(self):
+        async def run():
+            dav = _FakeDav({"backup", "backup/old chat"})
+            url = await dav.start()
+            client = WebDavClient(url)
+            try:
+                await client.ensure_dir("backup/new chat/2024")
+                self.assertEqual(
+                    dav.requests,
+                    [
+                        ("PROPFIND", ""),
+                        ("PROPFIND", "backup"),
+                        ("MKCOL", "backup/new chat"),
+                        # the new directory is empty, nothing to look up
+                        ("MKCOL", "backup/new chat/2024"),
+                    ],
+                )
+                self.assertIn("backup/old chat", client.dirs)
+
+                # known directories cost nothing, a second client of the same
+                # server shares the index
+                other = WebDavClient(url)
+                await other.ensure_dir("backup/old chat")
+                await other.ensure_dir("backup/new chat/2024")
+                await other.close()
+                self.assertEqual(len(dav.requests), 4)
+
+                # a directory removed on the server is looked up again
+                dav.dirs.discard("backup/new chat/2024")
+                client.forget("backup/new chat/2024")
+                await client.ensure_dir("backup/new chat/2024")
+                self.assertEqual(dav.requests[-1], ("MKCOL", "backup/new chat/2024"))
+            finally:
+                await client.close()
+                await dav.runner.cleanup()
+
+        asyncio.run(run())
+
+    def test_keep_alive(self):
+        async def run():
+            dav = _FakeDav({"a"})
+            url = await dav.start()
+            client = WebDavClient(url, connections=2)
+            try:
+                for i in range(5):
+                    await client.ensure_dir(f"a/{i}")
+                    async with client.session().put(
+                        client.file_url(f"a/{i}/file {i}.jpg"), data=b"x"
+                    ) as resp:
+                        self.assertEqual(resp.status, 201)
+            finally:
+                await client.close()
+                await dav.runner.cleanup()
+            return dav
+
+        dav = asyncio.run(run())
+        self.assertEqual(len(dav.requests), 2 + 5 + 5)
+        # every request went over the same connection
+        self.assertEqual(len(dav.ports), 1)
+
+
+class _FakeChunkDav:
+    """Keeps uploaded files in memory, answers partial updates if
+    ``partial`` and fails the first request of segment ``fail_at``"""
+
+    def __init__(self, partial: bool = False, fail_at: int = 2):
+        self.partial = partial
+        self.fail_at = fail_at
+        self.files = {}
+        self.failed = False
+        self.requests = []
+        self.runner = None
+        self.port = 0
+
+    async def handle(self, request: web.Request):
+        path = request.path
+        self.requests.append((request.method, path))
+        if request.method == "OPTIONS":
+            headers = {}
+            if self.partial:
+                headers["Accept-Patch"] = "application/x-sabredav-partialupdate"
+            return web.Response(status=200, headers=headers)
+        if request.method in ("MKCOL", "DELETE"):
+            return web.Response(status=201)
+        if request.method == "PUT":
+            body = await request.read()
+            if path.endswith(f"/{self.fail_at:05d}") and not self.failed:
+                self.failed = True
+                return web.Response(status=500)
+            self.files[path] = body
+            return web.Response(status=201)
+        if request.method == "PATCH":
+            body = await request.read()
+            start = int(request.headers["X-Update-Range"][6:].split("-")[0])
+            if start == 8 and not self.failed:
+                self.failed = True
+                return web.Response(status=500)
+            self.files[path] = self.files[path][:start] + body
+            return web.Response(status=204)
+        if request.method == "MOVE":
+            upload_dir = path.rpartition("/")[0]
+            chunks = sorted(it for it in self.files if it.startswith(upload_dir + "/"))
+            destination = urllib.parse.unquote(
+                urllib.parse.urlparse(request.headers["Destination"]).path
+            )
+            self.files[destination] = b"".join(self.files[it] for it in chunks)
+            return web.Response(status=201)
+        return web.Response(status=400)
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_route("*", "/{path:.*}", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{self.port}"
+
+
+class WebDavChunkedTestCase(unittest.TestCase):
+    data = b"0123456789abcdefghij"
+
+    async def _stream(self):
+        for i in range(0, len(self.data), 3):
+            yield self.data[i : i + 3]
+
+    def _upload(self, dav, base):
+        async def run():
+            url = await dav.start()
+            client = WebDavClient(url + base)
+            client.retry_delay = 0
+            progress = []
+
+            async def report(uploaded):
+                progress.append(uploaded)
+
+            try:
+                ok = await client.upload_chunked(
+                    "videos/big file.mp4",
+                    self._stream(),
+                    len(self.data),
+                    8,
+                    report,
+                )
+                return ok, await client.upload_mode(), progress
+            finally:
+                await client.close()
+                await dav.runner.cleanup()
+
+        return asyncio.run(run())
+
+    def test_partial_update(self):
+        dav = _FakeChunkDav(partial=True)
+        ok, mode, progress = self._upload(dav, "/dav")
+        self.assertTrue(ok)
+        self.assertEqual(mode, "partial")
+        self.assertEqual(progress, [8, 16, 20])
+        self.assertEqual(dav.files["/dav/videos/big file.mp4"], self.data)
+        # the failed segment was sent again, the stream was read once
+        self.assertEqual(
+            [method for method, _ in dav.requests],
+            ["OPTIONS", "PUT", "PATCH", "PATCH", "PATCH"],
+        )
+
+    def test_nextcloud(self):
+        dav = _FakeChunkDav()
+        ok, mode, _ = self._upload(dav, "/remote.php/dav/files/alice")
+        self.assertTrue(ok)
+        self.assertEqual(mode, "nextcloud")
+        self.assertEqual(
+            dav.files["/remote.php/dav/files/alice/videos/big file.mp4"],
+            self.data,
+        )
+        methods = [method for method, _ in dav.requests]
+        self.assertEqual(methods, ["MKCOL", "PUT", "PUT", "PUT", "PUT", "MOVE"])
+        self.assertTrue(
+            dav.requests[0][1].startswith("/remote.php/dav/uploads/alice/")
+        )
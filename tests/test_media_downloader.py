@@ -4,6 +4,7 @@ import os
 import platform
 import queue
 import sys
+import tempfile
 import unittest
 from datetime import datetime
 from typing import List, Union
@@ -22,10 +23,12 @@ from media_downloader import (
     download_task,
     main,
     save_msg_to_file,
+    stream_upload,
     worker,
 )
 from module.app import Application, DownloadStatus, TaskNode
-from module.cloud_drive import CloudDriveConfig
+from module.cloud_drive import CloudDrive, CloudDriveConfig
+from module.progress import progress_registry
 from module.pyrogram_extension import (
     get_extension,
     record_download_status,
@@ -1094,3 +1097,117 @@ class MediaDownloaderTestCase(unittest.TestCase):
     @classmethod
     def tearDownClass(cls):
         cls.loop.close()
+
+
+class _StreamClient:
+    """Streams ``data`` in chunks of 4 bytes"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    async def stream_media(self, message, limit: int = 0, offset: int = 0):
+        for i in range(0, len(self.data), 4):
+            await asyncio.sleep(0)
+            yield self.data[i : i + 4]
+
+
+class StreamUploadTestCase(unittest.TestCase):
+    data = b"0123456789abcdefghij"
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.app = Application("", "")
+        self.app.profile_id = "stream-test"
+        self.app.cloud_drive_config = CloudDriveConfig(upload_adapter="webdav")
+        self.uploaded = []
+
+    def tearDown(self):
+        self.loop.close()
+
+    async def _upload(self, drive_config, save_path, file_name, stream, *args, **kw):
+        async for chunk in stream:
+            self.uploaded.append(chunk)
+        return True
+
+    def test_streamed_bytes_count_as_downloaded(self):
+        before = progress_registry.transferred("stream-test")
+        with mock.patch.object(CloudDrive, "webdav_upload_stream", new=self._upload):
+            ok = self.loop.run_until_complete(
+                stream_upload(
+                    _StreamClient(self.data),
+                    MockMessage(id=1, media=True, chat_id=1),
+                    self.app,
+                    "a.mp4",
+                    "",
+                    len(self.data),
+                )
+            )
+        self.assertEqual(ok, (True, False))
+        self.assertEqual(b"".join(self.uploaded), self.data)
+        # the adaptive concurrency samples this counter
+        self.assertEqual(
+            progress_registry.transferred("stream-test") - before, len(self.data)
+        )
+
+
+    def test_local_copy_fails_alone(self):
+        self.app.cloud_drive_config.keep_local_copy = True
+        with tempfile.TemporaryDirectory() as tmp:
+            blocker = os.path.join(tmp, "not a dir")
+            open(blocker, "w").close()
+            with mock.patch.object(
+                CloudDrive, "webdav_upload_stream", new=self._upload
+            ):
+                result = self.loop.run_until_complete(
+                    stream_upload(
+                        _StreamClient(self.data),
+                        MockMessage(id=1, media=True, chat_id=1),
+                        self.app,
+                        "a.mp4",
+                        os.path.join(blocker, "a.mp4"),
+                        len(self.data),
+                    )
+                )
+        # the upload is complete, only the local copy has to be fetched again
+        self.assertEqual(result, (True, False))
+        self.assertEqual(b"".join(self.uploaded), self.data)
+
+    def test_local_copy(self):
+        self.app.cloud_drive_config.keep_local_copy = True
+        with tempfile.TemporaryDirectory() as tmp:
+            temp_file = os.path.join(tmp, "a.mp4")
+            with mock.patch.object(
+                CloudDrive, "webdav_upload_stream", new=self._upload
+            ):
+                result = self.loop.run_until_complete(
+                    stream_upload(
+                        _StreamClient(self.data),
+                        MockMessage(id=1, media=True, chat_id=1),
+                        self.app,
+                        "a.mp4",
+                        temp_file,
+                        len(self.data),
+                    )
+                )
+            with open(temp_file, "rb") as f:
+                self.assertEqual(f.read(), self.data)
+        self.assertEqual(result, (True, True))
+
+
+class DownloadTaskProgressTestCase(unittest.TestCase):
+    def test_failed_download_releases_slot(self):
+        node = TaskNode(chat_id=-42)
+        message = MockMessage(id=7, media=True, chat_id=-42)
+
+        async def failing_download(*args):
+            progress_registry.update(-42, 7, 10, 100, "a.mp4")
+            raise asyncio.CancelledError
+
+        loop = asyncio.new_event_loop()
+        try:
+            with mock.patch("media_downloader.download_media", new=failing_download):
+                with self.assertRaises(asyncio.CancelledError):
+                    loop.run_until_complete(download_task(None, message, node))
+        finally:
+            loop.close()
+        self.assertIsNone(progress_registry.get(-42, 7))
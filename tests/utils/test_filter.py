@@ -5,7 +5,10 @@ from datetime import datetime
 
 import mock
 
-from module.filter import Filter, MetaData
+import module.filter_batch
+from module.filter_batch import BatchPredicate
+from module.filter import BaseFilter, Filter, MetaData
+from module.filter_compiler import FilterCompiler
 from module.pyrogram_extension import set_meta_data
 from tests.test_common import (
     Chat,
@@ -448,3 +451,170 @@ class FilterTestCase(unittest.TestCase):
         download_filter.set_debug(True)
         filter_exec(download_filter, "caption == r'.*高桥.*'")
         filter_exec(download_filter, "caption == r'.*高桥.*'")
+
+    def test_compiled_filter(self):
+        interpreter = BaseFilter()
+        compiler = FilterCompiler(cache_size=2)
+
+        metas = [
+            MetaData(datetime(2022, 3, 8, 10, 0, 0), 5, "#高桥千x", 1024, 0, 0, "a.mp4", 0),
+            MetaData(datetime(2022, 8, 5, 14, 35, 12), 7, "", None, None, None, "", None),
+        ]
+        filters = [
+            "id > 1",
+            "-id < 0",
+            "id + 1 == 6 || id * 2 >= 14",
+            "file_size >= 1KB and file_size <= 1MB",
+            "media_duration < 1",
+            "media_duration != 1",
+            "caption == r'.*高桥.*'",
+            "r'.*高桥.*' != caption",
+            "file_name == 'a.mp4' or file_name == ''",
+            "message_date >= 2022-03-01 00:00:00 && message_date < 2022-04-01 00:00:00",
+            "1024 * 1024 * 1024 * 11 == 11GB",
+            "caption = '.*'",
+            "caption == 1",
+            "r'5' == id",
+            "id > 1 or caption == 1",
+            "not_exist == 1",
+            "id == .",
+        ]
+
+        for meta in metas:
+            for filter_str in filters:
+                interpreter.names = meta.data()
+                try:
+                    expected = interpreter.exec(filter_str)
+                except ValueError as e:
+                    expected = str(e)
+                try:
+                    result = compiler.compile(filter_str)(meta)
+                except ValueError as e:
+                    result = str(e)
+                self.assertEqual(result, expected, filter_str)
+
+        # LRU: the least recently used filter is evicted first
+        compiler.cache_clear()
+        first = compiler.compile("id > 1")
+        compiler.compile("id > 2")
+        self.assertIs(compiler.compile("id > 1"), first)
+        compiler.compile("id > 3")
+        self.assertIs(compiler.compile("id > 1"), first)
+        self.assertEqual(list(compiler._cache), ["id > 3", "id > 1"])
+
+    def test_batch_filter(self):
+        compiler = FilterCompiler()
+        metas = [
+            MetaData(
+                datetime(2022, 3, 1 + i, 10, 0, 0),
+                i,
+                f"#tag{i % 3}",
+                None if i % 4 == 0 else i * 1024,
+                media_file_name=f"{i}.mp4",
+                media_type="video" if i % 2 else "audio",
+            )
+            for i in range(12)
+        ]
+        filters = [
+            "id > 5",
+            "file_size >= 4KB and file_size < 9KB",
+            "file_size != 5KB",
+            "caption == r'#tag1' || media_type == 'audio'",
+            "caption != r'#tag1'",
+            "caption != r'#tag.*' or id > 18",
+            "r'#tag2' == caption and id <= 8",
+            "message_date >= 2022-03-05 00:00:00 and message_date < 2022-03-09 00:00:00",
+            "id > 1 and (media_width == 1 or 1 == 1)",
+            "1 and id > 3",
+            "id * 2 > 10",
+            "id",
+            "media_duration < 1",
+        ]
+
+        for filter_str in filters:
+            compiled = compiler.get(filter_str)
+            expected = [compiled(meta) is True for meta in metas]
+            self.assertEqual(compiled.select(metas), expected, filter_str)
+            with mock.patch.object(module.filter_batch, "np", None):
+                self.assertEqual(compiled.select(metas), expected, filter_str)
+
+        # same errors as the interpreter
+        for filter_str in ["caption == 1", "id == r'5'", "message_date > 1"]:
+            with self.assertRaises(ValueError):
+                compiler.get(filter_str).select(metas)
+
+        if module.filter_batch.np is not None:
+            compiled = compiler.get("file_size >= 4KB and caption == r'#tag1'")
+            compiled.select(metas)
+            self.assertTrue(compiled._batch.vectorized(metas))
+            self.assertFalse(compiler.get("id * 2 > 10")._batch.vectorized(metas))
+
+        download_filter = Filter()
+        self.assertEqual(
+            download_filter.exec_batch("id > 9", metas), [False] * 10 + [True] * 2
+        )
+        download_filter.set_debug(True)
+        self.assertEqual(
+            download_filter.exec_batch("id > 9", metas), [False] * 10 + [True] * 2
+        )
+
+
+@unittest.skipIf(module.filter_batch.np is None, "NumPy is not installed")
+class VectorizedFilterTestCase(unittest.TestCase):
+    """The NumPy path against the row fallback on the same filters"""
+
+    metas = [
+        MetaData(
+            datetime(2022, 3, 1 + i, 10, 0, 0),
+            i,
+            None if i % 5 == 0 else f"#tag{i % 3}",
+            None if i % 4 == 0 else i * 1024,
+            media_file_name=f"{i}.mp4",
+            media_type="video" if i % 2 else "audio",
+        )
+        for i in range(20)
+    ]
+
+    def test_vectorized_matches_fallback(self):
+        compiler = FilterCompiler()
+        filters = [
+            "id > 5",
+            "-5 < id and id <= 12",
+            "file_size >= 4KB and file_size < 9KB",
+            "file_size != 5KB",
+            "file_size > 8KB or id == 0",
+            "caption == r'#tag1' || media_type == 'audio'",
+            "caption != r'#tag1'",
+            "caption != r'#tag.*' or id > 18",
+            "r'#tag2' == caption and id <= 8",
+            "media_file_name == r'.*1\\.mp4' or file_size > 8KB",
+            "message_date >= 2022-03-05 00:00:00 and message_date < 2022-03-09 00:00:00",
+            "id > 1 and (media_width == 1 or 1 == 1)",
+            "1 and id > 3",
+            "0 or media_type == 'video'",
+        ]
+        for filter_str in filters:
+            compiled = compiler.get(filter_str)
+            batch = BatchPredicate(compiled.ast, compiled.predicate)
+            self.assertTrue(batch.vectorized(self.metas), filter_str)
+            vectorized = batch(self.metas)
+            with mock.patch.object(module.filter_batch, "np", None):
+                self.assertIsNone(batch.vectorized(self.metas))
+                fallback = batch(self.metas)
+            self.assertEqual(vectorized, fallback, filter_str)
+            self.assertEqual(
+                vectorized, [compiled(meta) is True for meta in self.metas]
+            )
+            # not a trivial filter
+            self.assertIn(True, vectorized, filter_str)
+            self.assertIn(False, vectorized, filter_str)
+
+    def test_unsupported_falls_back(self):
+        compiler = FilterCompiler()
+        for filter_str in ["id * 2 > 10", "id"]:
+            compiled = compiler.get(filter_str)
+            batch = BatchPredicate(compiled.ast, compiled.predicate)
+            self.assertFalse(batch.vectorized(self.metas))
+            self.assertEqual(
+                batch(self.metas), [compiled(meta) is True for meta in self.metas]
+            )
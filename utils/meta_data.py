@@ -77,29 +77,32 @@ class MetaData:
         self.reply_to_message_id = reply_to_message_id
         self.message_thread_id = message_thread_id
 
+    # filter name -> attribute, in the order of ``data()``
+    FIELDS = {
+        "message_date": "message_date",
+        "message_id": "message_id",
+        "message_caption": "message_caption",
+        "media_file_size": "media_file_size",
+        "media_width": "media_width",
+        "media_height": "media_height",
+        "media_file_name": "media_file_name",
+        "media_duration": "media_duration",
+        "id": "message_id",
+        "caption": "message_caption",
+        "file_size": "media_file_size",
+        "file_name": "media_file_name",
+        "media_type": "media_type",
+        "file_extension": "file_extension",
+        "sender_id": "sender_id",
+        "sender_name": "sender_name",
+        "reply_to_message_id": "reply_to_message_id",
+        "message_thread_id": "message_thread_id",
+        "topic_id": "message_thread_id",
+    }
+
     def data(self) -> dict:
         """Meta map"""
-        return {
-            "message_date": self.message_date,
-            "message_id": self.message_id,
-            "message_caption": self.message_caption,
-            "media_file_size": self.media_file_size,
-            "media_width": self.media_width,
-            "media_height": self.media_height,
-            "media_file_name": self.media_file_name,
-            "media_duration": self.media_duration,
-            "id": self.message_id,
-            "caption": self.message_caption,
-            "file_size": self.media_file_size,
-            "file_name": self.media_file_name,
-            "media_type": self.media_type,
-            "file_extension": self.file_extension,
-            "sender_id": self.sender_id,
-            "sender_name": self.sender_name,
-            "reply_to_message_id": self.reply_to_message_id,
-            "message_thread_id": self.message_thread_id,
-            "topic_id": self.message_thread_id,
-        }
+        return {name: getattr(self, attr) for name, attr in self.FIELDS.items()}
 
     def export(self) -> dict:
         """Export meta data"""
@@ -68,6 +68,25 @@ function backendTaskId(item: BackendTask): string {
   return profileId ? `${profileId}:${item.chat}:${item.id}` : `${item.chat}:${item.id}`;
 }
 
+// Stats rows are keyed by chat and message id; the profile part of the UI id may change.
+function rowKey(item: { chat: string; id: string }): string {
+  return `${item.chat}:${item.id}`;
+}
+
+function rowKeyFromId(id: string): string {
+  return id.split(':').slice(-2).join(':');
+}
+
+interface HistoryPage {
+  total: number;
+  page: number;
+  page_size: number;
+  items: BackendTask[];
+}
+
+// Rows per /api/history page shown in the file manager
+const HISTORY_PAGE_SIZE = 100;
+
 interface BootstrapPayload {
   version: string;
   config: Record<string, any>;
@@ -341,7 +360,11 @@ export default function App() {
   const [botAccess, setBotAccess] = useState<BotAccessConfig>(defaultBotAccess);
   const [botStatus, setBotStatus] = useState<BotStatusConfig>(defaultBotStatus);
   const [tasks, setTasks] = useState<SyncTask[]>([]);
+  // Only the shown page of the history is kept in the browser
   const [completedFiles, setCompletedFiles] = useState<CompletedFile[]>([]);
+  const [historyPage, setHistoryPage] = useState(1);
+  const [historyTotal, setHistoryTotal] = useState(0);
+  const historyPageRef = useRef(1);
   const [accounts, setAccounts] = useState<TelegramAccount[]>([]);
   const [activeAccountId, setActiveAccountId] = useState<string | null>(null);
   const [sessionExists, setSessionExists] = useState(false);
@@ -399,17 +422,55 @@ export default function App() {
     loadBootstrap().catch((error) => setStatusMessage(error.message));
   }, []);
 
+  const loadHistoryPage = async (page: number) => {
+    const response = await fetch(`/api/history?page=${page}&page_size=${HISTORY_PAGE_SIZE}`);
+    if (!response.ok) throw new Error('Failed to load history');
+    const payload = (await response.json()) as HistoryPage;
+    historyPageRef.current = payload.page;
+    setHistoryPage(payload.page);
+    setHistoryTotal(payload.total);
+    setCompletedFiles(payload.items.map(completedFromBackend));
+  };
+
+  const changeHistoryPage = (page: number) => {
+    loadHistoryPage(page).catch((error) => setStatusMessage(error.message));
+  };
+
   useEffect(() => {
     const source = new EventSource('/stream');
     source.onmessage = (event) => {
       const payload = JSON.parse(event.data);
-      if (payload.type !== 'update') return;
-      if (Array.isArray(payload.tasks)) {
-        setTasks(payload.tasks.map(taskFromBackend));
+      if (payload.type === 'update') {
+        if (Array.isArray(payload.tasks)) {
+          setTasks(payload.tasks.map(taskFromBackend));
+        }
+        // (Re)connected or the history was reset: reload the shown page
+        setHistoryTotal(payload.history_total || 0);
+        changeHistoryPage(historyPageRef.current);
+        return;
       }
-      if (Array.isArray(payload.history)) {
-        setCompletedFiles(payload.history.map(completedFromBackend));
+      if (payload.type !== 'delta') return;
+      if (typeof payload.history_total === 'number') {
+        setHistoryTotal(payload.history_total);
       }
+      // Every changed row is dropped from both lists, then re-added to the
+      // list it belongs to now (a finished task moves to history).
+      const changed = new Set<string>(
+        [...(payload.tasks || []), ...(payload.history || []), ...(payload.removed || [])].map(rowKey),
+      );
+      if (changed.size === 0) return;
+      const keep = (item: { id: string }) => !changed.has(rowKeyFromId(item.id));
+      setTasks((prev) => [...prev.filter(keep), ...(payload.tasks || []).map(taskFromBackend)]);
+      // History rows only patch the shown page. A newly finished download is
+      // the newest one, so it only joins page 1.
+      const finished: CompletedFile[] = (payload.history || []).map(completedFromBackend);
+      setCompletedFiles((prev) => {
+        const shown = new Set(prev.map((item) => rowKeyFromId(item.id)));
+        const visible = finished.filter(
+          (item) => historyPageRef.current === 1 || shown.has(rowKeyFromId(item.id)),
+        );
+        return [...visible, ...prev.filter(keep)].slice(0, HISTORY_PAGE_SIZE);
+      });
     };
     source.onerror = () => setStatusMessage('实时任务流暂时断开，浏览器会自动重连。');
     return () => source.close();
@@ -677,7 +738,7 @@ export default function App() {
             </div>
             <nav className="flex flex-col gap-2">
               {navButton('dashboard', '任务仪表盘', <Tv className="w-4 h-4 shrink-0 text-indigo-400" />)}
-              {navButton('files', '已归档媒体文件', <HardDrive className="w-4 h-4 shrink-0 text-indigo-400" />, completedFiles.length)}
+              {navButton('files', '已归档媒体文件', <HardDrive className="w-4 h-4 shrink-0 text-indigo-400" />, historyTotal)}
               {navButton('config', '同步规则与云盘', <Sliders className="w-4 h-4 shrink-0 text-indigo-400" />)}
               {navButton('accounts', '账号登录管理', <Users className="w-4 h-4 shrink-0 text-indigo-400" />)}
             </nav>
@@ -708,7 +769,7 @@ export default function App() {
 
             <nav className="flex flex-col gap-1.5">
               {navButton('dashboard', '任务仪表盘', <Tv className="w-4 h-4 shrink-0 text-indigo-400" />)}
-              {navButton('files', '已归档媒体文件', <HardDrive className="w-4 h-4 shrink-0 text-indigo-400" />, completedFiles.length)}
+              {navButton('files', '已归档媒体文件', <HardDrive className="w-4 h-4 shrink-0 text-indigo-400" />, historyTotal)}
               {navButton('config', '同步规则与云盘', <Sliders className="w-4 h-4 shrink-0 text-indigo-400" />)}
               {navButton('accounts', '账号登录管理', <Users className="w-4 h-4 shrink-0 text-indigo-400" />)}
             </nav>
@@ -772,7 +833,13 @@ export default function App() {
                 <p className="text-[10px] text-slate-500 font-medium">管理、归类检索已成功上传的 Telegram 文件资源</p>
               </div>
               <div className="flex-1 overflow-hidden">
-                <FileManager completedFiles={completedFiles} />
+                <FileManager
+                  completedFiles={completedFiles}
+                  page={historyPage}
+                  pageCount={Math.max(Math.ceil(historyTotal / HISTORY_PAGE_SIZE), 1)}
+                  total={historyTotal}
+                  onPageChange={changeHistoryPage}
+                />
               </div>
             </div>
           )}
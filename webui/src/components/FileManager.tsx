@@ -32,10 +32,15 @@ import {
 } from 'lucide-react';
 
 interface FileManagerProps {
+  // One page of the history, searched and grouped in the browser
   completedFiles: CompletedFile[];
+  page: number;
+  pageCount: number;
+  total: number;
+  onPageChange: (page: number) => void;
 }
 
-export function FileManager({ completedFiles }: FileManagerProps) {
+export function FileManager({ completedFiles, page, pageCount, total, onPageChange }: FileManagerProps) {
   // Navigation states
   // We can track the current path by folder level.
   // currentPath[0] = Level 1 folder (Channel: string, or null for root)
@@ -382,6 +387,27 @@ export function FileManager({ completedFiles }: FileManagerProps) {
 
             {/* Layout grids toggle button */}
             <div className="flex items-center gap-2">
+              <div className="flex items-center gap-1 text-[10px] text-slate-500 font-mono select-none shrink-0">
+                <button
+                  id="btn-history-page-prev"
+                  onClick={() => onPageChange(page - 1)}
+                  disabled={page <= 1}
+                  className="p-1 rounded text-slate-500 hover:text-slate-300 hover:bg-slate-800 transition-colors cursor-pointer disabled:opacity-40 disabled:cursor-default"
+                  title="上一页"
+                >
+                  <ChevronLeft className="w-3.5 h-3.5" />
+                </button>
+                <span>{page} / {pageCount} · 共 {total} 条</span>
+                <button
+                  id="btn-history-page-next"
+                  onClick={() => onPageChange(page + 1)}
+                  disabled={page >= pageCount}
+                  className="p-1 rounded text-slate-500 hover:text-slate-300 hover:bg-slate-800 transition-colors cursor-pointer disabled:opacity-40 disabled:cursor-default"
+                  title="下一页"
+                >
+                  <ChevronRight className="w-3.5 h-3.5" />
+                </button>
+              </div>
               <span className="text-[10px] text-slate-500 font-medium select-none hidden md:inline">配置视图方式：</span>
               <div className="flex bg-slate-900 p-0.5 rounded-lg border border-slate-800 shrink-0">
                 <button